@@ -0,0 +1,107 @@
+"""
+Microbenchmark de serialización de RCAs (filas/segundo)
+Ejecutar con: python benchmarks/bench_serializacion.py [--filas 5000] [--repeticiones 5]
+
+Compara el camino anterior (from_orm + modificar + validación de response_model
++ encoder de FastAPI) con utils.serializers (dict directo + orjson/json).
+No necesita base de datos: usa objetos ORM en memoria.
+"""
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import List
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pydantic import TypeAdapter
+
+import models
+import schemas
+from utils import serializers
+
+CATEGORIAS = ['Máquina', 'Método', 'Material', 'Mano de obra', 'Medición', 'Medio ambiente']
+
+def crear_rcas(cantidad):
+    """RCAs en memoria con todas las columnas y relaciones pobladas"""
+    base = datetime(2024, 1, 1, 8, 30)
+    rcas = []
+    for i in range(cantidad):
+        rca = models.RCA(
+            id=i + 1, codigo=f"RCA-{i:06d}", titulo=f"Falla en grúa STS {i % 12}",
+            descripcion="Descripción extensa del evento " * 8,
+            fecha_evento=base + timedelta(hours=i), fecha_creacion=base, fecha_actualizacion=base,
+            area="Muelle 1", planta="Terminal Norte", equipo=f"STS-{i % 12:02d}", sistema="Izaje",
+            descripcion_falla="Corte de cable de izaje " * 4, impacto="Detención de la operación " * 4,
+            metodo_analisis="5 Porqués", causa_inmediata="Desgaste", causa_raiz="Falta de inspección",
+            causas_contribuyentes="Plan de mantenimiento desactualizado " * 3,
+            acciones_correctivas="Reemplazo de cable", acciones_preventivas="Inspección semanal",
+            responsable="Juan Pérez", area_responsable="Mantenimiento", fecha_compromiso=date(2024, 3, 1),
+            estado="En Análisis", criticidad="Alta", tipo_falla="Mecánica", categoria="Izaje",
+            tiempo_parada_horas=Decimal("12.50"), costo_estimado=Decimal("1500000.00"),
+            verificacion_efectividad="Pendiente", efectivo=None, creado_por="supervisor1"
+        )
+        rca.cinco_porques_rel = [
+            models.CincoPorques(id=i * 5 + n, rca_id=i + 1, nivel=n, porque=f"¿Por qué {n}?", respuesta=f"Respuesta {n}")
+            for n in range(1, 6)
+        ]
+        rca.ishikawa_rel = [
+            models.Ishikawa(id=i * 6 + n, rca_id=i + 1, categoria=cat, causa=f"Causa {cat.lower()}")
+            for n, cat in enumerate(CATEGORIAS)
+        ]
+        rcas.append(rca)
+    return rcas
+
+ADAPTER_LISTA = TypeAdapter(List[schemas.RCAResponse])
+
+def camino_anterior(rcas):
+    """Lo que hacía GET /rca: from_orm, mutar, validar response_model, encoder y json.dumps"""
+    respuestas = []
+    for db_rca in rcas:
+        response = schemas.RCAResponse.from_orm(db_rca)
+        response.cinco_porques = serializers.cinco_porques_a_lista(db_rca)
+        response.ishikawa = serializers.ishikawa_a_dict(db_rca)
+        respuestas.append(response)
+    validado = ADAPTER_LISTA.validate_python(respuestas, from_attributes=True)
+    contenido = ADAPTER_LISTA.dump_python(validado, mode="json")
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def camino_rapido(rcas):
+    """Camino actual: dict directo desde las columnas + serializers.dumps"""
+    return serializers.dumps([serializers.rca_a_dict(r) for r in rcas])
+
+def medir(funcion, rcas, repeticiones):
+    """Mejor tiempo de varias repeticiones, en filas/segundo"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(rcas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(rcas) / mejor
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de RCAs")
+    parser.add_argument("--filas", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    rcas = crear_rcas(args.filas)
+
+    # Ambos caminos deben producir el mismo JSON
+    if json.loads(camino_anterior(rcas[:50])) != json.loads(camino_rapido(rcas[:50])):
+        print("❌ Los caminos de serialización producen resultados distintos")
+        sys.exit(1)
+
+    anterior = medir(camino_anterior, rcas, args.repeticiones)
+    rapido = medir(camino_rapido, rcas, args.repeticiones)
+
+    print(f"Filas: {args.filas} | encoder: {'orjson' if serializers.orjson else 'json'}")
+    print(f"  Camino anterior: {anterior:>12,.0f} filas/s")
+    print(f"  Camino rápido:   {rapido:>12,.0f} filas/s  (x{rapido / anterior:.1f})")
+
+if __name__ == "__main__":
+    main()
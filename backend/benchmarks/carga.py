@@ -0,0 +1,274 @@
+"""
+Prueba de carga de la API contra una base SQLite local (o un servidor ya levantado)
+Ejecutar con:
+    python benchmarks/carga.py --rcas 5000 --concurrencia 8 --duracion 30
+    python benchmarks/carga.py --comparar benchmarks/resultados/anterior.json
+
+Levanta la API con uvicorn en un hilo, sobre una base SQLite temporal poblada
+con el volumen pedido, y simula el uso de las tablets (listado, detalle,
+actualización con 5 porqués, subida de fotos, estadísticas y PDF) con varios
+clientes concurrentes. Reporta throughput y latencias p50/p95/p99 por endpoint
+y guarda el resultado en JSON para comparar entre commits.
+
+Con --url se apunta a un servidor existente (ej: MySQL de un contenedor local);
+en ese caso no se crea ni se puebla la base.
+"""
+import os
+import sys
+import io
+import json
+import time
+import logging
+import random
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+# Mezcla de operaciones de una tablet: (nombre, peso)
+OPERACIONES = [
+    ('listar', 25),
+    ('listar_resumen', 15),
+    ('detalle', 15),
+    ('bundle', 15),
+    ('archivos_por_rca', 8),
+    ('actualizar', 10),
+    ('subir_foto', 5),
+    ('estadisticas', 5),
+    ('pdf', 2),
+]
+
+# ==================== PREPARACIÓN ====================
+def preparar_entorno(directorio, db_url):
+    """Configurar variables de entorno antes de importar la aplicación"""
+    os.environ['DATABASE_URL'] = db_url
+    os.environ['ARCHIVOS_PATH'] = os.path.join(directorio, 'archivos')
+    # Sin trabajos en segundo plano: el archivado y la limpieza periódicos moverían
+    # los RCAs sembrados durante la medición (y ensuciarían los percentiles)
+    os.environ['TRABAJOS_HABILITADOS'] = 'false'
+    # El logger JSON de la API escribe en consola: una línea por request (y la de
+    # httpx de cada cliente) taparía la tabla de resultados y sumaría E/S a las latencias
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    os.makedirs(os.path.join(directorio, 'archivos', 'fotos'), exist_ok=True)
+
+def poblar(engine, rcas, archivos_path, imagenes=20, seed=42):
+    """Poblar la base con el generador de datos sintéticos (scripts/generar_datos.py)"""
+    from scripts.generar_datos import generar
+    return generar(engine, rcas, seed=seed, imagenes=imagenes, archivos_path=archivos_path, progreso=False)
+
+def _imagen_jpeg():
+    """JPEG pequeño para las subidas (Pillow si está disponible)"""
+    try:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), (30, 90, 160)).save(buffer, 'JPEG')
+        return buffer.getvalue()
+    except ImportError:
+        return b'\xff\xd8\xff\xe0' + b'\x00' * 2048 + b'\xff\xd9'
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def levantar_servidor(puerto, timeout=30):
+    """Iniciar uvicorn en un hilo y esperar a que acepte conexiones"""
+    import uvicorn
+    import main
+
+    servidor = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=puerto, log_level='warning'))
+    hilo = threading.Thread(target=servidor.run, daemon=True)
+    hilo.start()
+    limite = time.monotonic() + timeout
+    while not servidor.started:
+        if not hilo.is_alive():
+            raise RuntimeError(f"uvicorn terminó sin iniciar (¿puerto {puerto} ocupado?)")
+        if time.monotonic() > limite:
+            servidor.should_exit = True
+            raise RuntimeError(f"uvicorn no inició en {timeout} s")
+        time.sleep(0.05)
+    return servidor, hilo
+
+# ==================== CARGA ====================
+def ejecutar_operacion(cliente, nombre, rnd, total_rcas, foto):
+    """Ejecutar una operación y devolver el código de estado"""
+    rca_id = rnd.randint(1, total_rcas)
+    if nombre == 'listar':
+        r = cliente.get('/rca', params={'skip': rnd.randint(0, max(total_rcas - 50, 0)), 'limit': 50})
+    elif nombre == 'listar_resumen':
+        r = cliente.get('/rca', params={'vista': 'resumen', 'skip': rnd.randint(0, max(total_rcas - 50, 0)), 'limit': 50})
+    elif nombre == 'detalle':
+        r = cliente.get(f'/rca/{rca_id}')
+    elif nombre == 'bundle':
+        r = cliente.get(f'/rca/{rca_id}/bundle')
+    elif nombre == 'archivos_por_rca':
+        ids = [rnd.randint(1, total_rcas) for _ in range(50)]
+        r = cliente.get('/archivo/por-rca', params={'rca_ids': ids, 'max_por_rca': 1})
+    elif nombre == 'actualizar':
+        r = cliente.put(f'/rca/{rca_id}', json={
+            'causa_raiz': f'Actualizado {rnd.random()}',
+            'cinco_porques': [f'Porque {n} {rnd.randint(1, 999)}' for n in range(1, 6)],
+        })
+    elif nombre == 'subir_foto':
+        r = cliente.post('/archivo/upload', data={'rca_id': str(rca_id), 'subido_por': 'carga'},
+                         files={'file': ('evidencia.jpg', foto, 'image/jpeg')})
+    elif nombre == 'estadisticas':
+        r = cliente.get('/estadisticas/resumen')
+    elif nombre == 'pdf':
+        r = cliente.get(f'/reportes/rca/{rca_id}/pdf')
+    else:
+        raise ValueError(nombre)
+    return r.status_code
+
+def trabajador(base_url, fin, seed, total_rcas, foto, resultados):
+    """Cliente que ejecuta operaciones al azar (según pesos) hasta el tiempo límite"""
+    import httpx
+
+    rnd = random.Random(seed)
+    nombres = [n for n, _ in OPERACIONES]
+    pesos = [p for _, p in OPERACIONES]
+    with httpx.Client(base_url=base_url, timeout=60) as cliente:
+        while time.perf_counter() < fin:
+            nombre = rnd.choices(nombres, pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                status = ejecutar_operacion(cliente, nombre, rnd, total_rcas, foto)
+            except Exception:
+                status = 0
+            resultados.append((nombre, time.perf_counter() - inicio, status))
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano"""
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados) + 0.5) - 1))
+    return valores_ordenados[indice]
+
+def resumir(resultados, duracion):
+    """Throughput y latencias (ms) por operación"""
+    por_operacion = {}
+    for nombre, segundos, status in resultados:
+        por_operacion.setdefault(nombre, []).append((segundos, status))
+
+    resumen = {}
+    for nombre, muestras in sorted(por_operacion.items()):
+        latencias = sorted(s * 1000 for s, _ in muestras)
+        errores = sum(1 for _, status in muestras if status == 0 or status >= 400)
+        resumen[nombre] = {
+            'requests': len(muestras),
+            'errores': errores,
+            'rps': round(len(muestras) / duracion, 2),
+            'media_ms': round(sum(latencias) / len(latencias), 2),
+            'p50_ms': round(percentil(latencias, 50), 2),
+            'p95_ms': round(percentil(latencias, 95), 2),
+            'p99_ms': round(percentil(latencias, 99), 2),
+            'max_ms': round(latencias[-1], 2),
+        }
+    total = len(resultados)
+    resumen['_total'] = {'requests': total, 'rps': round(total / duracion, 2)}
+    return resumen
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def imprimir(resumen, anterior=None):
+    print(f"\n{'Operación':<18}{'req':>7}{'err':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for nombre, datos in resumen.items():
+        if nombre.startswith('_'):
+            continue
+        linea = (f"{nombre:<18}{datos['requests']:>7}{datos['errores']:>5}{datos['rps']:>9.1f}"
+                 f"{datos['p50_ms']:>9.1f}{datos['p95_ms']:>9.1f}{datos['p99_ms']:>9.1f}")
+        previo = (anterior or {}).get(nombre)
+        if previo and previo.get('p95_ms'):
+            cambio = (datos['p95_ms'] - previo['p95_ms']) / previo['p95_ms'] * 100
+            linea += f"   p95 {cambio:+.0f}% vs anterior"
+        print(linea)
+    print(f"\nTotal: {resumen['_total']['requests']} requests, {resumen['_total']['rps']} req/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API RCA")
+    parser.add_argument('--url', help="Servidor existente (si no, se levanta uno con SQLite)")
+    parser.add_argument('--rcas', type=int, default=2000, help="RCAs a generar")
+    parser.add_argument('--imagenes', type=int, default=20, help="Imágenes de evidencia distintas")
+    parser.add_argument('--concurrencia', type=int, default=8, help="Clientes simultáneos")
+    parser.add_argument('--duracion', type=float, default=20, help="Segundos de carga")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto benchmarks/resultados/<fecha>_<commit>.json)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    temporal = tempfile.TemporaryDirectory(prefix='rca_carga_')
+    servidor = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+        total_rcas = args.rcas
+    else:
+        db_path = os.path.join(temporal.name, 'carga.db')
+        preparar_entorno(temporal.name, f"sqlite:///{db_path}")
+        from database import engine, Base
+        import models  # noqa: F401
+        Base.metadata.create_all(bind=engine)
+        print(f"Poblando {args.rcas} RCAs en {db_path}...")
+        inicio = time.perf_counter()
+        poblar(engine, args.rcas, os.environ['ARCHIVOS_PATH'], args.imagenes, args.seed)
+        print(f"  listo en {time.perf_counter() - inicio:.1f} s")
+        puerto = puerto_libre()
+        servidor, hilo = levantar_servidor(puerto)
+        base_url = f"http://127.0.0.1:{puerto}"
+        total_rcas = args.rcas
+
+    foto = _imagen_jpeg()
+    resultados = []
+    print(f"Carga: {args.concurrencia} clientes durante {args.duracion:.0f} s contra {base_url}")
+    inicio = time.perf_counter()
+    fin = inicio + args.duracion
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as executor:
+        for n in range(args.concurrencia):
+            executor.submit(trabajador, base_url, fin, args.seed + n, total_rcas, foto, resultados)
+    duracion = time.perf_counter() - inicio
+
+    if servidor is not None:
+        servidor.should_exit = True
+        hilo.join(timeout=10)
+
+    resumen = resumir(resultados, duracion)
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)['resultados']
+    imprimir(resumen, anterior)
+
+    commit = commit_actual()
+    salida = args.salida or os.path.join(
+        BACKEND_DIR, 'benchmarks', 'resultados',
+        f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit or 'sin-commit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': vars(args),
+            'resultados': resumen,
+        }, f, indent=1, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+    temporal.cleanup()
+
+if __name__ == "__main__":
+    main()
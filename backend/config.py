@@ -4,13 +4,30 @@ import os
 load_dotenv()
 
 class Config:
-    # Base de datos
+    # Base de datos (DATABASE_URL reemplaza a DB_HOST/DB_USER/... si está definida)
+    DATABASE_URL = os.getenv('DATABASE_URL')
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_PORT = os.getenv('DB_PORT', '3306')
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'rca_database')
     
+    # Réplica de lectura opcional (GET y reportes); vacía = todo va al primario
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', 10))
+    # Segundos que un cliente sigue leyendo del primario después de escribir
+    REPLICA_STICKY_SEGUNDOS = float(os.getenv('REPLICA_STICKY_SEGUNDOS', 10))
+    
+    # Modo embebido para servidores de un solo nodo (DB_MOTOR=sqlite)
+    DB_MOTOR = os.getenv('DB_MOTOR', 'mysql').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', '../rca.db')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', 64))
+    SQLITE_MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', 256))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+    # Cola FIFO de escritores entre los requests de este proceso (los trabajos y scripts no pasan por ella)
+    SQLITE_COLA_ESCRITURA = os.getenv('SQLITE_COLA_ESCRITURA', 'true').lower() == 'true'
+    
     # Servidor
     SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
     SERVER_PORT = int(os.getenv('SERVER_PORT', 8000))
@@ -18,9 +35,61 @@ class Config:
     # Rutas
     ARCHIVOS_PATH = os.getenv('ARCHIVOS_PATH', '../archivos')
     RESPALDOS_PATH = os.getenv('RESPALDOS_PATH', '../respaldos')
+    # Planillas subidas a /importaciones (fuera de ARCHIVOS_PATH: no son evidencias de un RCA)
+    IMPORTACIONES_PATH = os.getenv('IMPORTACIONES_PATH', '../importaciones')
+    
+    # Trabajos en segundo plano (pool de procesos)
+    TRABAJOS_HABILITADOS = os.getenv('TRABAJOS_HABILITADOS', 'true').lower() == 'true'
+    TRABAJOS_WORKERS = int(os.getenv('TRABAJOS_WORKERS', 2))
+    TRABAJOS_INTERVALO_SEG = float(os.getenv('TRABAJOS_INTERVALO_SEG', 2))
+    TRABAJOS_REINTENTO_SEG = float(os.getenv('TRABAJOS_REINTENTO_SEG', 30))
+    TRABAJOS_LATIDO_SEG = float(os.getenv('TRABAJOS_LATIDO_SEG', 30))  # cada cuánto se marcan los trabajos en curso
+    TRABAJOS_LATIDO_VENCIDO_SEG = float(os.getenv('TRABAJOS_LATIDO_VENCIDO_SEG', 180))  # sin latido: se recupera
+    ACCIONES_VENCIDAS_MIN = float(os.getenv('ACCIONES_VENCIDAS_MIN', 60))  # cada cuánto marcar acciones vencidas
+    
+    # Feed de cambios en vivo (/eventos/rca)
+    EVENTOS_MAX_CLIENTES = int(os.getenv('EVENTOS_MAX_CLIENTES', 200))
+    EVENTOS_MAX_COLA = int(os.getenv('EVENTOS_MAX_COLA', 100))  # eventos sin enviar antes de desconectar al cliente
+    EVENTOS_HISTORIAL = int(os.getenv('EVENTOS_HISTORIAL', 500))  # para reconexión con Last-Event-ID
+    EVENTOS_PING_SEG = float(os.getenv('EVENTOS_PING_SEG', 15))
+    
+    # Mapa de calor Ishikawa: recarga completa periódica (entre medio se actualiza por RCA)
+    ISHIKAWA_MAPA_TTL_MIN = float(os.getenv('ISHIKAWA_MAPA_TTL_MIN', 60))
+    
+    # Catálogo de equipos en memoria (se recarga al cambiar y cada N minutos)
+    EQUIPOS_CACHE_TTL_MIN = float(os.getenv('EQUIPOS_CACHE_TTL_MIN', 10))
+    
+    # Autocompletado en memoria: recarga completa periódica (entre medio se ajusta con cada escritura)
+    AUTOCOMPLETAR_TTL_MIN = float(os.getenv('AUTOCOMPLETAR_TTL_MIN', 60))
+    
+    # Archivo histórico: RCAs cerrados/cancelados con más de N años pasan a las tablas *_archivo
+    ARCHIVADO_ANIOS = float(os.getenv('ARCHIVADO_ANIOS', 3))
+    ARCHIVADO_INTERVALO_HORAS = float(os.getenv('ARCHIVADO_INTERVALO_HORAS', 24))  # 0 = solo manual
+    ARCHIVADO_COMPRIMIR = os.getenv('ARCHIVADO_COMPRIMIR', 'false').lower() == 'true'  # gzip de evidencias comprimibles
+    
+    # Limpieza de ARCHIVOS_PATH: archivos sin registro van a cuarentena y se borran pasada la retención
+    LIMPIEZA_INTERVALO_HORAS = float(os.getenv('LIMPIEZA_INTERVALO_HORAS', 24))  # 0 = solo manual
+    LIMPIEZA_MODO = os.getenv('LIMPIEZA_MODO', 'reportar')  # reportar o cuarentena
+    LIMPIEZA_GRACIA_HORAS = float(os.getenv('LIMPIEZA_GRACIA_HORAS', 24))  # no tocar archivos más nuevos
+    LIMPIEZA_RETENCION_DIAS = float(os.getenv('LIMPIEZA_RETENCION_DIAS', 30))  # días en cuarentena antes de borrar
+    
+    # Logging (JSON por cola; debug apagado por defecto)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_NIVELES = os.getenv('LOG_NIVELES', '')  # ej: crud=DEBUG,routers.rca=DEBUG
+    LOG_JSON = os.getenv('LOG_JSON', 'true').lower() == 'true'
+    LOG_ARCHIVO = os.getenv('LOG_ARCHIVO', '')
+    
+    # Diagnóstico de consultas (solo desarrollo/pruebas)
+    QUERY_PROFILER = os.getenv('QUERY_PROFILER', 'false').lower() == 'true'
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    N_MAS_1_UMBRAL = int(os.getenv('N_MAS_1_UMBRAL', 5))
     
     @property
     def database_url(self):
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
+        if self.DB_MOTOR == 'sqlite':
+            return f"sqlite:///{os.path.abspath(self.SQLITE_PATH)}"
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
 config = Config()
\ No newline at end of file
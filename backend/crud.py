@@ -1,27 +1,92 @@
 """
 Operaciones CRUD reutilizables para todas las tablas
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import func, case, update
+from sqlalchemy.orm import Session, selectinload, load_only
 from typing import List, Optional
 import models
-from datetime import datetime
+from datetime import datetime, date
+import os
+import logging
+from utils.eventos import publicar_rca, publicar_relacionado
+from utils import mapa_ishikawa
+from utils.catalogo_equipos import catalogo, completar_equipo
+from utils import autocompletar
+
+logger = logging.getLogger(__name__)
 
 # ==================== RCAs ====================
-def get_rca(db: Session, rca_id: int):
+# Con historico=True las lecturas buscan también en el archivo histórico
+# (utils/archivado.py): RCAs cerrados antiguos, solo lectura.
+def get_rca(db: Session, rca_id: int, historico: bool = False):
     """Obtener RCA por ID con cinco_porques e ishikawa"""
     rca = db.query(models.RCA).filter(models.RCA.id == rca_id).first()
+    if rca is None and historico:
+        rca = db.get(models.RCAArchivado, rca_id)
     return rca
 
-def get_rca_by_codigo(db: Session, codigo: str):
+def get_rca_bundle(db: Session, rca_id: int, historico: bool = False):
+    """
+    Obtener RCA con todas sus relaciones (5 porqués, Ishikawa, archivos,
+    acciones y comentarios) en un número fijo de consultas: una por tabla
+    """
+    for modelo in (models.RCA, models.RCAArchivado) if historico else (models.RCA,):
+        rca = db.query(modelo).options(
+            selectinload(modelo.cinco_porques_rel),
+            selectinload(modelo.ishikawa_rel),
+            selectinload(modelo.archivos_rel),
+            selectinload(modelo.acciones_rel),
+            selectinload(modelo.comentarios_rel)
+        ).filter(modelo.id == rca_id).first()
+        if rca is not None:
+            return rca
+    return None
+
+def get_rca_by_codigo(db: Session, codigo: str, historico: bool = False):
     """Obtener RCA por código"""
-    return db.query(models.RCA).filter(models.RCA.codigo == codigo).first()
+    rca = db.query(models.RCA).filter(models.RCA.codigo == codigo).first()
+    if rca is None and historico:
+        rca = db.query(models.RCAArchivado).filter(models.RCAArchivado.codigo == codigo).first()
+    return rca
 
-def get_rcas(db: Session, skip: int = 0, limit: int = 100, estado: Optional[str] = None):
-    """Listar RCAs con filtros"""
-    query = db.query(models.RCA)
+def get_rcas(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    estado: Optional[str] = None,
+    columnas: Optional[List[str]] = None,
+    equipo_id: Optional[int] = None,
+    historico: bool = False
+):
+    """
+    Listar RCAs con filtros
+    
+    Con columnas solo se leen esas columnas de rcas (load_only); el resto queda
+    diferido. Las relaciones cinco_porques/ishikawa se cargan en bloque solo si
+    se piden (o si no se restringen las columnas). Con historico se lista el
+    archivo histórico en lugar de los RCAs activos
+    """
+    R = models.RCAArchivado if historico else models.RCA
+    query = db.query(R)
     if estado:
-        query = query.filter(models.RCA.estado == estado)
-    return query.offset(skip).limit(limit).all()
+        query = query.filter(R.estado == estado)
+    if equipo_id is not None:
+        query = query.filter(R.equipo_id == equipo_id)
+    
+    if columnas is None:
+        query = query.options(
+            selectinload(R.cinco_porques_rel),
+            selectinload(R.ishikawa_rel)
+        )
+    else:
+        atributos = [getattr(R, c) for c in columnas if c in R.__table__.c]
+        query = query.options(load_only(*atributos, R.id))
+        if 'cinco_porques' in columnas:
+            query = query.options(selectinload(R.cinco_porques_rel))
+        if 'ishikawa' in columnas:
+            query = query.options(selectinload(R.ishikawa_rel))
+    
+    return query.order_by(R.id).offset(skip).limit(limit).all()
 
 def create_rca(db: Session, rca_data: dict):
     """Crear nuevo RCA con cinco_porques e ishikawa"""
@@ -29,6 +94,9 @@ def create_rca(db: Session, rca_data: dict):
     cinco_porques_data = rca_data.pop('cinco_porques', None)
     ishikawa_data = rca_data.pop('ishikawa', None)
     
+    # Vincular con el catálogo de equipos (en memoria, sin consultas extra)
+    completar_equipo(rca_data)
+    
     # Crear RCA principal (sin cinco_porques e ishikawa)
     db_rca = models.RCA(**rca_data)
     db.add(db_rca)
@@ -61,6 +129,9 @@ def create_rca(db: Session, rca_data: dict):
     
     db.commit()
     db.refresh(db_rca)
+    publicar_rca('rca_creado', db_rca)
+    mapa_ishikawa.marcar(db_rca.id)
+    autocompletar.registrar(autocompletar.valores_rca(db_rca))
     return db_rca
 
 def update_rca(db: Session, rca_id: int, update_data: dict):
@@ -72,11 +143,13 @@ def update_rca(db: Session, rca_id: int, update_data: dict):
     # Extraer datos relacionados
     cinco_porques_data = update_data.pop('cinco_porques', None)
     ishikawa_data = update_data.pop('ishikawa', None)
+    completar_equipo(update_data, actual=rca)
+    anteriores = autocompletar.valores_rca(rca)
     
     # Actualizar campos principales del RCA
     for key, value in update_data.items():
         if key == 'fecha_compromiso':
-            print(f"🔄 Actualizando fecha_compromiso: {value}")
+            logger.debug("Actualizando fecha_compromiso", extra={"rca_id": rca_id, "fecha_compromiso": value})
         setattr(rca, key, value)
     
     # Si se enviaron cinco_porques, reemplazar completamente
@@ -113,6 +186,9 @@ def update_rca(db: Session, rca_id: int, update_data: dict):
     
     db.commit()
     db.refresh(rca)
+    publicar_rca('rca_actualizado', rca)
+    mapa_ishikawa.marcar(rca.id)
+    autocompletar.registrar(autocompletar.valores_rca(rca), anteriores)
     return rca
 
 def delete_rca(db: Session, rca_id: int):
@@ -121,13 +197,19 @@ def delete_rca(db: Session, rca_id: int):
     if rca:
         db.delete(rca)
         db.commit()
+        publicar_rca('rca_eliminado', rca)
+        mapa_ishikawa.marcar(rca.id)
+        autocompletar.registrar(anteriores=autocompletar.valores_rca(rca))
         return True
     return False
 
 # ==================== 5 PORQUÉS ====================
-def get_cinco_porques(db: Session, rca_id: int):
+def get_cinco_porques(db: Session, rca_id: int, historico: bool = False):
     """Obtener 5 porqués de un RCA"""
-    return db.query(models.CincoPorques).filter(models.CincoPorques.rca_id == rca_id).all()
+    porques = db.query(models.CincoPorques).filter(models.CincoPorques.rca_id == rca_id).all()
+    if not porques and historico:
+        porques = db.query(models.CincoPorquesArchivado).filter(models.CincoPorquesArchivado.rca_id == rca_id).all()
+    return porques
 
 def create_cinco_porque(db: Session, porque_data: dict):
     """Crear registro de 5 porqués"""
@@ -138,9 +220,12 @@ def create_cinco_porque(db: Session, porque_data: dict):
     return db_porque
 
 # ==================== ISHIKAWA ====================
-def get_ishikawa(db: Session, rca_id: int):
+def get_ishikawa(db: Session, rca_id: int, historico: bool = False):
     """Obtener diagrama Ishikawa de un RCA"""
-    return db.query(models.Ishikawa).filter(models.Ishikawa.rca_id == rca_id).all()
+    causas = db.query(models.Ishikawa).filter(models.Ishikawa.rca_id == rca_id).all()
+    if not causas and historico:
+        causas = db.query(models.IshikawaArchivado).filter(models.IshikawaArchivado.rca_id == rca_id).all()
+    return causas
 
 def create_ishikawa(db: Session, ishikawa_data: dict):
     """Crear causa en Ishikawa"""
@@ -148,12 +233,79 @@ def create_ishikawa(db: Session, ishikawa_data: dict):
     db.add(db_ishikawa)
     db.commit()
     db.refresh(db_ishikawa)
+    mapa_ishikawa.marcar(db_ishikawa.rca_id)
     return db_ishikawa
 
 # ==================== ARCHIVOS ====================
-def get_archivos_rca(db: Session, rca_id: int):
+def get_archivos_rca(db: Session, rca_id: int, historico: bool = False):
     """Obtener archivos de un RCA"""
-    return db.query(models.Archivo).filter(models.Archivo.rca_id == rca_id).all()
+    archivos = db.query(models.Archivo).filter(models.Archivo.rca_id == rca_id).all()
+    if not archivos and historico:
+        archivos = db.query(models.ArchivoArchivado).filter(models.ArchivoArchivado.rca_id == rca_id).all()
+    return archivos
+
+def get_archivo_rca(db: Session, rca_id: int, archivo_id: int):
+    """Archivo de un RCA (activo o del archivo histórico), o None"""
+    for modelo in (models.Archivo, models.ArchivoArchivado):
+        archivo = db.query(modelo).filter(modelo.id == archivo_id, modelo.rca_id == rca_id).first()
+        if archivo is not None:
+            return archivo
+    return None
+
+def get_archivo_por_ruta(db: Session, ruta: str):
+    """
+    Archivo (activo o del archivo histórico) registrado con esa ruta en disco, o None.
+    La ruta se prueba tal cual, absoluta y comprimida (.gz) por el índice de ruta_archivo
+    """
+    candidatas = {ruta, os.path.abspath(ruta), ruta + '.gz', os.path.abspath(ruta) + '.gz'}
+    for modelo in (models.Archivo, models.ArchivoArchivado):
+        archivo = db.query(modelo).filter(modelo.ruta_archivo.in_(candidatas)).order_by(modelo.id).first()
+        if archivo is not None:
+            return archivo
+    return None
+
+def get_archivos_rcas(
+    db: Session,
+    rca_ids: Optional[List[int]] = None,
+    estado: Optional[str] = None,
+    area: Optional[str] = None,
+    tipo_archivo: Optional[List[str]] = None,
+    max_por_rca: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 500
+):
+    """
+    Obtener archivos de varios RCAs en una sola consulta (índice en archivos.rca_id)
+    
+    Los RCAs se eligen por rca_ids o por filtros del RCA (estado, area).
+    Con max_por_rca solo se devuelven los primeros N archivos de cada RCA
+    (ej: miniaturas del listado). Ordenado por rca_id, id
+    """
+    query = db.query(models.Archivo)
+    
+    if rca_ids is not None:
+        query = query.filter(models.Archivo.rca_id.in_(rca_ids))
+    if estado or area:
+        query = query.join(models.RCA, models.RCA.id == models.Archivo.rca_id)
+        if estado:
+            query = query.filter(models.RCA.estado == estado)
+        if area:
+            query = query.filter(models.RCA.area == area)
+    if tipo_archivo:
+        query = query.filter(models.Archivo.tipo_archivo.in_(tipo_archivo))
+    
+    if max_por_rca:
+        # Numerar archivos dentro de cada RCA y quedarse con los primeros N
+        posicion = func.row_number().over(
+            partition_by=models.Archivo.rca_id,
+            order_by=models.Archivo.id
+        ).label('posicion')
+        numerados = query.with_entities(models.Archivo.id.label('id'), posicion).subquery()
+        query = db.query(models.Archivo).join(numerados, numerados.c.id == models.Archivo.id).filter(
+            numerados.c.posicion <= max_por_rca
+        )
+    
+    return query.order_by(models.Archivo.rca_id, models.Archivo.id).offset(skip).limit(limit).all()
 
 def create_archivo(db: Session, archivo_data: dict):
     """Registrar archivo"""
@@ -161,21 +313,230 @@ def create_archivo(db: Session, archivo_data: dict):
     db.add(db_archivo)
     db.commit()
     db.refresh(db_archivo)
+    publicar_relacionado(
+        'archivo_nuevo', db, db_archivo.rca_id,
+        archivo_id=db_archivo.id, tipo_archivo=db_archivo.tipo_archivo, nombre_archivo=db_archivo.nombre_archivo
+    )
     return db_archivo
 
+# ==================== COMENTARIOS ====================
+def create_comentario(db: Session, comentario_data: dict):
+    """Agregar comentario a un RCA"""
+    db_comentario = models.Comentario(**comentario_data)
+    db.add(db_comentario)
+    db.commit()
+    db.refresh(db_comentario)
+    publicar_relacionado(
+        'comentario_nuevo', db, db_comentario.rca_id,
+        comentario_id=db_comentario.id, usuario=db_comentario.usuario
+    )
+    return db_comentario
+
+# ==================== EQUIPOS ====================
+def get_equipo(db: Session, equipo_id: int):
+    return db.query(models.Equipo).filter(models.Equipo.id == equipo_id).first()
+
+def get_equipos(
+    db: Session,
+    area: Optional[str] = None,
+    planta: Optional[str] = None,
+    activo: Optional[bool] = True,
+    skip: int = 0,
+    limit: int = 500
+):
+    """Listar catálogo de equipos"""
+    query = db.query(models.Equipo)
+    if area:
+        query = query.filter(models.Equipo.area == area)
+    if planta:
+        query = query.filter(models.Equipo.planta == planta)
+    if activo is not None:
+        query = query.filter(models.Equipo.activo == activo)
+    return query.order_by(models.Equipo.codigo_equipo).offset(skip).limit(limit).all()
+
+def create_equipo(db: Session, equipo_data: dict):
+    db_equipo = models.Equipo(**equipo_data)
+    db.add(db_equipo)
+    db.commit()
+    db.refresh(db_equipo)
+    catalogo.invalidar()
+    return db_equipo
+
+def update_equipo(db: Session, equipo_id: int, update_data: dict):
+    equipo = get_equipo(db, equipo_id)
+    if not equipo:
+        return None
+    for key, value in update_data.items():
+        setattr(equipo, key, value)
+    db.commit()
+    db.refresh(equipo)
+    catalogo.invalidar()
+    return equipo
+
+def desactivar_equipo(db: Session, equipo_id: int):
+    """Baja lógica: los RCAs conservan el vínculo pero el equipo deja de ofrecerse"""
+    equipo = get_equipo(db, equipo_id)
+    if not equipo:
+        return False
+    equipo.activo = False
+    db.commit()
+    catalogo.invalidar()
+    return True
+
+# ==================== ACCIONES ====================
+ESTADOS_ACCION_ACTIVOS = ('Pendiente', 'En Progreso')
+
+def get_accion(db: Session, accion_id: int):
+    return db.query(models.Accion).filter(models.Accion.id == accion_id).first()
+
+def get_acciones(
+    db: Session,
+    rca_id: Optional[int] = None,
+    estado: Optional[str] = None,
+    responsable: Optional[str] = None,
+    area: Optional[str] = None,
+    vencidas: bool = False,
+    skip: int = 0,
+    limit: int = 100
+):
+    """Listar acciones; vencidas=True incluye las activas con compromiso ya pasado aunque aún no se marquen"""
+    query = db.query(models.Accion)
+    if rca_id is not None:
+        query = query.filter(models.Accion.rca_id == rca_id)
+    if estado:
+        query = query.filter(models.Accion.estado == estado)
+    if responsable:
+        query = query.filter(models.Accion.responsable == responsable)
+    if area:
+        query = query.join(models.RCA, models.RCA.id == models.Accion.rca_id).filter(models.RCA.area == area)
+    if vencidas:
+        query = query.filter(
+            (models.Accion.estado == 'Vencida') |
+            (models.Accion.estado.in_(ESTADOS_ACCION_ACTIVOS) & (models.Accion.fecha_compromiso < date.today()))
+        )
+    return query.order_by(models.Accion.fecha_compromiso, models.Accion.id).offset(skip).limit(limit).all()
+
+def _ajustar_completada(accion):
+    if accion.estado == 'Completada' and accion.fecha_completada is None:
+        accion.fecha_completada = date.today()
+
+def create_accion(db: Session, accion_data: dict):
+    """Crear acción"""
+    db_accion = models.Accion(**accion_data)
+    _ajustar_completada(db_accion)
+    db.add(db_accion)
+    db.commit()
+    db.refresh(db_accion)
+    return db_accion
+
+def update_accion(db: Session, accion_id: int, update_data: dict):
+    """Actualizar acción; al completarla se registra la fecha si no viene"""
+    accion = get_accion(db, accion_id)
+    if not accion:
+        return None
+    for key, value in update_data.items():
+        setattr(accion, key, value)
+    # Una acción vencida que recibe un nuevo compromiso futuro vuelve a Pendiente
+    if (accion.estado == 'Vencida' and 'estado' not in update_data
+            and accion.fecha_compromiso and accion.fecha_compromiso >= date.today()):
+        accion.estado = 'Pendiente'
+    _ajustar_completada(accion)
+    db.commit()
+    db.refresh(accion)
+    return accion
+
+def delete_accion(db: Session, accion_id: int):
+    accion = get_accion(db, accion_id)
+    if not accion:
+        return False
+    db.delete(accion)
+    db.commit()
+    return True
+
+def marcar_acciones_vencidas(db: Session, hoy: Optional[date] = None):
+    """
+    Pasar a 'Vencida' todas las acciones activas con compromiso anterior a hoy.
+    Un solo UPDATE sobre el índice (estado, fecha_compromiso); devuelve la cantidad
+    """
+    resultado = db.execute(
+        update(models.Accion)
+        .where(
+            models.Accion.estado.in_(ESTADOS_ACCION_ACTIVOS),
+            models.Accion.fecha_compromiso < (hoy or date.today())
+        )
+        .values(estado='Vencida')
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount
+
+def get_tablero_acciones(db: Session, hoy: Optional[date] = None):
+    """
+    Acciones vencidas y pendientes por responsable y área, en una consulta
+    agrupada. Solo lee acciones activas o vencidas (rango del índice por estado).
+    Cuenta como vencidas también las activas ya atrasadas que el proceso
+    periódico todavía no marcó
+    """
+    hoy = hoy or date.today()
+    atrasada = (models.Accion.estado == 'Vencida') | (models.Accion.fecha_compromiso < hoy)
+    vencidas = func.sum(case((atrasada, 1), else_=0)).label('vencidas')
+    pendientes = func.sum(case((atrasada, 0), else_=1)).label('pendientes')
+
+    filas = db.query(
+        models.Accion.responsable,
+        models.RCA.area,
+        vencidas,
+        pendientes,
+        func.min(models.Accion.fecha_compromiso).label('compromiso_mas_antiguo')
+    ).join(models.RCA, models.RCA.id == models.Accion.rca_id).filter(
+        models.Accion.estado.in_(ESTADOS_ACCION_ACTIVOS + ('Vencida',))
+    ).group_by(models.Accion.responsable, models.RCA.area).all()
+
+    por_responsable = sorted(
+        (
+            {
+                "responsable": f.responsable or "Sin responsable",
+                "area": f.area or "Sin área",
+                "vencidas": int(f.vencidas or 0),
+                "pendientes": int(f.pendientes or 0),
+                "compromiso_mas_antiguo": f.compromiso_mas_antiguo,
+            }
+            for f in filas
+        ),
+        key=lambda x: (-x["vencidas"], -x["pendientes"], x["responsable"])
+    )
+    return {
+        "fecha": hoy,
+        "vencidas": sum(x["vencidas"] for x in por_responsable),
+        "pendientes": sum(x["pendientes"] for x in por_responsable),
+        "por_responsable": por_responsable,
+    }
+
 # ==================== ESTADÍSTICAS ====================
-def get_estadisticas(db: Session):
-    """Obtener estadísticas generales"""
+def get_estadisticas(db: Session, historico: bool = False):
+    """Obtener estadísticas generales (con historico suma los RCAs archivados)"""
     total = db.query(models.RCA).count()
     abiertos = db.query(models.RCA).filter(models.RCA.estado == "Abierto").count()
     cerrados = db.query(models.RCA).filter(models.RCA.estado == "Cerrado").count()
     criticos = db.query(models.RCA).filter(models.RCA.criticidad == "Crítica").count()
+    archivados = None
+    if historico:
+        # En el archivo solo hay cerrados y cancelados
+        RA = models.RCAArchivado
+        por_estado = dict(db.query(RA.estado, func.count(RA.id)).group_by(RA.estado).all())
+        archivados = sum(por_estado.values())
+        total += archivados
+        cerrados += por_estado.get("Cerrado", 0)
+        criticos += db.query(RA).filter(RA.criticidad == "Crítica").count()
     
-    return {
+    resultado = {
         "total_rcas": total,
         "abiertos": abiertos,
         "cerrados": cerrados,
         "en_analisis": db.query(models.RCA).filter(models.RCA.estado == "En Análisis").count(),
         "criticos": criticos,
         "tasa_cierre": round(cerrados / total * 100, 2) if total > 0 else 0
-    }
\ No newline at end of file
+    }
+    if archivados is not None:
+        resultado["archivados"] = archivados
+    return resultado
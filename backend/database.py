@@ -1,21 +1,296 @@
-from sqlalchemy import create_engine
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import config
 
-engine = create_engine(
-    config.database_url,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=False
-)
+logger = logging.getLogger(__name__)
+
+# ==================== SQLITE ====================
+def _pragmas_sqlite():
+    """PRAGMAs aplicados a cada conexión SQLite nueva"""
+    return [
+        "PRAGMA journal_mode=WAL",  # lectores no bloquean al escritor
+        f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}",  # NORMAL es seguro con WAL
+        f"PRAGMA cache_size=-{config.SQLITE_CACHE_MB * 1024}",  # negativo = KiB
+        f"PRAGMA mmap_size={config.SQLITE_MMAP_MB * 1024 * 1024}",
+        f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    ]
+
+class ColaEscritura:
+    """
+    Cola FIFO de un solo escritor.
+
+    SQLite admite un escritor a la vez: con varias tablets guardando al mismo
+    tiempo las transacciones compiten por el lock y alguna termina en
+    "database is locked". Aquí cada sesión que va a escribir toma un turno y
+    espera a que terminen las anteriores, en orden de llegada. El turno se
+    libera al terminar la transacción (commit o rollback, también el que sigue
+    a un flush fallido), desde cualquier hilo.
+
+    Solo ordena a las sesiones de SessionLocal de este proceso: los procesos
+    del pool de trabajos y los scripts escriben por su cuenta y compiten por
+    el lock de SQLite como siempre (busy_timeout). La espera está acotada: si
+    un turno no llega en `timeout` segundos se abandona y la sesión escribe
+    igual, también esperando por busy_timeout.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._siguiente = 0
+        self._atendiendo = 0
+        self._abandonados = set()
+
+    def adquirir(self, timeout=None):
+        """Esperar el turno. Devuelve False si venció el timeout (el turno queda abandonado)"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicion:
+            turno = self._siguiente
+            self._siguiente += 1
+            while turno != self._atendiendo:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    self._abandonados.add(turno)
+                    return False
+                self._condicion.wait(restante)
+            return True
+
+    def liberar(self):
+        with self._condicion:
+            self._atendiendo += 1
+            # Saltar los turnos de quienes dejaron de esperar
+            while self._atendiendo in self._abandonados:
+                self._abandonados.discard(self._atendiendo)
+                self._atendiendo += 1
+            self._condicion.notify_all()
+
+    @property
+    def en_espera(self):
+        with self._condicion:
+            return self._siguiente - self._atendiendo
+
+def _en_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+def usar_cola_escritura(fabrica_sesiones, cola, timeout=None):
+    """
+    Serializar las transacciones de escritura de las sesiones de `fabrica_sesiones`.
+    Desde el hilo del event loop (endpoints async) nunca se espera turno: bloquearía
+    el loop y con él la liberación del turno en curso
+    """
+
+    def _tomar_turno(session):
+        if session.info.get('turno_escritura') or _en_event_loop():
+            return
+        if cola.adquirir(timeout):
+            session.info['turno_escritura'] = True
+        else:
+            logger.warning("Turno de escritura vencido: se escribe sin cola", extra={"en_espera": cola.en_espera})
+
+    def _liberar_turno(session):
+        if session.info.pop('turno_escritura', False):
+            cola.liberar()
+
+    @event.listens_for(fabrica_sesiones, 'before_flush')
+    def _antes_flush(session, flush_context, instances):
+        _tomar_turno(session)
+
+    @event.listens_for(fabrica_sesiones, 'do_orm_execute')
+    def _antes_ejecutar(orm_execute_state):
+        # UPDATE/DELETE masivos que no pasan por flush
+        if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+            _tomar_turno(orm_execute_state.session)
+
+    @event.listens_for(fabrica_sesiones, 'after_transaction_end')
+    def _fin_transaccion(session, transaction):
+        if transaction.parent is None:
+            _liberar_turno(session)
+
+    # Un flush fallido deshace la transacción en la base, pero la de la sesión
+    # recién termina con rollback()/close() (en el teardown del request): liberar ya
+    @event.listens_for(fabrica_sesiones, 'after_rollback')
+    def _despues_rollback(session):
+        _liberar_turno(session)
+
+    @event.listens_for(fabrica_sesiones, 'after_soft_rollback')
+    def _despues_soft_rollback(session, previous_transaction):
+        _liberar_turno(session)
+
+# ==================== ENGINE ====================
+def es_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+def crear_engine(url, **opciones):
+    """Engine con los ajustes de cada motor (pool para MySQL, PRAGMAs para SQLite)"""
+    if not es_sqlite(url):
+        return create_engine(url, pool_pre_ping=True, pool_recycle=3600, echo=False, **opciones)
+
+    nuevo = create_engine(
+        url,
+        connect_args={'check_same_thread': False, 'timeout': config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        echo=False
+    )
+
+    @event.listens_for(nuevo, 'connect')
+    def _configurar(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in _pragmas_sqlite():
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return nuevo
+
+def agregar_columna(engine_destino, columna):
+    """
+    ALTER TABLE ADD COLUMN para una columna nueva del modelo si la tabla ya
+    existía (create_all no modifica tablas existentes). Devuelve True si la agregó
+    """
+    tabla = columna.table
+    if columna.name in {c['name'] for c in inspect(engine_destino).get_columns(tabla.name)}:
+        return False
+    preparador = engine_destino.dialect.identifier_preparer
+    tipo = columna.type.compile(dialect=engine_destino.dialect)
+    with engine_destino.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE {preparador.format_table(tabla)} ADD COLUMN {preparador.format_column(columna)} {tipo} NULL"
+        ))
+        if not es_sqlite(str(engine_destino.url)):
+            # SQLite no permite agregar FOREIGN KEY a una tabla existente
+            for fk in columna.foreign_keys:
+                destino = fk.column
+                conn.execute(text(
+                    f"ALTER TABLE {preparador.format_table(tabla)} ADD FOREIGN KEY ({preparador.format_column(columna)}) "
+                    f"REFERENCES {preparador.format_table(destino.table)} ({preparador.format_column(destino)})"
+                    + (f" ON DELETE {fk.ondelete}" if fk.ondelete else "")
+                ))
+    for indice in tabla.indexes:
+        if columna.name in indice.columns:
+            indice.create(bind=engine_destino, checkfirst=True)
+    return True
+
+# ==================== RÉPLICA DE LECTURA ====================
+class RegistroEscrituras:
+    """
+    Momento de la última escritura de cada cliente. Mientras no pase la ventana
+    (REPLICA_STICKY_SEGUNDOS) sus lecturas van al primario, así ve lo que acaba
+    de guardar aunque la réplica venga atrasada
+    """
+    MAX_CLIENTES = 10000
+
+    def __init__(self, ventana):
+        self.ventana = ventana
+        self._ultimas = {}
+        self._lock = threading.Lock()
+
+    def marcar(self, cliente):
+        ahora = time.monotonic()
+        with self._lock:
+            if len(self._ultimas) >= self.MAX_CLIENTES:
+                self._ultimas = {c: t for c, t in self._ultimas.items() if ahora - t < self.ventana}
+            self._ultimas[cliente] = ahora
+
+    def reciente(self, cliente):
+        ultima = self._ultimas.get(cliente)
+        return ultima is not None and time.monotonic() - ultima < self.ventana
+
+def cliente_de(request):
+    """Identidad del cliente: su token si viene autenticado, si no su IP"""
+    autorizacion = request.headers.get('authorization')
+    if autorizacion:
+        return 'token:' + hashlib.sha1(autorizacion.encode()).hexdigest()
+    return 'ip:' + (request.client.host if request.client else '')
+
+def registrar_escrituras(fabrica_sesiones, registro):
+    """Marcar al cliente de la sesión cuando confirma una transacción con escrituras"""
+
+    @event.listens_for(fabrica_sesiones, 'before_flush')
+    def _antes_flush(session, flush_context, instances):
+        session.info['escribio'] = True
+
+    @event.listens_for(fabrica_sesiones, 'do_orm_execute')
+    def _antes_ejecutar(orm_execute_state):
+        if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+            orm_execute_state.session.info['escribio'] = True
+
+    @event.listens_for(fabrica_sesiones, 'after_commit')
+    def _despues_commit(session):
+        cliente = session.info.get('cliente')
+        if session.info.pop('escribio', False) and cliente:
+            registro.marcar(cliente)
+
+def solo_lectura(fabrica_sesiones):
+    """Impedir escrituras por error en sesiones de la réplica"""
+
+    @event.listens_for(fabrica_sesiones, 'before_flush')
+    def _antes_flush(session, flush_context, instances):
+        raise RuntimeError("Sesión de réplica de solo lectura: use get_db para escribir")
+
+engine = crear_engine(config.database_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    """Dependency para obtener sesión de base de datos"""
+cola_escritura = None
+if es_sqlite(config.database_url) and config.SQLITE_COLA_ESCRITURA:
+    cola_escritura = ColaEscritura()
+    usar_cola_escritura(SessionLocal, cola_escritura, timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000)
+
+# Sin réplica configurada las lecturas usan el mismo engine y pool que las escrituras
+engine_lectura = engine
+SessionLectura = SessionLocal
+registro_escrituras = None
+if config.DATABASE_REPLICA_URL:
+    opciones = {} if es_sqlite(config.DATABASE_REPLICA_URL) else {'pool_size': config.DB_REPLICA_POOL_SIZE}
+    engine_lectura = crear_engine(config.DATABASE_REPLICA_URL, **opciones)
+    SessionLectura = sessionmaker(autocommit=False, autoflush=False, bind=engine_lectura)
+    solo_lectura(SessionLectura)
+    registro_escrituras = RegistroEscrituras(config.REPLICA_STICKY_SEGUNDOS)
+    registrar_escrituras(SessionLocal, registro_escrituras)
+
+def get_db(request: Request):
+    """Dependency para obtener sesión de base de datos (primario)"""
     db = SessionLocal()
+    db.info['cliente'] = cliente_de(request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _lee_del_primario(request):
+    """Sin réplica, o el cliente escribió hace poco y debe ver sus cambios"""
+    return registro_escrituras is None or registro_escrituras.reciente(cliente_de(request))
+
+def get_read_engine(request: Request):
+    """
+    Dependency con el engine de lectura para consultas fuera de una sesión
+    (exportación en streaming): misma regla que get_read_db
+    """
+    return engine if _lee_del_primario(request) else engine_lectura
+
+def get_read_db(request: Request):
+    """
+    Dependency de solo lectura: réplica si está configurada, salvo que el
+    cliente haya escrito hace poco (lee del primario para ver sus cambios)
+    """
+    if _lee_del_primario(request):
+        db = SessionLocal()
+    else:
+        db = SessionLectura()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
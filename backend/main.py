@@ -1,20 +1,31 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import List, Optional
 import shutil
 import os
 from pathlib import Path
+import logging
 
 # Imports de la base de datos
-from database import SessionLocal, engine, Base, get_db
+from database import SessionLocal, engine, engine_lectura, Base, get_db, get_read_db
 import models
 import schemas
+import crud
 from config import config
+from utils.metrics import MetricsMiddleware, instrumentar_engine, exposicion
+from utils.logs import configurar_logs, RequestIdMiddleware
+from utils.eventos import publicar_rca, publicar_relacionado
+from utils import mapa_ishikawa, autocompletar
+from utils.migraciones import aplicar_migraciones
+from utils.archivado import asegurar_contadores
+from utils.file_serving import (
+    EvidenciaResponse, respuesta_comprimida, ruta_segura, archivo_a_dict, URL_CONTENIDO, EXTENSIONES_IMAGEN
+)
 
-# Crear tablas si no existen
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="RCA API - Sistema de Análisis de Causa Raíz",
@@ -22,6 +33,20 @@ app = FastAPI(
     description="API para gestión de RCA en operaciones industriales"
 )
 
+# Al iniciar y no al importar: con `python main.py` los procesos del pool de
+# trabajos (spawn) reimportan este módulo como __mp_main__ y no deben repetirlo.
+# Primer hook registrado: corre antes que el despachador de trabajos
+@app.on_event("startup")
+def preparar_base():
+    configurar_logs()
+    # Crear tablas si no existen
+    Base.metadata.create_all(bind=engine)
+    # create_all no agrega columnas ni índices nuevos a tablas que ya existían
+    aplicar_migraciones(engine)
+    # MySQL antes de 8.0 recalcula AUTO_INCREMENT al reiniciar: que no entregue ids archivados
+    with engine.begin() as conn:
+        asegurar_contadores(conn)
+
 # CORS - permitir conexiones desde tablets
 app.add_middleware(
     CORSMiddleware,
@@ -30,13 +55,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# Métricas por ruta (latencia, códigos de estado, sentencias SQL) en /metrics
+app.add_middleware(MetricsMiddleware)
+engines = [engine] if engine_lectura is engine else [engine, engine_lectura]
+for e in engines:
+    instrumentar_engine(e)
+
+# Detector de N+1 y consultas lentas (QUERY_PROFILER=true en desarrollo)
+if config.QUERY_PROFILER:
+    from utils import query_profiler
+    app.add_middleware(query_profiler.QueryProfilerMiddleware)
+    for e in engines:
+        query_profiler.instrumentar_engine(e)
+
+# X-Request-ID en cada respuesta y en los logs (último agregado = más externo)
+app.add_middleware(RequestIdMiddleware)
+
 # Incluir routers
-from routers import auth, rca
+from routers import auth, rca, reportes, trabajos, acciones, eventos, equipos, autocompletado, importaciones
 
 app.include_router(auth.router)
 app.include_router(rca.router)
 #app.include_router(archivos.router)
-#app.include_router(reportes.router)
+app.include_router(reportes.router)
+app.include_router(trabajos.router)
+app.include_router(acciones.router)
+app.include_router(eventos.router)
+app.include_router(equipos.router)
+app.include_router(autocompletado.router)
+app.include_router(importaciones.router)
+
+# Despachador de trabajos en segundo plano (pool de procesos)
+@app.on_event("startup")
+def iniciar_trabajos():
+    if config.TRABAJOS_HABILITADOS:
+        from utils.trabajos import iniciar_despachador
+        iniciar_despachador()
+
+@app.on_event("shutdown")
+def detener_trabajos():
+    from utils.trabajos import detener_despachador
+    detener_despachador()
 
 # ==================== ROOT ====================
 @app.get("/")
@@ -56,6 +116,11 @@ def health_check(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas en formato Prometheus"""
+    return PlainTextResponse(exposicion(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ==================== RCAs ====================
 @app.post("/rca", response_model=schemas.RCAResponse, status_code=201)
 def crear_rca(rca: schemas.RCACreate, db: Session = Depends(get_db)):
@@ -69,6 +134,9 @@ def crear_rca(rca: schemas.RCACreate, db: Session = Depends(get_db)):
     db.add(db_rca)
     db.commit()
     db.refresh(db_rca)
+    publicar_rca('rca_creado', db_rca)
+    mapa_ishikawa.marcar(db_rca.id)
+    autocompletar.registrar(autocompletar.valores_rca(db_rca))
     return db_rca
 
 @app.get("/rca", response_model=List[schemas.RCAResponse])
@@ -76,7 +144,7 @@ def listar_rcas(
     skip: int = 0,
     limit: int = 100,
     estado: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Listar RCAs con filtros opcionales"""
     query = db.query(models.RCA)
@@ -88,7 +156,7 @@ def listar_rcas(
     return rcas
 
 @app.get("/rca/{rca_id}")
-def obtener_rca(rca_id: int, db: Session = Depends(get_db)):
+def obtener_rca(rca_id: int, db: Session = Depends(get_read_db)):
     """Obtener RCA por ID con todos sus detalles"""
     rca = db.query(models.RCA).filter(models.RCA.id == rca_id).first()
     if not rca:
@@ -103,11 +171,15 @@ def actualizar_rca(rca_id: int, rca_update: schemas.RCAUpdate, db: Session = Dep
         raise HTTPException(status_code=404, detail="RCA no encontrado")
     
     update_data = rca_update.dict(exclude_unset=True)
+    anteriores = autocompletar.valores_rca(rca)
     for key, value in update_data.items():
         setattr(rca, key, value)
     
     db.commit()
     db.refresh(rca)
+    publicar_rca('rca_actualizado', rca)
+    mapa_ishikawa.marcar(rca.id)
+    autocompletar.registrar(autocompletar.valores_rca(rca), anteriores)
     return rca
 
 @app.delete("/rca/{rca_id}", status_code=204)
@@ -119,6 +191,9 @@ def eliminar_rca(rca_id: int, db: Session = Depends(get_db)):
     
     db.delete(rca)
     db.commit()
+    publicar_rca('rca_eliminado', rca)
+    mapa_ishikawa.marcar(rca.id)
+    autocompletar.registrar(anteriores=autocompletar.valores_rca(rca))
     return None
 
 # ==================== 5 PORQUÉS ====================
@@ -132,7 +207,7 @@ def crear_cinco_porques(porques: schemas.CincoPorquesCreate, db: Session = Depen
     return db_porques
 
 @app.get("/cinco-porques/{rca_id}")
-def obtener_cinco_porques(rca_id: int, db: Session = Depends(get_db)):
+def obtener_cinco_porques(rca_id: int, db: Session = Depends(get_read_db)):
     """Obtener 5 porqués de un RCA"""
     porques = db.query(models.CincoPorques).filter(models.CincoPorques.rca_id == rca_id).all()
     return porques
@@ -145,17 +220,18 @@ def crear_ishikawa(ishikawa: schemas.IshikawaCreate, db: Session = Depends(get_d
     db.add(db_ishikawa)
     db.commit()
     db.refresh(db_ishikawa)
+    mapa_ishikawa.marcar(db_ishikawa.rca_id)
     return db_ishikawa
 
 @app.get("/ishikawa/{rca_id}")
-def obtener_ishikawa(rca_id: int, db: Session = Depends(get_db)):
+def obtener_ishikawa(rca_id: int, db: Session = Depends(get_read_db)):
     """Obtener diagrama Ishikawa de un RCA"""
     ishikawa = db.query(models.Ishikawa).filter(models.Ishikawa.rca_id == rca_id).all()
     return ishikawa
 
 # ==================== ARCHIVOS ====================
 @app.post("/archivo/upload")
-async def subir_archivo(
+def subir_archivo(
     rca_id: int = Form(...),
     tipo_contenido: str = Form(None),
     subido_por: str = Form(None),
@@ -195,76 +271,123 @@ async def subir_archivo(
     )
     db.add(db_archivo)
     db.commit()
-    
-    # Generar URL relativa para acceder al archivo
-    ruta_relativa = ruta_completa.replace(config.ARCHIVOS_PATH, "").replace("\\", "/")
-    if ruta_relativa.startswith("/"):
-        ruta_relativa = ruta_relativa[1:]
+    publicar_relacionado(
+        'archivo_nuevo', db, rca_id,
+        archivo_id=db_archivo.id, tipo_archivo=ext, nombre_archivo=file.filename
+    )
     
     return {
         "id": db_archivo.id,
         "nombre": file.filename,
         "ruta": ruta_completa,
-        "url": f"/archivos/{ruta_relativa}",  # URL para mostrar en frontend
+        "url": URL_CONTENIDO.format(rca_id=rca_id, archivo_id=db_archivo.id),  # URL para mostrar en frontend (cacheable)
         "tamanio_kb": tamanio_kb,
         "tipo": ext
     }
 
 @app.get("/archivo")
-def listar_archivos_query(rca_id: int, db: Session = Depends(get_db)):
+def listar_archivos_query(rca_id: int, db: Session = Depends(get_read_db)):
     """Listar archivos de un RCA usando query parameter"""
-    archivos = db.query(models.Archivo).filter(models.Archivo.rca_id == rca_id).all()
+    return [archivo_a_dict(a) for a in crud.get_archivos_rca(db, rca_id, historico=True)]
+
+@app.get("/archivo/por-rca")
+def listar_archivos_por_rca(
+    rca_ids: Optional[List[int]] = Query(None, description="IDs de RCA (repetir: ?rca_ids=1&rca_ids=2)"),
+    estado: Optional[str] = None,
+    area: Optional[str] = None,
+    tipo_archivo: Optional[List[str]] = Query(None, description="Extensiones, ej: jpg, png"),
+    max_por_rca: Optional[int] = Query(None, ge=1, description="Máximo de archivos por RCA (miniaturas)"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=2000),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Listar archivos de muchos RCAs en una sola consulta, agrupados por RCA
+    
+    Pensado para las miniaturas del listado: evita una llamada por RCA.
+    """
+    if rca_ids is not None and len(rca_ids) > 500:
+        raise HTTPException(status_code=400, detail="Máximo 500 rca_ids por consulta")
     
-    # Convertir a lista con URLs para el frontend
-    resultado = []
-    for archivo in archivos:
-        # Generar URL relativa desde la ruta completa
-        ruta_relativa = archivo.ruta_archivo.replace(config.ARCHIVOS_PATH, "").replace("\\", "/")
-        if ruta_relativa.startswith("/"):
-            ruta_relativa = ruta_relativa[1:]
-        
-        resultado.append({
-            "id": archivo.id,
-            "rca_id": archivo.rca_id,
-            "nombre_archivo": archivo.nombre_archivo,
-            "ruta_archivo": archivo.ruta_archivo,
-            "url": f"/archivos/{ruta_relativa}",  # URL para mostrar imagen
-            "tipo_archivo": archivo.tipo_archivo,
-            "tipo_contenido": archivo.tipo_contenido,
-            "tamanio_kb": archivo.tamanio_kb,
-            "fecha_subida": archivo.fecha_subida,
-            "subido_por": archivo.subido_por
-        })
+    archivos = crud.get_archivos_rcas(
+        db, rca_ids=rca_ids, estado=estado, area=area,
+        tipo_archivo=[t.lower() for t in tipo_archivo] if tipo_archivo else None,
+        max_por_rca=max_por_rca, skip=skip, limit=limit + 1
+    )
+    hay_mas = len(archivos) > limit
     
-    return resultado
+    # Los RCAs pedidos sin archivos aparecen con lista vacía
+    grupos = {rca_id: [] for rca_id in rca_ids} if rca_ids else {}
+    for archivo in archivos[:limit]:
+        grupos.setdefault(archivo.rca_id, []).append(archivo_a_dict(archivo))
+    
+    return {
+        "rcas": [{"rca_id": rca_id, "archivos": lista} for rca_id, lista in grupos.items()],
+        "skip": skip,
+        "limit": limit,
+        "hay_mas": hay_mas
+    }
 
 @app.get("/archivo/{rca_id}")
-def listar_archivos_path(rca_id: int, db: Session = Depends(get_db)):
+def listar_archivos_path(rca_id: int, db: Session = Depends(get_read_db)):
     """Listar archivos de un RCA usando path parameter"""
-    archivos = db.query(models.Archivo).filter(models.Archivo.rca_id == rca_id).all()
+    return [archivo_a_dict(a) for a in crud.get_archivos_rca(db, rca_id, historico=True)]
+
+@app.api_route("/archivo/{rca_id}/{archivo_id}/contenido", methods=["GET", "HEAD"])
+def servir_archivo(rca_id: int, archivo_id: int, request: Request, db: Session = Depends(get_read_db)):
+    """
+    Servir el contenido de un archivo del RCA
     
-    # Convertir a lista con URLs para el frontend
-    resultado = []
-    for archivo in archivos:
-        # Generar URL relativa desde la ruta completa
-        ruta_relativa = archivo.ruta_archivo.replace(config.ARCHIVOS_PATH, "").replace("\\", "/")
-        if ruta_relativa.startswith("/"):
-            ruta_relativa = ruta_relativa[1:]
-        
-        resultado.append({
-            "id": archivo.id,
-            "rca_id": archivo.rca_id,
-            "nombre_archivo": archivo.nombre_archivo,
-            "ruta_archivo": archivo.ruta_archivo,
-            "url": f"/archivos/{ruta_relativa}",  # URL para mostrar imagen
-            "tipo_archivo": archivo.tipo_archivo,
-            "tipo_contenido": archivo.tipo_contenido,
-            "tamanio_kb": archivo.tamanio_kb,
-            "fecha_subida": archivo.fecha_subida,
-            "subido_por": archivo.subido_por
-        })
+    El archivo debe pertenecer al RCA indicado y estar dentro de ARCHIVOS_PATH.
+    Se envía con caché inmutable, ETag y soporte de Range (videos). Los
+    archivos de RCAs archivados también se sirven (los .gz, descomprimidos).
+    """
+    archivo = crud.get_archivo_rca(db, rca_id, archivo_id)
+    if not archivo:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    resuelto = ruta_segura(archivo.ruta_archivo, config.ARCHIVOS_PATH)
+    if not resuelto:
+        raise HTTPException(status_code=404, detail="Archivo físico no encontrado")
     
-    return resultado
+    ruta, stat_result = resuelto
+    if getattr(archivo, 'comprimido', False):
+        return respuesta_comprimida(
+            ruta, stat_result, request.headers, method=request.method, filename=archivo.nombre_archivo
+        )
+    return EvidenciaResponse(
+        ruta,
+        stat_result,
+        request.headers,
+        method=request.method,
+        filename=archivo.nombre_archivo
+    )
+
+@app.api_route("/archivo/{rca_id}/{archivo_id}/miniatura", methods=["GET", "HEAD"])
+def servir_miniatura(rca_id: int, archivo_id: int, request: Request, db: Session = Depends(get_read_db)):
+    """Servir miniatura JPEG de una foto del RCA (se genera la primera vez)"""
+    from utils.miniaturas import obtener_miniatura
+    
+    archivo = crud.get_archivo_rca(db, rca_id, archivo_id)
+    if not archivo or (archivo.tipo_archivo or '').lower() not in EXTENSIONES_IMAGEN:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    resuelto = ruta_segura(archivo.ruta_archivo, config.ARCHIVOS_PATH)
+    if not resuelto:
+        raise HTTPException(status_code=404, detail="Archivo físico no encontrado")
+    
+    try:
+        miniatura = obtener_miniatura(archivo.id, resuelto[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar miniatura: {str(e)}")
+    
+    return EvidenciaResponse(
+        miniatura,
+        os.stat(miniatura),
+        request.headers,
+        method=request.method,
+        media_type="image/jpeg"
+    )
 
 @app.delete("/archivo/{archivo_id}", status_code=204)
 def eliminar_archivo(archivo_id: int, db: Session = Depends(get_db)):
@@ -279,23 +402,27 @@ def eliminar_archivo(archivo_id: int, db: Session = Depends(get_db)):
     try:
         if os.path.exists(archivo.ruta_archivo):
             os.remove(archivo.ruta_archivo)
-            print(f" Archivo físico eliminado: {archivo.ruta_archivo}")
         else:
-            print(f" Archivo físico no existe: {archivo.ruta_archivo}")
-    except Exception as e:
-        print(f" Error al eliminar archivo físico: {e}")
+            logger.warning("Archivo físico no existe", extra={"archivo_id": archivo_id, "ruta": archivo.ruta_archivo})
+    except Exception:
+        logger.exception("Error al eliminar archivo físico", extra={"archivo_id": archivo_id, "ruta": archivo.ruta_archivo})
         # Continuar para eliminar el registro de la BD de todas formas
     
+    # Las miniaturas van por id: un archivo nuevo podría reutilizarlo
+    from utils.miniaturas import borrar_miniaturas
+    borrar_miniaturas(archivo_id)
+    
     # Eliminar registro de la base de datos
     db.delete(archivo)
     db.commit()
+    publicar_relacionado('archivo_eliminado', db, archivo.rca_id, archivo_id=archivo_id)
     
-    print(f" Registro eliminado de BD: ID {archivo_id}")
+    logger.info("Archivo eliminado", extra={"archivo_id": archivo_id, "rca_id": archivo.rca_id})
     return None
 
 # ==================== ESTADÍSTICAS ====================
 @app.get("/estadisticas/resumen")
-def obtener_estadisticas(db: Session = Depends(get_db)):
+def obtener_estadisticas(db: Session = Depends(get_read_db)):
     """Obtener resumen estadístico"""
     total_rcas = db.query(models.RCA).count()
     abiertos = db.query(models.RCA).filter(models.RCA.estado == "Abierto").count()
@@ -311,25 +438,20 @@ def obtener_estadisticas(db: Session = Depends(get_db)):
         "tasa_cierre": round(cerrados / total_rcas * 100, 2) if total_rcas > 0 else 0
     }
 
-# ==================== SERVIR ARCHIVOS ESTÁTICOS ====================
-# ESTE BLOQUE DEBE ESTAR AQUÍ - DESPUÉS DE LOS ROUTERS
-from fastapi.staticfiles import StaticFiles
-from pathlib import Path
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-ARCHIVOS_DIR = BASE_DIR / "archivos"
-
-print(f"\n{'='*50}")
-print(f"?? ARCHIVOS_DIR: {ARCHIVOS_DIR}")
-print(f"?? Existe: {ARCHIVOS_DIR.exists()}")
-print(f"{'='*50}\n")
-
-ARCHIVOS_DIR.mkdir(exist_ok=True)
-(ARCHIVOS_DIR / "fotos").mkdir(exist_ok=True)
-
-# CRÍTICO: Esto debe ser lo ÚLTIMO antes de if __name__
-app.mount("/archivos", StaticFiles(directory=str(ARCHIVOS_DIR)), name="archivos")
-print("? Endpoint /archivos configurado\n")
+# ==================== ENLACES ANTIGUOS /archivos ====================
+@app.api_route("/archivos/{ruta:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def redirigir_archivo(ruta: str, db: Session = Depends(get_read_db)):
+    """
+    Enlaces /archivos/<carpeta>/<nombre> de versiones anteriores (la carpeta ya
+    no se publica completa). Solo se resuelven rutas registradas en archivos y
+    se redirige a /archivo/{rca_id}/{archivo_id}/contenido, que hace los controles
+    """
+    archivo = crud.get_archivo_por_ruta(db, os.path.join(config.ARCHIVOS_PATH, *ruta.split('/')))
+    if archivo is None:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return RedirectResponse(
+        URL_CONTENIDO.format(rca_id=archivo.rca_id, archivo_id=archivo.id), status_code=307
+    )
 
 # ==================== INICIO DEL SERVIDOR ====================
 if __name__ == "__main__":
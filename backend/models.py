@@ -1,10 +1,61 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, DECIMAL, Enum, ForeignKey
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Date, Boolean, DECIMAL, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from database import Base
 
+# ==================== TIPOS PORTABLES ====================
+def EnumPortable(*valores):
+    """ENUM nativo en MySQL; VARCHAR con CHECK en SQLite"""
+    return Enum(*valores, create_constraint=True, length=max(len(v) for v in valores))
+
+class DecimalPortable(TypeDecorator):
+    """
+    DECIMAL en MySQL. SQLite no tiene decimales exactos (los guarda como REAL),
+    así que ahí se almacena un entero escalado (centésimas para escala 2):
+    sin pérdida de precisión y con orden y SUM numéricos.
+    """
+    impl = DECIMAL
+    cache_ok = True
+
+    def __init__(self, precision, escala):
+        super().__init__(precision, escala)
+        self.escala = escala
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(BigInteger())
+        return super().load_dialect_impl(dialect)
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        escalado = Decimal(str(value)).scaleb(self.escala)
+        return int(escalado.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        return Decimal(value).scaleb(-self.escala)
+
 class RCA(Base):
     __tablename__ = "rcas"
+    __table_args__ = (
+        # Listado y conteos por estado (el índice incluye el id: sirve para ORDER BY id)
+        Index('ix_rcas_estado', 'estado'),
+        Index('ix_rcas_criticidad', 'criticidad'),
+        # Reporte por área (cubre el conteo de cerrados) y filtros por área de exportación/archivos/acciones
+        Index('ix_rcas_area_estado', 'area', 'estado'),
+        # Vincular con el catálogo: un UPDATE por texto de equipo
+        Index('ix_rcas_equipo', 'equipo'),
+        # Exportación por rango de fechas y archivado
+        Index('ix_rcas_fecha_evento', 'fecha_evento'),
+        # Ids que nunca se reutilizan: el archivo histórico conserva los ids de las
+        # filas movidas (en SQLite sin AUTOINCREMENT se reusa el id más alto borrado)
+        {'sqlite_autoincrement': True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(50), unique=True, nullable=False)
@@ -18,6 +69,7 @@ class RCA(Base):
     area = Column(String(100))
     planta = Column(String(100))
     equipo = Column(String(150))
+    equipo_id = Column(Integer, ForeignKey('equipos.id', ondelete='SET NULL'), index=True)
     sistema = Column(String(100))
     
     descripcion_falla = Column(Text)
@@ -36,14 +88,14 @@ class RCA(Base):
     fecha_compromiso = Column(Date)
     fecha_cierre = Column(Date)
     
-    estado = Column(Enum('Abierto', 'En Análisis', 'En Implementación', 'Cerrado', 'Cancelado'), default='Abierto')
-    criticidad = Column(Enum('Crítica', 'Alta', 'Media', 'Baja'), default='Media')
+    estado = Column(EnumPortable('Abierto', 'En Análisis', 'En Implementación', 'Cerrado', 'Cancelado'), default='Abierto')
+    criticidad = Column(EnumPortable('Crítica', 'Alta', 'Media', 'Baja'), default='Media')
     
     tipo_falla = Column(String(100))
     categoria = Column(String(100))
     
-    tiempo_parada_horas = Column(DECIMAL(10, 2))
-    costo_estimado = Column(DECIMAL(15, 2))
+    tiempo_parada_horas = Column(DecimalPortable(10, 2))
+    costo_estimado = Column(DecimalPortable(15, 2))
     
     verificacion_efectividad = Column(Text)
     fecha_verificacion = Column(Date)
@@ -55,13 +107,17 @@ class RCA(Base):
     # Relaciones
     cinco_porques_rel = relationship("CincoPorques", back_populates="rca", cascade="all, delete-orphan")
     ishikawa_rel = relationship("Ishikawa", back_populates="rca", cascade="all, delete-orphan")
+    archivos_rel = relationship("Archivo", back_populates="rca", cascade="all, delete-orphan")
+    acciones_rel = relationship("Accion", back_populates="rca", cascade="all, delete-orphan")
+    comentarios_rel = relationship("Comentario", back_populates="rca", cascade="all, delete-orphan")
 
 
 class CincoPorques(Base):
     __tablename__ = "cinco_porques"
+    __table_args__ = {'sqlite_autoincrement': True}  # ids sin reuso (ver RCA)
     
     id = Column(Integer, primary_key=True)
-    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False)
+    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False, index=True)
     nivel = Column(Integer, nullable=False)
     porque = Column(Text, nullable=False)
     respuesta = Column(Text)
@@ -72,9 +128,10 @@ class CincoPorques(Base):
 
 class Ishikawa(Base):
     __tablename__ = "ishikawa"
+    __table_args__ = {'sqlite_autoincrement': True}  # ids sin reuso (ver RCA)
     
     id = Column(Integer, primary_key=True)
-    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False)
+    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False, index=True)
     categoria = Column(String(50), nullable=False)
     causa = Column(Text, nullable=False)
     sub_causa = Column(Text)
@@ -85,40 +142,58 @@ class Ishikawa(Base):
 
 class Archivo(Base):
     __tablename__ = "archivos"
+    __table_args__ = {'sqlite_autoincrement': True}  # ids sin reuso (ver RCA)
     
     id = Column(Integer, primary_key=True)
-    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False)
+    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False, index=True)
     nombre_archivo = Column(String(255), nullable=False)
-    ruta_archivo = Column(String(500), nullable=False)
+    ruta_archivo = Column(String(500), nullable=False, index=True)  # limpieza de huérfanos
     tipo_archivo = Column(String(50))
     tipo_contenido = Column(String(100))
     tamanio_kb = Column(Integer)
     fecha_subida = Column(DateTime, default=func.now())
     subido_por = Column(String(100))
+    
+    # Relación
+    rca = relationship("RCA", back_populates="archivos_rel")
 
 
 class Accion(Base):
     __tablename__ = "acciones"
+    __table_args__ = (
+        # Vencimiento de acciones y tablero por responsable
+        Index('ix_acciones_estado_compromiso', 'estado', 'fecha_compromiso'),
+        # Acciones de un responsable, ya en el orden del listado
+        Index('ix_acciones_responsable_compromiso', 'responsable', 'fecha_compromiso'),
+        {'sqlite_autoincrement': True},  # ids sin reuso (ver RCA)
+    )
     
     id = Column(Integer, primary_key=True)
-    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False)
-    tipo = Column(Enum('Correctiva', 'Preventiva'), nullable=False)
+    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False, index=True)
+    tipo = Column(EnumPortable('Correctiva', 'Preventiva'), nullable=False)
     descripcion = Column(Text, nullable=False)
     responsable = Column(String(100))
     fecha_compromiso = Column(Date)
     fecha_completada = Column(Date)
-    estado = Column(Enum('Pendiente', 'En Progreso', 'Completada', 'Vencida', 'Cancelada'), default='Pendiente')
+    estado = Column(EnumPortable('Pendiente', 'En Progreso', 'Completada', 'Vencida', 'Cancelada'), default='Pendiente')
     observaciones = Column(Text)
+    
+    # Relación
+    rca = relationship("RCA", back_populates="acciones_rel")
 
 
 class Comentario(Base):
     __tablename__ = "comentarios"
+    __table_args__ = {'sqlite_autoincrement': True}  # ids sin reuso (ver RCA)
     
     id = Column(Integer, primary_key=True)
-    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False)
+    rca_id = Column(Integer, ForeignKey('rcas.id', ondelete='CASCADE'), nullable=False, index=True)
     usuario = Column(String(100))
     comentario = Column(Text, nullable=False)
     fecha = Column(DateTime, default=func.now())
+    
+    # Relación
+    rca = relationship("RCA", back_populates="comentarios_rel")
 
 
 class Usuario(Base):
@@ -148,5 +223,78 @@ class Equipo(Base):
     sistema = Column(String(100))
     fabricante = Column(String(100))
     modelo = Column(String(100))
-    criticidad = Column(Enum('A', 'B', 'C'))
-    activo = Column(Boolean, default=True)
\ No newline at end of file
+    criticidad = Column(EnumPortable('A', 'B', 'C'))
+    activo = Column(Boolean, default=True)
+
+
+class Trabajo(Base):
+    """Trabajo en segundo plano (PDFs por lote, miniaturas, respaldos)"""
+    __tablename__ = "trabajos"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(50), nullable=False)
+    parametros = Column(Text)  # JSON
+    prioridad = Column(Integer, default=5, nullable=False)  # 0-10, mayor se ejecuta antes
+    estado = Column(EnumPortable('Pendiente', 'En Ejecución', 'Completado', 'Fallido', 'Cancelado'), default='Pendiente', nullable=False, index=True)
+    
+    intentos = Column(Integer, default=0, nullable=False)
+    max_intentos = Column(Integer, default=3, nullable=False)
+    cancelar = Column(Boolean, default=False, nullable=False)
+    
+    resultado = Column(Text)  # JSON
+    error = Column(Text)
+    creado_por = Column(String(100))
+    
+    fecha_creacion = Column(DateTime, default=func.now())
+    disponible_desde = Column(DateTime)  # espera entre reintentos
+    ejecutado_por = Column(String(100))  # despachador (host:pid) que lo tiene En Ejecución
+    latido = Column(DateTime)  # último aviso de ese despachador; vencido = se recupera
+    fecha_inicio = Column(DateTime)
+    fecha_fin = Column(DateTime)
+
+
+class Migracion(Base):
+    """Migración de esquema aplicada (utils/migraciones.py)"""
+    __tablename__ = "migraciones"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    nombre = Column(String(200), nullable=False)
+    fecha_aplicada = Column(DateTime, default=func.now())
+
+# ==================== ARCHIVO HISTÓRICO ====================
+# RCAs cerrados o cancelados antiguos se mueven a estas tablas (utils/archivado.py)
+# para que las tablas activas se mantengan chicas. Mismas columnas, ids y nombres
+# de relaciones que las activas: los serializadores sirven para ambas.
+def _modelo_archivo(nombre, modelo, unicos=(), indices=(), **atributos):
+    """
+    Clase con las columnas de `modelo` en la tabla <tabla>_archivo, sin FKs a
+    las tablas activas (rca_id apunta a rcas_archivo). `atributos` agrega
+    columnas propias y relaciones
+    """
+    atributos['__tablename__'] = f"{modelo.__tablename__}_archivo"
+    for columna in modelo.__table__.c:
+        padre = [ForeignKey('rcas_archivo.id', ondelete='CASCADE')] if columna.key == 'rca_id' else []
+        atributos[columna.key] = Column(
+            columna.type.copy(), *padre,
+            primary_key=columna.primary_key, autoincrement=False, nullable=columna.nullable,
+            unique=columna.key in unicos or None, index=bool(padre) or columna.key in indices or None
+        )
+    return type(nombre, (Base,), atributos)
+
+RCAArchivado = _modelo_archivo(
+    'RCAArchivado', RCA, unicos=('codigo',), indices=('fecha_evento', 'estado'),
+    fecha_archivado=Column(DateTime, nullable=False),
+    cinco_porques_rel=relationship("CincoPorquesArchivado", cascade="all, delete-orphan"),
+    ishikawa_rel=relationship("IshikawaArchivado", cascade="all, delete-orphan"),
+    archivos_rel=relationship("ArchivoArchivado", cascade="all, delete-orphan"),
+    acciones_rel=relationship("AccionArchivada", cascade="all, delete-orphan"),
+    comentarios_rel=relationship("ComentarioArchivado", cascade="all, delete-orphan"),
+)
+CincoPorquesArchivado = _modelo_archivo('CincoPorquesArchivado', CincoPorques)
+IshikawaArchivado = _modelo_archivo('IshikawaArchivado', Ishikawa)
+ArchivoArchivado = _modelo_archivo(
+    'ArchivoArchivado', Archivo, indices=('ruta_archivo',),
+    comprimido=Column(Boolean, default=False, nullable=False),  # ruta_archivo apunta al .gz
+)
+AccionArchivada = _modelo_archivo('AccionArchivada', Accion)
+ComentarioArchivado = _modelo_archivo('ComentarioArchivado', Comentario)
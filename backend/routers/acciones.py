@@ -0,0 +1,74 @@
+"""
+Endpoints para acciones correctivas y preventivas
+"""
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db, get_read_db
+import schemas
+import crud
+from utils.serializers import json_response, fila_a_dict, COLUMNAS_ACCION
+
+router = APIRouter(prefix="/acciones", tags=["Acciones"])
+
+@router.get("", response_model=List[schemas.AccionResponse])
+def listar_acciones(
+    rca_id: Optional[int] = None,
+    estado: Optional[schemas.EstadoAccion] = None,
+    responsable: Optional[str] = None,
+    area: Optional[str] = None,
+    vencidas: bool = Query(False, description="Solo vencidas (incluye activas atrasadas aún no marcadas)"),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """Listar acciones ordenadas por fecha de compromiso"""
+    acciones = crud.get_acciones(
+        db, rca_id=rca_id, estado=estado.value if estado else None, responsable=responsable,
+        area=area, vencidas=vencidas, skip=skip, limit=limit
+    )
+    return json_response([fila_a_dict(a, COLUMNAS_ACCION) for a in acciones])
+
+@router.get("/tablero")
+def tablero_acciones(db: Session = Depends(get_read_db)):
+    """Acciones vencidas y pendientes por responsable y área"""
+    return json_response(crud.get_tablero_acciones(db))
+
+@router.post("/marcar-vencidas")
+def marcar_vencidas(db: Session = Depends(get_db)):
+    """Marcar ahora las acciones vencidas (también corre periódicamente)"""
+    return {"fecha": date.today(), "marcadas": crud.marcar_acciones_vencidas(db)}
+
+@router.post("", response_model=schemas.AccionResponse, status_code=201)
+def crear_accion(accion: schemas.AccionCreate, db: Session = Depends(get_db)):
+    """Crear acción para un RCA"""
+    if not crud.get_rca(db, accion.rca_id):
+        raise HTTPException(status_code=404, detail="RCA no encontrado")
+    db_accion = crud.create_accion(db, accion.dict())
+    return json_response(fila_a_dict(db_accion, COLUMNAS_ACCION), status_code=201)
+
+@router.get("/{accion_id}", response_model=schemas.AccionResponse)
+def obtener_accion(accion_id: int, db: Session = Depends(get_read_db)):
+    """Obtener acción por ID"""
+    accion = crud.get_accion(db, accion_id)
+    if not accion:
+        raise HTTPException(status_code=404, detail="Acción no encontrada")
+    return json_response(fila_a_dict(accion, COLUMNAS_ACCION))
+
+@router.put("/{accion_id}", response_model=schemas.AccionResponse)
+def actualizar_accion(accion_id: int, accion_update: schemas.AccionUpdate, db: Session = Depends(get_db)):
+    """Actualizar acción"""
+    accion = crud.update_accion(db, accion_id, accion_update.dict(exclude_unset=True))
+    if not accion:
+        raise HTTPException(status_code=404, detail="Acción no encontrada")
+    return json_response(fila_a_dict(accion, COLUMNAS_ACCION))
+
+@router.delete("/{accion_id}", status_code=204)
+def eliminar_accion(accion_id: int, db: Session = Depends(get_db)):
+    """Eliminar acción"""
+    if not crud.delete_accion(db, accion_id):
+        raise HTTPException(status_code=404, detail="Acción no encontrada")
+    return None
@@ -7,14 +7,14 @@ import os
 import shutil
 from datetime import datetime
 
-from database import get_db
+from database import get_db, get_read_db
 from config import config
 import crud
 
 router = APIRouter(prefix="/archivo", tags=["Archivos"])
 
 @router.post("/upload")
-async def subir_archivo(
+def subir_archivo(
     rca_id: int = Form(...),
     tipo_contenido: str = Form(None),
     subido_por: str = Form(None),
@@ -70,6 +70,6 @@ async def subir_archivo(
     }
 
 @router.get("/{rca_id}")
-def listar_archivos(rca_id: int, db: Session = Depends(get_db)):
+def listar_archivos(rca_id: int, db: Session = Depends(get_read_db)):
     """Listar archivos de un RCA"""
     return crud.get_archivos_rca(db, rca_id)
\ No newline at end of file
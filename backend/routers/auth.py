@@ -6,12 +6,14 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import Optional
 import os
+import logging
 
 from database import get_db
 from models import Usuario
 from schemas import UsuarioLogin, UsuarioResponse, Token, UsuarioCreate
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
+logger = logging.getLogger(__name__)
 
 # Configuración
 SECRET_KEY = os.getenv("SECRET_KEY", "tu-clave-secreta-super-segura-cambiar-en-produccion")
@@ -97,7 +99,7 @@ async def verificar_permiso_admin(
 # ==================== ENDPOINTS ====================
 
 @router.post("/login", response_model=Token)
-async def login(
+def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -145,7 +147,7 @@ async def login(
     }
 
 @router.post("/registro", response_model=UsuarioResponse, status_code=status.HTTP_201_CREATED)
-async def registrar_usuario(
+def registrar_usuario(
     usuario_data: UsuarioCreate,
     db: Session = Depends(get_db),
     token: Optional[str] = Depends(oauth2_scheme)
@@ -206,7 +208,7 @@ async def registrar_usuario(
             )
     else:
         # Es el PRIMER usuario - se permite sin autenticación
-        print(f"\n🔓 Creando PRIMER usuario del sistema (sin autenticación requerida)")
+        logger.info("Creando PRIMER usuario del sistema (sin autenticación requerida)")
     
     # Verificar si el email ya existe
     if db.query(Usuario).filter(Usuario.email == usuario_data.email).first():
@@ -247,8 +249,8 @@ async def registrar_usuario(
     
     # Mensaje informativo
     if total_usuarios == 0:
-        print(f"✅ PRIMER USUARIO CREADO: {nuevo_usuario.nombre_completo} ({nuevo_usuario.email}) - Rol: {nuevo_usuario.rol}")
-        print(f"🔒 A partir de ahora se requerirá autenticación para crear más usuarios\n")
+        logger.info("PRIMER USUARIO CREADO; desde ahora se requiere autenticación para crear usuarios",
+                    extra={"usuario": nuevo_usuario.nombre_usuario, "rol": nuevo_usuario.rol})
     
     return nuevo_usuario
 
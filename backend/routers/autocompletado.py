@@ -0,0 +1,22 @@
+"""
+Endpoint de autocompletado para los formularios de las tablets
+"""
+from fastapi import APIRouter, HTTPException, Query
+
+from utils.autocompletar import autocompletado, CAMPOS
+
+router = APIRouter(prefix="/autocompletar", tags=["Autocompletado"])
+
+@router.get("/{campo}")
+def autocompletar(
+    campo: str,
+    q: str = Query("", max_length=100, description="Lo que lleva escrito el usuario"),
+    limite: int = Query(10, ge=1, le=50)
+):
+    """
+    Sugerencias para equipo, area, sistema, tipo_falla o categoria,
+    ordenadas por uso. Se responden desde memoria, sin consultar la base
+    """
+    if campo not in CAMPOS:
+        raise HTTPException(status_code=400, detail=f"Campo no soportado: {campo} (use {', '.join(CAMPOS)})")
+    return autocompletado.sugerir(campo, q, limite)
@@ -0,0 +1,90 @@
+"""
+Endpoints para el catálogo de equipos
+"""
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db, get_read_db
+import schemas
+import crud
+from utils.catalogo_equipos import catalogo, vincular_rcas, COLUMNAS_EQUIPO
+from utils.serializers import json_response, fila_a_dict
+
+router = APIRouter(prefix="/equipos", tags=["Equipos"])
+
+def _validar_codigo(codigo, equipo_id=None):
+    """Rechazar códigos equivalentes a uno existente ('STS 01' vs 'STS-01')"""
+    existente = catalogo.resolver(codigo)
+    if existente and existente['id'] != equipo_id:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Ya existe el equipo {existente['codigo_equipo']} con un código equivalente"
+        )
+
+@router.get("", response_model=List[schemas.EquipoResponse])
+def listar_equipos(
+    area: Optional[str] = None,
+    planta: Optional[str] = None,
+    activo: Optional[bool] = True,
+    skip: int = 0,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_read_db)
+):
+    """Listar catálogo de equipos (activo=None para incluir los dados de baja)"""
+    equipos = crud.get_equipos(db, area=area, planta=planta, activo=activo, skip=skip, limit=limit)
+    return json_response([fila_a_dict(e, COLUMNAS_EQUIPO) for e in equipos])
+
+@router.get("/resolver", response_model=schemas.EquipoResponse)
+def resolver_equipo(texto: str):
+    """Equipo del catálogo que corresponde a un código escrito a mano (ej: 'sts 01')"""
+    equipo = catalogo.resolver(texto)
+    if not equipo:
+        raise HTTPException(status_code=404, detail="Equipo no encontrado")
+    return equipo
+
+@router.post("/vincular-rcas")
+def vincular_equipos_rcas(aplicar: bool = Query(True, description="false para solo ver qué se vincularía"), db: Session = Depends(get_db)):
+    """Vincular en bloque los RCAs sin equipo_id a partir de su texto de equipo"""
+    resultado = vincular_rcas(db, aplicar=aplicar)
+    return {
+        "vinculados": resultado["vinculados"],
+        "sin_resolver": [
+            {"equipo": texto, "rcas": rcas}
+            for texto, rcas in sorted(resultado["sin_resolver"].items(), key=lambda x: -x[1])
+        ],
+    }
+
+@router.post("", response_model=schemas.EquipoResponse, status_code=201)
+def crear_equipo(equipo: schemas.EquipoCreate, db: Session = Depends(get_db)):
+    """Agregar equipo al catálogo"""
+    _validar_codigo(equipo.codigo_equipo)
+    db_equipo = crud.create_equipo(db, equipo.dict())
+    return json_response(fila_a_dict(db_equipo, COLUMNAS_EQUIPO), status_code=201)
+
+@router.get("/{equipo_id}", response_model=schemas.EquipoResponse)
+def obtener_equipo(equipo_id: int, db: Session = Depends(get_read_db)):
+    """Obtener equipo por ID"""
+    equipo = crud.get_equipo(db, equipo_id)
+    if not equipo:
+        raise HTTPException(status_code=404, detail="Equipo no encontrado")
+    return json_response(fila_a_dict(equipo, COLUMNAS_EQUIPO))
+
+@router.put("/{equipo_id}", response_model=schemas.EquipoResponse)
+def actualizar_equipo(equipo_id: int, equipo_update: schemas.EquipoUpdate, db: Session = Depends(get_db)):
+    """Actualizar equipo"""
+    datos = equipo_update.dict(exclude_unset=True)
+    if datos.get('codigo_equipo'):
+        _validar_codigo(datos['codigo_equipo'], equipo_id)
+    equipo = crud.update_equipo(db, equipo_id, datos)
+    if not equipo:
+        raise HTTPException(status_code=404, detail="Equipo no encontrado")
+    return json_response(fila_a_dict(equipo, COLUMNAS_EQUIPO))
+
+@router.delete("/{equipo_id}", status_code=204)
+def eliminar_equipo(equipo_id: int, db: Session = Depends(get_db)):
+    """Dar de baja un equipo (los RCAs vinculados lo conservan)"""
+    if not crud.desactivar_equipo(db, equipo_id):
+        raise HTTPException(status_code=404, detail="Equipo no encontrado")
+    return None
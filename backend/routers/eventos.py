@@ -0,0 +1,76 @@
+"""
+Feed en vivo de cambios de RCAs (Server-Sent Events)
+
+Reemplaza el polling de /estadisticas/resumen y GET /rca en las pantallas de
+supervisión: el cliente abre un EventSource y recibe rca_creado,
+rca_actualizado, rca_eliminado, archivo_nuevo, archivo_eliminado y
+comentario_nuevo a medida que ocurren.
+"""
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from config import config
+from utils.eventos import bus, Suscripcion, DESCARTADA, TIPOS_EVENTO
+from utils.serializers import dumps
+
+router = APIRouter(prefix="/eventos", tags=["Eventos"])
+
+def _formatear(evento):
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (evento['id'], evento['tipo'].encode(), dumps(evento))
+
+@router.get("/rca")
+async def feed_rca(
+    request: Request,
+    area: Optional[List[str]] = Query(None, description="Solo eventos de estas áreas"),
+    planta: Optional[List[str]] = Query(None, description="Solo eventos de estas plantas"),
+    tipos: Optional[List[str]] = Query(None, description=f"Tipos de evento: {', '.join(TIPOS_EVENTO)}")
+):
+    """
+    Stream de eventos de RCAs filtrado por área, planta y tipo.
+
+    Al reconectar, EventSource manda Last-Event-ID y se reenvían los eventos
+    perdidos que sigan en el historial. Un cliente que no alcanza a leer se
+    desconecta en lugar de acumular eventos en memoria.
+    """
+    desconocidos = set(tipos or ()) - set(TIPOS_EVENTO)
+    if desconocidos:
+        raise HTTPException(status_code=400, detail=f"Tipos de evento desconocidos: {', '.join(sorted(desconocidos))}")
+
+    suscripcion = Suscripcion(
+        asyncio.get_running_loop(), areas=area, plantas=planta, tipos=tipos, max_cola=config.EVENTOS_MAX_COLA
+    )
+    if not bus.suscribir(suscripcion):
+        raise HTTPException(status_code=503, detail="Demasiados clientes conectados al feed")
+
+    ultimo_id = request.headers.get('last-event-id', '')
+    perdidos = bus.pendientes_desde(int(ultimo_id), suscripcion) if ultimo_id.isdigit() else []
+
+    async def eventos():
+        try:
+            yield b"retry: 3000\n\n"
+            for evento in perdidos:
+                yield _formatear(evento)
+            while True:
+                try:
+                    evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=config.EVENTOS_PING_SEG)
+                except asyncio.TimeoutError:
+                    # Mantener viva la conexión a través de proxies
+                    yield b": ping\n\n"
+                    continue
+                if evento is DESCARTADA:
+                    yield b"event: desconectado\ndata: {\"motivo\":\"cliente lento\"}\n\n"
+                    break
+                if perdidos and evento['id'] <= perdidos[-1]['id']:
+                    continue
+                yield _formatear(evento)
+        finally:
+            bus.desuscribir(suscripcion)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,65 @@
+"""
+Endpoints para importar RCAs históricos desde CSV o Excel
+
+El archivo se guarda en IMPORTACIONES_PATH (junto a su checkpoint y su
+reporte de errores) y se procesa como trabajo en segundo plano (tipo
+importar_rcas); el avance y el resumen se consultan en /trabajos/{id}.
+"""
+import os
+import shutil
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from config import config
+from database import get_db
+import models
+import schemas
+from utils import trabajos
+from utils.importar import EXTENSIONES_EXCEL, openpyxl
+
+router = APIRouter(prefix="/importaciones", tags=["Importaciones"])
+
+@router.post("", response_model=schemas.TrabajoResponse, status_code=202)
+def importar_rcas(
+    file: UploadFile = File(...),
+    hoja: str = Form(None),
+    tamanio_lote: int = Form(1000),
+    creado_por: str = Form(None),
+    db: Session = Depends(get_db)
+):
+    """Subir un CSV/XLSX de RCAs históricos y encolar su importación"""
+    nombre = os.path.basename(file.filename or '')
+    ext = os.path.splitext(nombre)[1].lower()
+    if ext not in ('.csv', '.txt') + EXTENSIONES_EXCEL:
+        raise HTTPException(status_code=400, detail="Formato no soportado (use CSV o XLSX)")
+    if ext in EXTENSIONES_EXCEL and openpyxl is None:
+        raise HTTPException(status_code=400, detail="El servidor no tiene openpyxl instalado: suba el archivo como CSV")
+    if not 100 <= tamanio_lote <= 20000:
+        raise HTTPException(status_code=400, detail="tamanio_lote debe estar entre 100 y 20000")
+
+    # Con microsegundos: dos subidas del mismo archivo en el mismo segundo no se pisan
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    ruta = os.path.join(config.IMPORTACIONES_PATH, f"{timestamp}_{nombre}")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    trabajo = trabajos.crear_trabajo(
+        db, 'importar_rcas', {'ruta': ruta, 'tamanio_lote': tamanio_lote, 'hoja': hoja},
+        prioridad=4, creado_por=creado_por
+    )
+    return trabajos.trabajo_a_dict(trabajo)
+
+@router.get("/{trabajo_id}/errores")
+def reporte_errores(trabajo_id: int, db: Session = Depends(get_db)):
+    """CSV con las filas rechazadas de una importación (fila, código, campo, error)"""
+    trabajo = db.get(models.Trabajo, trabajo_id)
+    if trabajo is None or trabajo.tipo != 'importar_rcas':
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    ruta = trabajos.trabajo_a_dict(trabajo)['parametros']['ruta'] + '.errores.csv'
+    if not os.path.exists(ruta):
+        raise HTTPException(status_code=404, detail="La importación no tiene errores registrados")
+    return FileResponse(ruta, media_type='text/csv', filename=os.path.basename(ruta))
@@ -1,67 +1,130 @@
 """
 Endpoints para gestión de RCAs
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import logging
 
-from database import get_db
+from database import get_db, get_read_db
 import schemas
 import crud
+from utils.file_serving import archivo_a_dict
+from utils.serializers import (
+    json_response, rca_a_dict, fila_a_dict, cinco_porques_a_lista, ishikawa_a_dict,
+    COLUMNAS_RESUMEN, COLUMNAS_CINCO_PORQUES, COLUMNAS_ISHIKAWA, COLUMNAS_ACCION, COLUMNAS_COMENTARIO
+)
 
 router = APIRouter(prefix="/rca", tags=["RCA"])
+logger = logging.getLogger(__name__)
 
-def convert_rca_to_response(db_rca):
-    """Convertir RCA con relaciones a formato JSON"""
-    # Convertir cinco_porques a lista
-    cinco_porques_list = None
-    if hasattr(db_rca, 'cinco_porques_rel') and db_rca.cinco_porques_rel:
-        cinco_porques_list = [cp.respuesta for cp in sorted(db_rca.cinco_porques_rel, key=lambda x: x.nivel)]
-    
-    # Convertir ishikawa a diccionario
-    ishikawa_dict = None
-    if hasattr(db_rca, 'ishikawa_rel') and db_rca.ishikawa_rel:
-        ishikawa_dict = {}
-        for ish in db_rca.ishikawa_rel:
-            if ish.categoria not in ishikawa_dict:
-                ishikawa_dict[ish.categoria] = []
-            ishikawa_dict[ish.categoria].append(ish.causa)
-    
-    # Crear respuesta
-    response = schemas.RCAResponse.from_orm(db_rca)
-    response.cinco_porques = cinco_porques_list
-    response.ishikawa = ishikawa_dict
-    return response
+CAMPOS_RCA = set(schemas.RCAResponse.model_fields)
+
+def convert_rca_to_fields(db_rca, campos):
+    """Convertir RCA a dict solo con los campos pedidos (fields=)"""
+    resultado = {"id": db_rca.id}
+    for campo in campos:
+        if campo == 'cinco_porques':
+            resultado[campo] = cinco_porques_a_lista(db_rca)
+        elif campo == 'ishikawa':
+            resultado[campo] = ishikawa_a_dict(db_rca)
+        else:
+            resultado[campo] = getattr(db_rca, campo)
+    return resultado
+
+def parse_fields(fields: Optional[str]):
+    """Validar parámetro fields=a,b,c contra los campos de RCAResponse"""
+    if not fields:
+        return None
+    campos = [c.strip() for c in fields.split(',') if c.strip()]
+    invalidos = [c for c in campos if c not in CAMPOS_RCA]
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(invalidos)}")
+    return list(dict.fromkeys(campos))
 
 @router.post("", response_model=schemas.RCAResponse, status_code=201)
 def crear_rca(rca: schemas.RCACreate, db: Session = Depends(get_db)):
     """Crear nuevo RCA"""
     # Verificar si código ya existe
-    existe = crud.get_rca_by_codigo(db, rca.codigo)
+    existe = crud.get_rca_by_codigo(db, rca.codigo, historico=True)
     if existe:
         raise HTTPException(status_code=400, detail="Código RCA ya existe")
     
-    db_rca = crud.create_rca(db, rca.dict())
-    return convert_rca_to_response(db_rca)
+    try:
+        db_rca = crud.create_rca(db, rca.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(rca_a_dict(db_rca), status_code=201)
 
 @router.get("", response_model=List[schemas.RCAResponse])
 def listar_rcas(
     skip: int = 0,
     limit: int = 100,
     estado: Optional[str] = None,
-    db: Session = Depends(get_db)
+    equipo_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma, ej: codigo,titulo,estado"),
+    vista: Optional[str] = Query(None, description="'resumen' para filas compactas del listado"),
+    historico: bool = Query(False, description="Listar el archivo histórico (cerrados/cancelados antiguos)"),
+    db: Session = Depends(get_read_db)
 ):
-    """Listar RCAs con filtros opcionales"""
-    rcas = crud.get_rcas(db, skip, limit, estado)
-    return [convert_rca_to_response(rca) for rca in rcas]
+    """
+    Listar RCAs con filtros opcionales
+    
+    Con fields= o vista=resumen solo se leen de la base las columnas pedidas,
+    lo que reduce la consulta, la carga del ORM y el JSON de respuesta.
+    Con historico=true se listan los RCAs archivados (mismos filtros y vistas).
+    """
+    if vista == 'resumen':
+        rcas = crud.get_rcas(
+            db, skip, limit, estado, columnas=list(COLUMNAS_RESUMEN), equipo_id=equipo_id, historico=historico
+        )
+        return json_response([fila_a_dict(rca, COLUMNAS_RESUMEN) for rca in rcas])
+    if vista not in (None, 'completa'):
+        raise HTTPException(status_code=400, detail="vista debe ser 'resumen' o 'completa'")
+    
+    campos = parse_fields(fields)
+    if campos is not None:
+        rcas = crud.get_rcas(db, skip, limit, estado, columnas=campos, equipo_id=equipo_id, historico=historico)
+        return json_response([convert_rca_to_fields(rca, campos) for rca in rcas])
+    
+    rcas = crud.get_rcas(db, skip, limit, estado, equipo_id=equipo_id, historico=historico)
+    return json_response([rca_a_dict(rca) for rca in rcas])
 
 @router.get("/{rca_id}", response_model=schemas.RCAResponse)
-def obtener_rca(rca_id: int, db: Session = Depends(get_db)):
-    """Obtener RCA por ID"""
-    rca = crud.get_rca(db, rca_id)
+def obtener_rca(rca_id: int, db: Session = Depends(get_read_db)):
+    """Obtener RCA por ID (si no está entre los activos se busca en el archivo histórico)"""
+    rca = crud.get_rca(db, rca_id, historico=True)
     if not rca:
         raise HTTPException(status_code=404, detail="RCA no encontrado")
-    return convert_rca_to_response(rca)
+    return json_response(rca_a_dict(rca))
+
+@router.get("/{rca_id}/bundle", response_model=schemas.RCABundleResponse)
+def obtener_rca_bundle(
+    rca_id: int,
+    incluir_miniaturas: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Obtener RCA completo en una sola llamada: datos del RCA, 5 porqués,
+    Ishikawa, archivos (con URLs), acciones y comentarios
+    """
+    rca = crud.get_rca_bundle(db, rca_id, historico=True)
+    if not rca:
+        raise HTTPException(status_code=404, detail="RCA no encontrado")
+    
+    return json_response({
+        "rca": rca_a_dict(rca),
+        "cinco_porques": [
+            fila_a_dict(cp, COLUMNAS_CINCO_PORQUES) for cp in sorted(rca.cinco_porques_rel, key=lambda x: x.nivel)
+        ],
+        "ishikawa": [fila_a_dict(ish, COLUMNAS_ISHIKAWA) for ish in rca.ishikawa_rel],
+        "archivos": [archivo_a_dict(a, incluir_miniatura=incluir_miniaturas) for a in rca.archivos_rel],
+        "acciones": [fila_a_dict(a, COLUMNAS_ACCION) for a in sorted(rca.acciones_rel, key=lambda x: x.id)],
+        "comentarios": [
+            fila_a_dict(c, COLUMNAS_COMENTARIO)
+            for c in sorted(rca.comentarios_rel, key=lambda x: (x.fecha is None, x.fecha, x.id))
+        ]
+    })
 
 @router.put("/{rca_id}", response_model=schemas.RCAResponse)
 def actualizar_rca(
@@ -72,18 +135,21 @@ def actualizar_rca(
     """Actualizar RCA"""
     update_dict = rca_update.dict(exclude_unset=True)
     
-    # Debug: Ver qué campos se están actualizando
-    print(f"\n🔧 UPDATE RCA {rca_id}")
-    print(f"📋 Campos recibidos: {list(update_dict.keys())}")
-    if 'fecha_compromiso' in update_dict:
-        print(f"📅 fecha_compromiso: {update_dict['fecha_compromiso']}")
-    else:
-        print(f"⚠️ fecha_compromiso NO está en el request")
+    # Debug: Ver qué campos se están actualizando (LOG_NIVELES=routers.rca=DEBUG)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Actualizando RCA", extra={
+            "rca_id": rca_id,
+            "campos": list(update_dict.keys()),
+            "fecha_compromiso": update_dict.get('fecha_compromiso'),
+        })
     
-    rca = crud.update_rca(db, rca_id, update_dict)
+    try:
+        rca = crud.update_rca(db, rca_id, update_dict)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not rca:
         raise HTTPException(status_code=404, detail="RCA no encontrado")
-    return convert_rca_to_response(rca)
+    return json_response(rca_a_dict(rca))
 
 @router.delete("/{rca_id}", status_code=204)
 def eliminar_rca(rca_id: int, db: Session = Depends(get_db)):
@@ -103,9 +169,9 @@ def agregar_cinco_porques(
     return crud.create_cinco_porque(db, porques.dict())
 
 @router.get("/{rca_id}/cinco-porques")
-def obtener_cinco_porques(rca_id: int, db: Session = Depends(get_db)):
+def obtener_cinco_porques(rca_id: int, db: Session = Depends(get_read_db)):
     """Obtener 5 porqués de un RCA"""
-    return crud.get_cinco_porques(db, rca_id)
+    return crud.get_cinco_porques(db, rca_id, historico=True)
 
 @router.post("/{rca_id}/ishikawa")
 def agregar_ishikawa(
@@ -118,6 +184,17 @@ def agregar_ishikawa(
     return crud.create_ishikawa(db, ishikawa.dict())
 
 @router.get("/{rca_id}/ishikawa")
-def obtener_ishikawa(rca_id: int, db: Session = Depends(get_db)):
+def obtener_ishikawa(rca_id: int, db: Session = Depends(get_read_db)):
     """Obtener diagrama Ishikawa"""
-    return crud.get_ishikawa(db, rca_id)
\ No newline at end of file
+    return crud.get_ishikawa(db, rca_id, historico=True)
+
+@router.post("/{rca_id}/comentarios", response_model=schemas.ComentarioResponse, status_code=201)
+def agregar_comentario(
+    rca_id: int,
+    comentario: schemas.ComentarioCreate,
+    db: Session = Depends(get_db)
+):
+    """Agregar comentario al RCA"""
+    if not crud.get_rca(db, rca_id):
+        raise HTTPException(status_code=404, detail="RCA no encontrado")
+    return crud.create_comentario(db, {**comentario.dict(), "rca_id": rca_id})
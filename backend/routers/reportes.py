@@ -1,22 +1,28 @@
 """
 Endpoints para reportes y estadísticas
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi import HTTPException
-from database import get_db
+from datetime import datetime, date
+from typing import Optional
+from database import get_read_db, get_read_engine
 import crud
+from utils.mapa_ishikawa import mapa as mapa_ishikawa, mapa_historico, DIMENSIONES
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
 @router.get("/estadisticas")
-def obtener_estadisticas(db: Session = Depends(get_db)):
+def obtener_estadisticas(
+    historico: bool = Query(False, description="Incluir los RCAs del archivo histórico"),
+    db: Session = Depends(get_read_db)
+):
     """Obtener resumen estadístico general"""
-    return crud.get_estadisticas(db)
+    return crud.get_estadisticas(db, historico)
 
 @router.get("/por-area")
-def estadisticas_por_area(db: Session = Depends(get_db)):
+def estadisticas_por_area(db: Session = Depends(get_read_db)):
     """Estadísticas agrupadas por área"""
     from sqlalchemy import func
     import models
@@ -38,39 +44,23 @@ def estadisticas_por_area(db: Session = Depends(get_db)):
     ]
 
 @router.get("/rca/{rca_id}/pdf")
-def generar_pdf_rca(rca_id: int, db: Session = Depends(get_db)):
+def generar_pdf_rca(rca_id: int, db: Session = Depends(get_read_db)):
     """Generar PDF de un RCA"""
-    from utils.pdf_generator import generar_reporte_rca
+    from utils.pdf_generator import generar_reporte_rca, datos_reporte_rca, ruta_pdf_rca
     import crud
     import os
-    from config import config
     
     # Obtener RCA
-    rca = crud.get_rca(db, rca_id)
+    rca = crud.get_rca(db, rca_id, historico=True)
     if not rca:
         raise HTTPException(status_code=404, detail="RCA no encontrado")
     
-    # Convertir a dict
-    rca_dict = {
-        "codigo": rca.codigo or "N/A",
-        "titulo": rca.titulo or "N/A",
-        "fecha_evento": str(rca.fecha_evento) if rca.fecha_evento else "N/A",
-        "area": rca.area or "N/A",
-        "equipo": rca.equipo or "N/A",
-        "criticidad": rca.criticidad or "N/A",
-        "estado": rca.estado or "N/A",
-        "responsable": rca.responsable or "N/A",
-        "descripcion_falla": rca.descripcion_falla or "N/A",
-        "causa_raiz": rca.causa_raiz or "N/A",
-        "acciones_correctivas": rca.acciones_correctivas or "N/A"
-    }
-    
     # Generar PDF
-    pdf_path = os.path.join(config.ARCHIVOS_PATH, 'pdfs', f'RCA_{rca.codigo}.pdf')
+    pdf_path = ruta_pdf_rca(rca.codigo)
     os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
     
     try:
-        generar_reporte_rca(rca_dict, pdf_path)
+        generar_reporte_rca(datos_reporte_rca(rca), pdf_path)
         return FileResponse(
             pdf_path,
             media_type='application/pdf',
@@ -80,7 +70,7 @@ def generar_pdf_rca(rca_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error al generar PDF: {str(e)}")
 
 @router.get("/por-criticidad")
-def estadisticas_por_criticidad(db: Session = Depends(get_db)):
+def estadisticas_por_criticidad(db: Session = Depends(get_read_db)):
     """Estadísticas por nivel de criticidad"""
     from sqlalchemy import func
     import models
@@ -90,4 +80,57 @@ def estadisticas_por_criticidad(db: Session = Depends(get_db)):
         func.count(models.RCA.id).label('total')
     ).group_by(models.RCA.criticidad).all()
     
-    return [{"criticidad": r.criticidad, "total": r.total} for r in resultado]
\ No newline at end of file
+    return [{"criticidad": r.criticidad, "total": r.total} for r in resultado]
+
+@router.get("/ishikawa/mapa")
+def mapa_calor_ishikawa(
+    dimension: str = Query("area", description=f"Eje del mapa: {', '.join(DIMENSIONES)}"),
+    top: int = Query(5, ge=1, le=20, description="Causas recurrentes por celda"),
+    refrescar: bool = Query(False, description="Recalcular todo en lugar de usar el caché"),
+    historico: bool = Query(False, description="Incluir los RCAs del archivo histórico")
+):
+    """
+    Mapa de calor de categorías Ishikawa entre todos los RCAs: nº de RCAs por
+    categoría y área/equipo/mes, con las causas más repetidas de cada celda
+    (causas con redacción distinta pero equivalente se cuentan juntas).
+    Con historico=true se incluyen los RCAs archivados
+    """
+    try:
+        mapa = mapa_historico if historico else mapa_ishikawa
+        return mapa.matriz(dimension, top=top, refrescar=refrescar)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/exportar")
+def exportar_rcas(
+    formato: str = Query("csv", description="csv, ndjson o parquet"),
+    estado: Optional[str] = None,
+    area: Optional[str] = None,
+    equipo_id: Optional[int] = None,
+    desde: Optional[date] = Query(None, description="Fecha de evento desde (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fecha de evento hasta (exclusive)"),
+    separador: str = Query(",", pattern="^[,;\t]$", description="Separador CSV (';' para Excel en español)"),
+    historico: bool = Query(False, description="Incluir los RCAs del archivo histórico"),
+    motor=Depends(get_read_engine)
+):
+    """
+    Exportar RCAs con sus 5 porqués e Ishikawa en streaming: se envía por
+    bloques a medida que se lee, sin cargar todos los RCAs en memoria.
+    Con historico=true se incluyen los RCAs archivados
+    """
+    from utils import exportar
+    
+    if not exportar.formato_disponible(formato):
+        detalle = "Parquet requiere instalar pyarrow" if formato == 'parquet' else "formato debe ser csv, ndjson o parquet"
+        raise HTTPException(status_code=400, detail=detalle)
+    
+    tipo, extension = exportar.FORMATOS[formato]
+    nombre = f"rcas_{datetime.now().strftime('%Y%m%d_%H%M')}.{extension}"
+    return StreamingResponse(
+        exportar.exportar(
+            formato, motor, separador=separador,
+            estado=estado, area=area, equipo_id=equipo_id, desde=desde, hasta=hasta, historico=historico
+        ),
+        media_type=tipo,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
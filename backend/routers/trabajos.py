@@ -0,0 +1,117 @@
+"""
+Endpoints para trabajos en segundo plano
+"""
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+# Los trabajos cambian de estado a cada rato: siempre se leen del primario
+from database import get_db, SessionLocal
+import models
+import schemas
+from utils import trabajos
+from utils.serializers import dumps
+
+router = APIRouter(prefix="/trabajos", tags=["Trabajos"])
+
+def _obtener(db: Session, trabajo_id: int):
+    trabajo = db.get(models.Trabajo, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+@router.post("", response_model=schemas.TrabajoResponse, status_code=202)
+def crear_trabajo(datos: schemas.TrabajoCreate, db: Session = Depends(get_db)):
+    """
+    Encolar un trabajo. Tipos: backup_completo, reportes_pdf (rca_ids) y
+    miniaturas (rca_id, ancho opcionales). Los demás tipos internos no se
+    pueden encolar desde aquí
+    """
+    esquema = schemas.PARAMETROS_TRABAJOS.get(datos.tipo)
+    if esquema is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo no disponible; use uno de: {', '.join(schemas.PARAMETROS_TRABAJOS)}"
+        )
+    try:
+        parametros = esquema.model_validate(datos.parametros).model_dump(exclude_none=True)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False))
+    try:
+        trabajo = trabajos.crear_trabajo(
+            db, datos.tipo, parametros, prioridad=datos.prioridad, max_intentos=datos.max_intentos
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return trabajos.trabajo_a_dict(trabajo)
+
+@router.get("", response_model=List[schemas.TrabajoResponse])
+def listar_trabajos(
+    estado: Optional[str] = None,
+    tipo: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Listar trabajos, los más recientes primero"""
+    consulta = db.query(models.Trabajo)
+    if estado:
+        consulta = consulta.filter(models.Trabajo.estado == estado)
+    if tipo:
+        consulta = consulta.filter(models.Trabajo.tipo == tipo)
+    return [
+        trabajos.trabajo_a_dict(t)
+        for t in consulta.order_by(models.Trabajo.id.desc()).offset(skip).limit(limit).all()
+    ]
+
+@router.get("/{trabajo_id}", response_model=schemas.TrabajoResponse)
+def obtener_trabajo(trabajo_id: int, db: Session = Depends(get_db)):
+    """Estado de un trabajo"""
+    return trabajos.trabajo_a_dict(_obtener(db, trabajo_id))
+
+@router.post("/{trabajo_id}/cancelar", response_model=schemas.TrabajoResponse)
+def cancelar_trabajo(trabajo_id: int, db: Session = Depends(get_db)):
+    """Cancelar un trabajo pendiente o en ejecución"""
+    _obtener(db, trabajo_id)
+    if not trabajos.cancelar_trabajo(db, trabajo_id):
+        raise HTTPException(status_code=409, detail="El trabajo ya terminó")
+    db.expire_all()
+    return trabajos.trabajo_a_dict(_obtener(db, trabajo_id))
+
+def _leer_estado(trabajo_id: int):
+    db = SessionLocal()
+    try:
+        trabajo = db.get(models.Trabajo, trabajo_id)
+        return trabajos.trabajo_a_dict(trabajo) if trabajo else None
+    finally:
+        db.close()
+
+@router.get("/{trabajo_id}/stream")
+async def seguir_trabajo(trabajo_id: int, request: Request, intervalo: float = Query(1.0, ge=0.2, le=30)):
+    """Server-Sent Events con cada cambio de estado hasta que el trabajo termina"""
+    if await run_in_threadpool(_leer_estado, trabajo_id) is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    async def eventos():
+        anterior = None
+        while not await request.is_disconnected():
+            datos = await run_in_threadpool(_leer_estado, trabajo_id)
+            if datos is None:
+                break
+            if datos != anterior:
+                yield b"event: estado\ndata: " + dumps(datos) + b"\n\n"
+                anterior = datos
+            if datos["estado"] in trabajos.ESTADOS_FINALES:
+                break
+            await asyncio.sleep(intervalo)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from datetime import datetime, date
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any
 from enum import Enum
 
 class EstadoRCA(str, Enum):
@@ -16,6 +16,17 @@ class CriticidadRCA(str, Enum):
     MEDIA = "Media"
     BAJA = "Baja"
 
+class TipoAccion(str, Enum):
+    CORRECTIVA = "Correctiva"
+    PREVENTIVA = "Preventiva"
+
+class EstadoAccion(str, Enum):
+    PENDIENTE = "Pendiente"
+    EN_PROGRESO = "En Progreso"
+    COMPLETADA = "Completada"
+    VENCIDA = "Vencida"
+    CANCELADA = "Cancelada"
+
 class RCACreate(BaseModel):
     codigo: str = Field(..., max_length=50)
     titulo: str = Field(..., max_length=200)
@@ -23,6 +34,7 @@ class RCACreate(BaseModel):
     fecha_evento: datetime
     area: Optional[str] = None
     equipo: Optional[str] = None
+    equipo_id: Optional[int] = None
     descripcion_falla: Optional[str] = None
     criticidad: CriticidadRCA = CriticidadRCA.MEDIA
     creado_por: Optional[str] = None
@@ -31,6 +43,34 @@ class RCACreate(BaseModel):
     cinco_porques: Optional[List[str]] = None
     ishikawa: Optional[Dict[str, List[str]]] = None
 
+class RCAImport(RCACreate):
+    """Fila de una importación histórica: RCACreate más los datos de seguimiento"""
+    planta: Optional[str] = None
+    sistema: Optional[str] = None
+    impacto: Optional[str] = None
+    metodo_analisis: Optional[str] = None
+    causa_inmediata: Optional[str] = None
+    causa_raiz: Optional[str] = None
+    causas_contribuyentes: Optional[str] = None
+    acciones_correctivas: Optional[str] = None
+    acciones_preventivas: Optional[str] = None
+    responsable: Optional[str] = None
+    area_responsable: Optional[str] = None
+    fecha_creacion: Optional[datetime] = None
+    fecha_compromiso: Optional[date] = None
+    fecha_cierre: Optional[date] = None
+    estado: EstadoRCA = EstadoRCA.ABIERTO
+    tipo_falla: Optional[str] = None
+    categoria: Optional[str] = None
+    tiempo_parada_horas: Optional[float] = None
+    costo_estimado: Optional[float] = None
+    verificacion_efectividad: Optional[str] = None
+    fecha_verificacion: Optional[date] = None
+    efectivo: Optional[bool] = None
+    
+    class Config:
+        use_enum_values = True
+
 class RCAUpdate(BaseModel):
     # Campos principales
     titulo: Optional[str] = None
@@ -40,6 +80,7 @@ class RCAUpdate(BaseModel):
     area: Optional[str] = None
     planta: Optional[str] = None
     equipo: Optional[str] = None
+    equipo_id: Optional[int] = None
     sistema: Optional[str] = None
     
     # Descripción del problema
@@ -102,6 +143,7 @@ class RCAResponse(BaseModel):
     area: Optional[str] = None
     planta: Optional[str] = None
     equipo: Optional[str] = None
+    equipo_id: Optional[int] = None
     sistema: Optional[str] = None
     
     # Descripción del problema
@@ -152,6 +194,113 @@ class RCAResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class RCAResumen(BaseModel):
+    """Fila compacta para la pantalla de listado"""
+    id: int
+    codigo: str
+    titulo: str
+    estado: str
+    criticidad: str
+    fecha_evento: datetime
+    
+    class Config:
+        from_attributes = True
+
+class CincoPorquesResponse(BaseModel):
+    id: int
+    rca_id: int
+    nivel: int
+    porque: str
+    respuesta: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class IshikawaResponse(BaseModel):
+    id: int
+    rca_id: int
+    categoria: str
+    causa: str
+    sub_causa: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class ArchivoResponse(BaseModel):
+    id: int
+    rca_id: int
+    nombre_archivo: str
+    ruta_archivo: str
+    url: str
+    url_miniatura: Optional[str] = None
+    tipo_archivo: Optional[str] = None
+    tipo_contenido: Optional[str] = None
+    tamanio_kb: Optional[int] = None
+    fecha_subida: Optional[datetime] = None
+    subido_por: Optional[str] = None
+
+class AccionResponse(BaseModel):
+    id: int
+    rca_id: int
+    tipo: str
+    descripcion: str
+    responsable: Optional[str] = None
+    fecha_compromiso: Optional[date] = None
+    fecha_completada: Optional[date] = None
+    estado: Optional[str] = None
+    observaciones: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+class AccionCreate(BaseModel):
+    rca_id: int
+    tipo: TipoAccion
+    descripcion: str
+    responsable: Optional[str] = Field(None, max_length=100)
+    fecha_compromiso: Optional[date] = None
+    fecha_completada: Optional[date] = None
+    estado: EstadoAccion = "Pendiente"
+    observaciones: Optional[str] = None
+    
+    class Config:
+        use_enum_values = True
+
+class AccionUpdate(BaseModel):
+    tipo: Optional[TipoAccion] = None
+    descripcion: Optional[str] = None
+    responsable: Optional[str] = Field(None, max_length=100)
+    fecha_compromiso: Optional[date] = None
+    fecha_completada: Optional[date] = None
+    estado: Optional[EstadoAccion] = None
+    observaciones: Optional[str] = None
+    
+    class Config:
+        use_enum_values = True
+
+class ComentarioCreate(BaseModel):
+    usuario: Optional[str] = None
+    comentario: str = Field(..., min_length=1)
+
+class ComentarioResponse(BaseModel):
+    id: int
+    rca_id: int
+    usuario: Optional[str] = None
+    comentario: str
+    fecha: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class RCABundleResponse(BaseModel):
+    """RCA con todos sus datos relacionados en una sola respuesta"""
+    rca: RCAResponse
+    cinco_porques: List[CincoPorquesResponse] = []
+    ishikawa: List[IshikawaResponse] = []
+    archivos: List[ArchivoResponse] = []
+    acciones: List[AccionResponse] = []
+    comentarios: List[ComentarioResponse] = []
+
 class CincoPorquesCreate(BaseModel):
     rca_id: int
     nivel: int = Field(..., ge=1, le=5)
@@ -206,4 +355,105 @@ class UsuarioResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
-    usuario: dict
\ No newline at end of file
+    usuario: dict
+
+# ==================== TRABAJOS ====================
+# Parámetros de los tipos que se pueden encolar por POST /trabajos. Importar,
+# archivar, limpiar archivos y marcar acciones vencidas solo los encola la API
+# (POST /importaciones) o el despachador
+class ParametrosBackupCompleto(BaseModel):
+    class Config:
+        extra = 'forbid'
+
+class ParametrosReportesPdf(BaseModel):
+    rca_ids: List[int] = Field(..., min_length=1, max_length=500)
+    
+    class Config:
+        extra = 'forbid'
+
+class ParametrosMiniaturas(BaseModel):
+    rca_id: Optional[int] = None
+    ancho: Optional[int] = Field(None, ge=32, le=2048)
+    
+    class Config:
+        extra = 'forbid'
+
+PARAMETROS_TRABAJOS = {
+    'backup_completo': ParametrosBackupCompleto,
+    'reportes_pdf': ParametrosReportesPdf,
+    'miniaturas': ParametrosMiniaturas,
+}
+
+class TrabajoCreate(BaseModel):
+    tipo: str
+    parametros: Dict[str, Any] = {}
+    prioridad: int = Field(5, ge=0, le=10)
+    max_intentos: int = Field(3, ge=1, le=10)
+
+class TrabajoResponse(BaseModel):
+    id: int
+    tipo: str
+    parametros: Dict[str, Any] = {}
+    prioridad: int
+    estado: str
+    intentos: int
+    max_intentos: int
+    cancelar: bool
+    resultado: Optional[Any] = None
+    error: Optional[str] = None
+    creado_por: Optional[str] = None
+    fecha_creacion: Optional[datetime] = None
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+# ==================== EQUIPOS ====================
+class CriticidadEquipo(str, Enum):
+    A = "A"
+    B = "B"
+    C = "C"
+
+class EquipoCreate(BaseModel):
+    codigo_equipo: str = Field(..., min_length=1, max_length=50)
+    nombre: str = Field(..., max_length=200)
+    descripcion: Optional[str] = None
+    area: Optional[str] = None
+    planta: Optional[str] = None
+    sistema: Optional[str] = None
+    fabricante: Optional[str] = None
+    modelo: Optional[str] = None
+    criticidad: Optional[CriticidadEquipo] = None
+    activo: bool = True
+    
+    class Config:
+        use_enum_values = True
+
+class EquipoUpdate(BaseModel):
+    codigo_equipo: Optional[str] = Field(None, min_length=1, max_length=50)
+    nombre: Optional[str] = Field(None, max_length=200)
+    descripcion: Optional[str] = None
+    area: Optional[str] = None
+    planta: Optional[str] = None
+    sistema: Optional[str] = None
+    fabricante: Optional[str] = None
+    modelo: Optional[str] = None
+    criticidad: Optional[CriticidadEquipo] = None
+    activo: Optional[bool] = None
+    
+    class Config:
+        use_enum_values = True
+
+class EquipoResponse(BaseModel):
+    id: int
+    codigo_equipo: str
+    nombre: str
+    descripcion: Optional[str] = None
+    area: Optional[str] = None
+    planta: Optional[str] = None
+    sistema: Optional[str] = None
+    fabricante: Optional[str] = None
+    modelo: Optional[str] = None
+    criticidad: Optional[str] = None
+    activo: Optional[bool] = None
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,58 @@
+"""
+Mover RCAs cerrados/cancelados antiguos al archivo histórico (tablas *_archivo)
+
+Siguen disponibles en GET /rca/{id}, /rca/{id}/bundle y GET /rca?historico=true.
+Ejecutar con:
+    python scripts/archivar_rcas.py [--anios 3] [--comprimir] [--simular]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.orm import sessionmaker
+
+from config import config
+from database import Base, crear_engine
+from utils.archivado import archivar
+from utils.migraciones import aplicar_migraciones
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivar RCAs cerrados y cancelados antiguos")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--anios', type=float, default=config.ARCHIVADO_ANIOS,
+                        help=f"Antigüedad mínima en años (default: {config.ARCHIVADO_ANIOS:g})")
+    parser.add_argument('--lote', type=int, default=500, help="RCAs por transacción (default: 500)")
+    parser.add_argument('--comprimir', action='store_true', help="Comprimir con gzip las evidencias comprimibles")
+    parser.add_argument('--simular', action='store_true', help="Solo contar qué se archivaría")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url or config.database_url)
+    Base.metadata.create_all(bind=engine)
+    # Sin índice en rca_id cada borrado revisa las tablas hijas completas (claves foráneas)
+    aplicar_migraciones(engine)
+
+    def progreso(resumen):
+        print(f"   {resumen['rcas']:,} RCAs archivados", end='\r')
+
+    resumen = archivar(
+        sessionmaker(bind=engine), anios=args.anios, tamanio_lote=args.lote,
+        comprimir=args.comprimir, simular=args.simular, progreso=progreso
+    )
+    print()
+    corte = resumen['corte'].strftime('%Y-%m-%d')
+    if args.simular:
+        print(f"🔎 Se archivarían {resumen['rcas']:,} RCAs cerrados/cancelados antes del {corte}")
+        return
+    print(f"✅ {resumen['rcas']:,} RCAs archivados (cerrados/cancelados antes del {corte})")
+    for tabla, filas in resumen['filas'].items():
+        print(f"   {tabla}: {filas:,} filas")
+    if args.comprimir:
+        print(f"🗜️  {resumen['archivos_comprimidos']:,} evidencias comprimidas, "
+              f"{resumen['bytes_liberados'] / 1024 / 1024:.1f} MB liberados")
+    print("ℹ️  Si la API está corriendo, el mapa Ishikawa y el autocompletado se actualizan en su próxima recarga")
+
+if __name__ == "__main__":
+    main()
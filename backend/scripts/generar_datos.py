@@ -0,0 +1,321 @@
+"""
+Generador de datos sintéticos de RCA para pruebas de escala
+Ejecutar con:
+    python scripts/generar_datos.py --rcas 100000 --seed 42
+    python scripts/generar_datos.py --url sqlite:///rca_escala.db --rcas 200000 --limpiar
+
+Genera datos con forma de producción para un terminal portuario: catálogo de
+equipos (grúas STS, RTG, reach stackers...), RCAs con 5 porqués encadenados,
+causas Ishikawa sobre las 6M, acciones, comentarios y archivos de evidencia
+apuntando a imágenes de relleno. Usa inserciones masivas (executemany) por
+lotes y una semilla fija: la misma semilla produce siempre los mismos datos.
+"""
+import sys
+import os
+import io
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import func, select, delete
+
+# ==================== CATÁLOGOS ====================
+# (prefijo, nombre, cantidad, área, sistema principal, criticidad)
+TIPOS_EQUIPO = [
+    ('STS', 'Grúa Ship-to-Shore', 12, 'Muelle', 'Izaje', 'A'),
+    ('RTG', 'Grúa RTG', 30, 'Patio', 'Traslación', 'A'),
+    ('RS', 'Reach Stacker', 15, 'Patio', 'Hidráulico', 'B'),
+    ('ECH', 'Empty Container Handler', 8, 'Patio', 'Hidráulico', 'B'),
+    ('TT', 'Tracto Terminal', 40, 'Patio', 'Motor', 'C'),
+    ('SPR', 'Spreader', 20, 'Taller', 'Spreader', 'B'),
+    ('MHC', 'Grúa Móvil de Puerto', 4, 'Muelle', 'Izaje', 'A'),
+]
+PLANTAS = ['Terminal Norte', 'Terminal Sur']
+SISTEMAS = ['Izaje', 'Traslación', 'Giro', 'Eléctrico', 'Hidráulico', 'Spreader', 'Motor', 'Control/PLC', 'Frenos']
+FABRICANTES = [('ZPMC', 'STS-65'), ('Konecranes', 'RTG 16W'), ('Kalmar', 'DRG450'), ('Liebherr', 'LHM 550'), ('Terberg', 'YT223')]
+
+TIPOS_FALLA = {
+    'Mecánica': ['Rotura de cable de izaje', 'Desgaste de rodamiento', 'Falla de reductor', 'Fisura en poleas'],
+    'Eléctrica': ['Falla de variador', 'Cortocircuito en motor', 'Falla de anillos rozantes', 'Caída de tensión'],
+    'Hidráulica': ['Fuga en cilindro', 'Falla de bomba hidráulica', 'Rotura de manguera', 'Contaminación de aceite'],
+    'Estructural': ['Fisura en viga', 'Deformación de twistlock', 'Corrosión en pluma'],
+    'Control/PLC': ['Falla de comunicación PLC', 'Sensor de carga descalibrado', 'Encoder defectuoso'],
+    'Operacional': ['Colisión con contenedor', 'Sobrecarga', 'Maniobra incorrecta'],
+}
+CATEGORIAS = ['Confiabilidad', 'Seguridad', 'Medio Ambiente', 'Calidad', 'Producción']
+
+CADENAS_PORQUES = [
+    ['Se detuvo la grúa', 'Se activó la protección térmica', 'El motor trabajó sobrecargado',
+     'El freno no liberaba completamente', 'No se ajustó el freno en la última mantención'],
+    ['Se cortó el cable', 'El cable tenía alambres rotos', 'No se detectó el desgaste',
+     'La inspección no incluía medición de diámetro', 'El procedimiento estaba desactualizado'],
+    ['Fuga de aceite hidráulico', 'Se rompió la manguera', 'La manguera superó su vida útil',
+     'No hay registro de cambio de mangueras', 'El plan preventivo no contempla mangueras'],
+    ['Falla de comunicación', 'Se perdió la señal del PLC', 'Conector con corrosión',
+     'Ingreso de humedad en el gabinete', 'Sello del gabinete dañado sin reemplazo'],
+    ['Colisión del spreader', 'El operador no vio el contenedor', 'Cámara sin funcionar',
+     'No se reportó la falla de la cámara', 'No existe checklist de inicio de turno'],
+]
+CAUSAS_6M = {
+    'Máquina': ['Desgaste de componentes', 'Falta de lubricación', 'Vibración excesiva', 'Repuesto no original', 'Sensor defectuoso'],
+    'Método': ['Procedimiento desactualizado', 'Inspección incompleta', 'Frecuencia de mantención inadecuada', 'Falta de checklist'],
+    'Material': ['Aceite contaminado', 'Cable fuera de especificación', 'Repuesto de baja calidad', 'Mangueras vencidas'],
+    'Mano de obra': ['Falta de capacitación', 'Fatiga del operador', 'Rotación de personal', 'Comunicación deficiente entre turnos'],
+    'Medición': ['Instrumento descalibrado', 'Sin registro de horómetro', 'Umbral de alarma incorrecto'],
+    'Medio ambiente': ['Ambiente salino', 'Viento sobre límite operacional', 'Lluvia intensa', 'Polvo en gabinetes'],
+}
+RESPONSABLES = ['Juan Pérez', 'María González', 'Carlos Rodríguez', 'Ana Muñoz', 'Pedro Soto', 'Luis Rojas', 'Camila Díaz']
+AREAS_RESPONSABLES = ['Mantenimiento Mecánico', 'Mantenimiento Eléctrico', 'Confiabilidad', 'Operaciones']
+COMENTARIOS = ['Se solicitó repuesto', 'Pendiente ventana de mantención', 'Revisado en reunión de confiabilidad',
+               'Se adjuntan fotos de la inspección', 'Proveedor confirma fecha de entrega', 'Acción verificada en terreno']
+
+ESTADOS = ['Abierto', 'En Análisis', 'En Implementación', 'Cerrado', 'Cancelado']
+CRITICIDADES = [('Crítica', 5), ('Alta', 20), ('Media', 50), ('Baja', 25)]
+
+def generar_equipos(rnd):
+    """Catálogo de equipos determinístico"""
+    equipos = []
+    for prefijo, nombre, cantidad, area, sistema, criticidad in TIPOS_EQUIPO:
+        for n in range(1, cantidad + 1):
+            fabricante, modelo = rnd.choice(FABRICANTES)
+            equipos.append({
+                'codigo_equipo': f'{prefijo}-{n:02d}',
+                'nombre': f'{nombre} {n:02d}',
+                'descripcion': f'{nombre} número {n}',
+                'area': area,
+                'planta': PLANTAS[n % len(PLANTAS)],
+                'sistema': sistema,
+                'fabricante': fabricante,
+                'modelo': modelo,
+                'criticidad': criticidad,
+                'activo': True,
+            })
+    return equipos
+
+def variante_texto(rnd, codigo):
+    """Cómo escribe un técnico el código de equipo (con algunas variantes y errores)"""
+    r = rnd.random()
+    if r < 0.85:
+        return codigo
+    if r < 0.92:
+        return codigo.replace('-', ' ')
+    if r < 0.97:
+        return codigo.lower()
+    return codigo.replace('-', '')
+
+def imagen_relleno(rnd, indice):
+    """Bytes de una imagen JPEG pequeña (Pillow si está disponible)"""
+    try:
+        from PIL import Image
+        buffer = io.BytesIO()
+        color = (rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255))
+        Image.new('RGB', (800, 600), color).save(buffer, 'JPEG', quality=70)
+        return buffer.getvalue()
+    except ImportError:
+        return b'\xff\xd8\xff\xe0' + bytes([indice % 256]) * 4096 + b'\xff\xd9'
+
+def crear_imagenes(rnd, archivos_path, cantidad):
+    """Crear imágenes de relleno y devolver sus rutas"""
+    carpeta = os.path.join(archivos_path, 'fotos', 'sinteticas')
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    for i in range(cantidad):
+        ruta = os.path.join(carpeta, f'evidencia_{i:04d}.jpg')
+        if not os.path.exists(ruta):
+            with open(ruta, 'wb') as f:
+                f.write(imagen_relleno(rnd, i))
+        rutas.append(ruta)
+    return rutas
+
+# ==================== GENERACIÓN ====================
+def generar_lote(rnd, ids, equipos, imagenes, hoy):
+    """Filas de RCAs y sus tablas hijas para un lote de IDs"""
+    rcas, porques, ishikawa, acciones, comentarios, archivos = [], [], [], [], [], []
+    criticidades = [c for c, _ in CRITICIDADES]
+    pesos_criticidad = [p for _, p in CRITICIDADES]
+    rango_dias = 5 * 365
+
+    for rca_id in ids:
+        equipo = rnd.choice(equipos)
+        tipo_falla = rnd.choice(list(TIPOS_FALLA))
+        falla = rnd.choice(TIPOS_FALLA[tipo_falla])
+        fecha_evento = hoy - timedelta(days=rnd.randint(0, rango_dias), minutes=rnd.randint(0, 1439))
+        antiguedad = (hoy - fecha_evento).days
+
+        # Los RCAs antiguos están mayoritariamente cerrados
+        if antiguedad > 365:
+            estado = rnd.choices(ESTADOS, [2, 3, 5, 80, 10])[0]
+        elif antiguedad > 60:
+            estado = rnd.choices(ESTADOS, [10, 20, 35, 30, 5])[0]
+        else:
+            estado = rnd.choices(ESTADOS, [45, 35, 15, 4, 1])[0]
+        fecha_compromiso = (fecha_evento + timedelta(days=rnd.randint(7, 90))).date()
+        cerrado = estado == 'Cerrado'
+        cadena = rnd.choice(CADENAS_PORQUES)
+
+        rcas.append({
+            'id': rca_id,
+            'codigo': f'RCA-{fecha_evento.year}-{rca_id:07d}',
+            'titulo': f'{falla} en {equipo["codigo_equipo"]}',
+            'descripcion': f'{falla} detectada durante la operación de {equipo["nombre"]}. ' * rnd.randint(1, 4),
+            'fecha_evento': fecha_evento,
+            'fecha_creacion': fecha_evento + timedelta(hours=rnd.randint(1, 48)),
+            'fecha_actualizacion': fecha_evento + timedelta(days=rnd.randint(1, 120)),
+            'area': equipo['area'],
+            'planta': equipo['planta'],
+            'equipo': variante_texto(rnd, equipo['codigo_equipo']),
+            'sistema': rnd.choice([equipo['sistema']] * 3 + SISTEMAS),
+            'descripcion_falla': f'{falla}. ' + cadena[0] + '.',
+            'impacto': f'Detención de {rnd.randint(1, 72)} horas de la operación de {equipo["area"].lower()}',
+            'metodo_analisis': rnd.choice(['5 Porqués', 'Ishikawa', '5 Porqués + Ishikawa']),
+            'causa_inmediata': cadena[1],
+            'causa_raiz': cadena[-1] if estado != 'Abierto' else None,
+            'causas_contribuyentes': ', '.join(rnd.sample(CAUSAS_6M['Método'], 2)),
+            'acciones_correctivas': f'Reparar {falla.lower()}' if estado != 'Abierto' else None,
+            'acciones_preventivas': 'Actualizar plan de mantenimiento preventivo' if estado != 'Abierto' else None,
+            'responsable': rnd.choice(RESPONSABLES),
+            'area_responsable': rnd.choice(AREAS_RESPONSABLES),
+            'fecha_compromiso': fecha_compromiso,
+            'fecha_cierre': (fecha_compromiso + timedelta(days=rnd.randint(-5, 30))) if cerrado else None,
+            'estado': estado,
+            'criticidad': rnd.choices(criticidades, pesos_criticidad)[0],
+            'tipo_falla': tipo_falla,
+            'categoria': rnd.choice(CATEGORIAS),
+            'tiempo_parada_horas': round(rnd.uniform(0.5, 72), 2),
+            'costo_estimado': round(rnd.uniform(100_000, 50_000_000), 2),
+            'verificacion_efectividad': 'Sin recurrencia en 90 días' if cerrado else None,
+            'efectivo': rnd.random() < 0.85 if cerrado else None,
+            'creado_por': rnd.choice(RESPONSABLES),
+        })
+
+        for nivel, respuesta in enumerate(cadena[:rnd.randint(3, 5)], start=1):
+            porques.append({'rca_id': rca_id, 'nivel': nivel, 'porque': f'¿Por qué {nivel}?', 'respuesta': respuesta})
+
+        for categoria in rnd.sample(list(CAUSAS_6M), rnd.randint(2, 6)):
+            for causa in rnd.sample(CAUSAS_6M[categoria], rnd.randint(1, 2)):
+                ishikawa.append({'rca_id': rca_id, 'categoria': categoria, 'causa': causa})
+
+        for _ in range(rnd.randint(1, 4)):
+            compromiso = fecha_compromiso + timedelta(days=rnd.randint(-3, 60))
+            if cerrado:
+                estado_accion = rnd.choices(['Completada', 'Cancelada'], [95, 5])[0]
+            else:
+                estado_accion = rnd.choices(['Pendiente', 'En Progreso', 'Completada'], [50, 30, 20])[0]
+            acciones.append({
+                'rca_id': rca_id,
+                'tipo': rnd.choice(['Correctiva', 'Preventiva']),
+                'descripcion': rnd.choice(['Reemplazar', 'Inspeccionar', 'Capacitar sobre', 'Actualizar procedimiento de']) + f' {falla.lower()}',
+                'responsable': rnd.choice(RESPONSABLES),
+                'fecha_compromiso': compromiso,
+                'fecha_completada': compromiso + timedelta(days=rnd.randint(-10, 10)) if estado_accion == 'Completada' else None,
+                'estado': estado_accion,
+            })
+
+        for _ in range(rnd.randint(0, 5)):
+            comentarios.append({
+                'rca_id': rca_id,
+                'usuario': rnd.choice(RESPONSABLES),
+                'comentario': rnd.choice(COMENTARIOS),
+                'fecha': fecha_evento + timedelta(days=rnd.randint(0, 90), minutes=rnd.randint(0, 1439)),
+            })
+
+        if imagenes:
+            for _ in range(rnd.choices([0, 1, 2, 3, 5], [20, 35, 25, 15, 5])[0]):
+                ruta = rnd.choice(imagenes)
+                archivos.append({
+                    'rca_id': rca_id,
+                    'nombre_archivo': os.path.basename(ruta),
+                    'ruta_archivo': ruta,
+                    'tipo_archivo': 'jpg',
+                    'tipo_contenido': rnd.choice(['Evidencia', 'Inspección', 'Reparación']),
+                    'tamanio_kb': max(1, os.path.getsize(ruta) // 1024),
+                    'fecha_subida': fecha_evento + timedelta(hours=rnd.randint(1, 200)),
+                    'subido_por': rnd.choice(RESPONSABLES),
+                })
+
+    return rcas, porques, ishikawa, acciones, comentarios, archivos
+
+def generar(engine, cantidad_rcas, seed=42, lote=2000, imagenes=50, archivos_path=None, limpiar=False, progreso=True):
+    """
+    Generar el catálogo de equipos y `cantidad_rcas` RCAs con sus tablas hijas.
+    Los RCAs se agregan después del mayor ID existente. Devuelve filas por tabla
+    """
+    import models
+
+    rnd = random.Random(seed)
+    hoy = datetime(2025, 1, 1)
+    tablas = [models.RCA, models.CincoPorques, models.Ishikawa, models.Accion, models.Comentario, models.Archivo]
+    totales = {m.__tablename__: 0 for m in [models.Equipo] + tablas}
+
+    with engine.begin() as conn:
+        if limpiar:
+            for modelo in reversed(tablas):
+                conn.execute(delete(modelo.__table__))
+            conn.execute(delete(models.Equipo.__table__))
+
+        equipos = generar_equipos(rnd)
+        existentes = set(conn.execute(select(models.Equipo.codigo_equipo)).scalars())
+        nuevos = [e for e in equipos if e['codigo_equipo'] not in existentes]
+        if nuevos:
+            conn.execute(models.Equipo.__table__.insert(), nuevos)
+        totales['equipos'] = len(nuevos)
+        primer_id = (conn.execute(select(func.max(models.RCA.id))).scalar() or 0) + 1
+
+    rutas = crear_imagenes(rnd, archivos_path, imagenes) if archivos_path and imagenes else []
+
+    inicio = time.perf_counter()
+    for desde in range(0, cantidad_rcas, lote):
+        ids = range(primer_id + desde, primer_id + min(desde + lote, cantidad_rcas))
+        # Cada lote tiene su propia semilla: el resultado no depende del tamaño de lote previo
+        filas = generar_lote(random.Random(f'{seed}-{ids[0]}'), ids, equipos, rutas, hoy)
+        with engine.begin() as conn:
+            for modelo, registros in zip(tablas, filas):
+                if registros:
+                    conn.execute(modelo.__table__.insert(), registros)
+                    totales[modelo.__tablename__] += len(registros)
+        if progreso:
+            hechos = desde + len(ids)
+            velocidad = hechos / (time.perf_counter() - inicio)
+            print(f"\r   {hechos:>9,} / {cantidad_rcas:,} RCAs ({velocidad:,.0f} RCAs/s)", end='', flush=True)
+    if progreso and cantidad_rcas:
+        print()
+    return totales
+
+def main():
+    from config import config
+    from database import Base, crear_engine
+    import models  # noqa: F401 - registra las tablas en Base.metadata
+
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de RCA")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--rcas', type=int, default=100_000, help="Cantidad de RCAs a generar")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla (mismos datos para la misma semilla)")
+    parser.add_argument('--lote', type=int, default=2000, help="RCAs por transacción")
+    parser.add_argument('--imagenes', type=int, default=50, help="Imágenes de relleno distintas en ARCHIVOS_PATH")
+    parser.add_argument('--archivos-path', default=config.ARCHIVOS_PATH, help="Carpeta de archivos")
+    parser.add_argument('--limpiar', action='store_true', help="Borrar RCAs y equipos existentes antes de generar")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url or config.database_url)
+    Base.metadata.create_all(bind=engine)
+
+    print("\n" + "="*60)
+    print(f"GENERACIÓN DE DATOS SINTÉTICOS - {args.rcas:,} RCAs (semilla {args.seed})")
+    print("="*60 + "\n")
+
+    inicio = time.perf_counter()
+    totales = generar(engine, args.rcas, seed=args.seed, lote=args.lote, imagenes=args.imagenes,
+                      archivos_path=args.archivos_path, limpiar=args.limpiar)
+    duracion = time.perf_counter() - inicio
+
+    for tabla, filas in totales.items():
+        print(f"   - {tabla}: {filas:,} filas")
+    print(f"\n✅ {sum(totales.values()):,} filas en {duracion:.1f} s\n")
+
+if __name__ == "__main__":
+    main()
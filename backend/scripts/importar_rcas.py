@@ -0,0 +1,59 @@
+"""
+Importar RCAs históricos desde una planilla (CSV o XLSX)
+
+Acepta las columnas de /reportes/exportar (porque_1..porque_5,
+ishikawa_maquina, ...) y variantes con tildes o mayúsculas. Si se corta,
+volver a ejecutar el mismo comando continúa desde el último lote guardado.
+Ejecutar con:
+    python scripts/importar_rcas.py planilla.xlsx [--lote 2000] [--desde-cero]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.orm import sessionmaker
+
+from config import config
+from database import Base, crear_engine
+from utils.importar import importar_archivo
+from utils.migraciones import aplicar_migraciones
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar RCAs desde CSV o Excel")
+    parser.add_argument('archivo', help="Archivo .csv o .xlsx")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--lote', type=int, default=1000, help="Filas por transacción (default: 1000)")
+    parser.add_argument('--hoja', help="Hoja del Excel (por defecto la activa)")
+    parser.add_argument('--desde-cero', action='store_true', help="Ignorar el checkpoint y procesar todo el archivo")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url or config.database_url)
+    Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
+
+    def progreso(estado):
+        print(f"   fila {estado['filas_confirmadas']:,}: {estado['insertados']:,} insertados, "
+              f"{estado['omitidos']:,} omitidos, {estado['errores']:,} con error", end='\r')
+
+    try:
+        resumen = importar_archivo(
+            args.archivo, sessionmaker(bind=engine), tamanio_lote=args.lote,
+            hoja=args.hoja, reanudar=not args.desde_cero, progreso=progreso
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print()
+    if resumen['reanudado_desde_fila']:
+        print(f"↪️  Reanudado desde la fila {resumen['reanudado_desde_fila']:,}")
+    print(f"✅ {resumen['insertados']:,} RCAs insertados, {resumen['omitidos']:,} ya existían "
+          f"({resumen['filas_leidas']:,} filas en {resumen['segundos']}s, {resumen['filas_por_segundo'] or 0:,} filas/s)")
+    if resumen['errores']:
+        print(f"⚠️  {resumen['errores']:,} filas con error: ver {resumen['reporte_errores']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Buscar archivos huérfanos en ARCHIVOS_PATH (sin registro en la base) y
+registros de archivos cuyo archivo ya no existe
+
+Por defecto solo informa. Con --cuarentena mueve los huérfanos a
+ARCHIVOS_PATH/_cuarentena/<fecha>/ y borra los lotes de cuarentena vencidos.
+Ejecutar con:
+    python scripts/limpiar_archivos.py [--cuarentena] [--gracia-horas 24] [--eliminar-registros]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.orm import sessionmaker
+
+from config import config
+from database import Base, crear_engine
+from utils.archivos_huerfanos import limpiar
+from utils.migraciones import aplicar_migraciones
+
+def main():
+    parser = argparse.ArgumentParser(description="Limpiar archivos huérfanos de ARCHIVOS_PATH")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--cuarentena', action='store_true', help="Mover los huérfanos a cuarentena y purgar la vencida")
+    parser.add_argument('--gracia-horas', type=float, default=config.LIMPIEZA_GRACIA_HORAS,
+                        help=f"No tocar archivos modificados hace menos de N horas (default: {config.LIMPIEZA_GRACIA_HORAS:g})")
+    parser.add_argument('--retencion-dias', type=float, default=config.LIMPIEZA_RETENCION_DIAS,
+                        help=f"Días en cuarentena antes de borrar (default: {config.LIMPIEZA_RETENCION_DIAS:g})")
+    parser.add_argument('--eliminar-registros', action='store_true', help="Eliminar las filas de archivos sin archivo en disco")
+    parser.add_argument('--lote', type=int, default=1000, help="Rutas por consulta (default: 1000)")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url or config.database_url)
+    Base.metadata.create_all(bind=engine)
+    # El cruce de rutas usa el índice de ruta_archivo
+    aplicar_migraciones(engine)
+
+    def progreso(resumen):
+        print(f"   {resumen['archivos_revisados']:,} archivos revisados, {resumen['huerfanos']:,} huérfanos", end='\r')
+
+    try:
+        resumen = limpiar(
+            sessionmaker(bind=engine), modo='cuarentena' if args.cuarentena else 'reportar',
+            gracia_horas=args.gracia_horas, retencion_dias=args.retencion_dias,
+            eliminar_registros=args.eliminar_registros, tamanio_lote=args.lote, progreso=progreso
+        )
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print()
+
+    mb = resumen['bytes_huerfanos'] / 1024 / 1024
+    print(f"🔎 {resumen['archivos_revisados']:,} archivos revisados en {config.ARCHIVOS_PATH}")
+    print(f"   {resumen['huerfanos']:,} huérfanos ({mb:.1f} MB); "
+          f"{resumen['recientes']:,} más nuevos que {args.gracia_horas:g} h sin tocar")
+    for ruta in resumen['muestra_huerfanos']:
+        print(f"      {ruta}")
+    print(f"   {resumen['registros_sin_archivo']:,} registros de archivos sin archivo en disco")
+    for fila in resumen['muestra_sin_archivo']:
+        print(f"      {fila['tabla']} #{fila['id']} (RCA {fila['rca_id']}): {fila['ruta']}")
+
+    if args.cuarentena:
+        print(f"📦 {resumen['en_cuarentena']:,} archivos movidos a cuarentena")
+        print(f"🗑️  {resumen['lotes_purgados']} lotes de cuarentena purgados, "
+              f"{resumen['bytes_liberados'] / 1024 / 1024:.1f} MB liberados")
+    elif resumen['huerfanos']:
+        print("ℹ️  Use --cuarentena para moverlos")
+    if args.eliminar_registros:
+        print(f"✅ {resumen['registros_eliminados']:,} registros eliminados")
+
+if __name__ == "__main__":
+    main()
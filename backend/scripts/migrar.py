@@ -0,0 +1,48 @@
+"""
+Aplicar las migraciones de esquema pendientes (utils/migraciones.py)
+
+La API también las aplica al iniciar; este script permite hacerlo antes de
+un despliegue (crear índices en tablas grandes puede tardar) o revisar el
+estado de una base.
+Ejecutar con:
+    python scripts/migrar.py [--url URL] [--estado]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from database import Base, crear_engine
+from utils.migraciones import MIGRACIONES, aplicadas, aplicar_migraciones
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplicar migraciones de esquema pendientes")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--estado', action='store_true', help="Solo mostrar migraciones aplicadas y pendientes")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url or config.database_url)
+
+    if args.estado:
+        hechas = aplicadas(engine)
+        for version, nombre, _ in MIGRACIONES:
+            fecha = hechas.get(version)
+            marca = f"✅ {fecha:%Y-%m-%d %H:%M}" if fecha else "⏳ pendiente"
+            print(f"   {version:>3}  {marca:<20} {nombre}")
+        return
+
+    Base.metadata.create_all(bind=engine)
+    nuevas = aplicar_migraciones(engine)
+    if not nuevas:
+        print("✅ El esquema está al día")
+        return
+    nombres = dict((v, n) for v, n, _ in MIGRACIONES)
+    for version in nuevas:
+        print(f"➕ {version}: {nombres[version]}")
+    print(f"✅ {len(nuevas)} migraciones aplicadas")
+
+if __name__ == "__main__":
+    main()
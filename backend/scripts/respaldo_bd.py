@@ -0,0 +1,57 @@
+"""
+Script para respaldar y restaurar la base de datos sin mysqldump
+Ejecutar con:
+    python scripts/respaldo_bd.py dump [--destino DIR]
+    python scripts/respaldo_bd.py restore DIR [--limpiar]
+
+Con --url se puede apuntar a otra base (ej: sqlite:///rca_local.db) para
+probar respaldos localmente sin XAMPP.
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config import config
+from database import Base, crear_engine
+import models  # noqa: F401 - registra las tablas en Base.metadata
+from utils.db_dump import dump_database, restore_database
+
+def main():
+    parser = argparse.ArgumentParser(description="Respaldo portable de la base de datos RCA")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_dump = sub.add_parser('dump', help="Respaldar todas las tablas")
+    p_dump.add_argument('--destino', help="Directorio de salida (por defecto RESPALDOS_PATH/db_backup_<timestamp>)")
+    p_dump.add_argument('--chunk', type=int, default=5000, help="Filas por bloque de lectura")
+
+    p_restore = sub.add_parser('restore', help="Restaurar un respaldo")
+    p_restore.add_argument('origen', help="Directorio creado por 'dump'")
+    p_restore.add_argument('--batch', type=int, default=2000, help="Filas por INSERT")
+    p_restore.add_argument('--limpiar', action='store_true', help="Vaciar las tablas antes de restaurar")
+
+    args = parser.parse_args()
+    engine = crear_engine(args.url or config.database_url)
+
+    if args.comando == 'dump':
+        destino = args.destino or os.path.join(
+            config.RESPALDOS_PATH, f"db_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        dump_database(engine, destino, chunk_size=args.chunk)
+        print(f"✅ Respaldo creado: {destino}")
+    else:
+        # La base destino puede estar vacía (ej: migración de MySQL a SQLite)
+        Base.metadata.create_all(bind=engine)
+        insertadas = restore_database(engine, args.origen, batch_size=args.batch, limpiar=args.limpiar)
+        for tabla, filas in insertadas.items():
+            print(f"   - {tabla}: {filas} filas")
+        print(f"✅ Restauración completa: {sum(insertadas.values())} filas")
+
+if __name__ == "__main__":
+    main()
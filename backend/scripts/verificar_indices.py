@@ -0,0 +1,160 @@
+"""
+Verificar que las consultas de la API usan índices
+
+Recorre endpoints representativos de cada router con TestClient, captura los
+SELECT que ejecutan y corre EXPLAIN sobre cada uno. Falla (código de salida 1)
+si alguno recorre completa una tabla que no figura como permitida para ese
+endpoint: los reportes que agregan toda la tabla la recorren por diseño, un
+listado filtrado no debería.
+Ejecutar contra una base con datos (los valores de prueba se toman de ella):
+    python scripts/verificar_indices.py [--url URL] [--detalle]
+"""
+import os
+import re
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Tablas chicas (catálogos): recorrerlas completas es más barato que un índice
+PEQUENAS = {'equipos', 'usuarios', 'migraciones', 'trabajos'}
+
+_RE_SCAN_SQLITE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?')
+
+def consultas(muestra):
+    """(endpoint, tablas que puede recorrer completas) con valores tomados de la base"""
+    rca_id, area, estado, responsable = muestra['rca_id'], muestra['area'], muestra['estado'], muestra['responsable']
+    return [
+        # Listados: ORDER BY id con LIMIT recorre la clave primaria y corta en el límite
+        ("/rca?limit=50", {'rcas'}),
+        (f"/rca?limit=50&vista=resumen&estado={estado}", set()),
+        (f"/rca?limit=50&fields=codigo,titulo,estado&estado={estado}", set()),
+        (f"/rca?limit=50&equipo_id={muestra['equipo_id']}", set()),
+        ("/rca?limit=50&historico=true", {'rcas_archivo'}),
+        ("/rca?limit=50&historico=true&estado=Cerrado", set()),
+        # Detalle de un RCA
+        (f"/rca/{rca_id}", set()),
+        (f"/rca/{rca_id}/bundle", set()),
+        (f"/rca/{rca_id}/cinco-porques", set()),
+        (f"/rca/{rca_id}/ishikawa", set()),
+        (f"/archivo/{rca_id}", set()),
+        (f"/archivo/por-rca?rca_ids={rca_id}&rca_ids={rca_id + 1}", set()),
+        (f"/archivo/por-rca?area={area}&estado={estado}", set()),
+        # Acciones
+        (f"/acciones?rca_id={rca_id}", set()),
+        (f"/acciones?responsable={responsable}", set()),
+        (f"/acciones?area={area}", set()),
+        ("/acciones?vencidas=true", set()),
+        # Tablero, estadísticas y reportes: agregan la tabla completa
+        ("/acciones/tablero", {'acciones'}),
+        ("/reportes/estadisticas", {'rcas'}),
+        ("/reportes/por-area", {'rcas'}),
+        ("/reportes/por-criticidad", {'rcas'}),
+        ("/reportes/ishikawa/mapa", {'ishikawa', 'rcas'}),
+        (f"/reportes/exportar?formato=ndjson&area={area}", set()),
+        ("/reportes/exportar?formato=ndjson&desde=2024-01-01&hasta=2024-02-01", set()),
+        ("/autocompletar/equipo?q=a", {'rcas'}),
+    ]
+
+def muestra_datos(engine):
+    """Valores reales para armar los endpoints (el plan depende de que existan)"""
+    from sqlalchemy import select, func
+    import models
+    R, A = models.RCA, models.Accion
+    with engine.connect() as conn:
+        rca_id = conn.execute(select(func.max(A.rca_id))).scalar() or conn.execute(select(func.max(R.id))).scalar()
+        fila = conn.execute(select(R.area, R.estado).where(R.id == rca_id)).first()
+        return {
+            'rca_id': rca_id or 1,
+            'area': fila.area if fila else 'Molienda',
+            'estado': fila.estado if fila else 'Abierto',
+            'responsable': conn.execute(select(A.responsable).where(A.responsable.isnot(None)).limit(1)).scalar() or 'x',
+            'equipo_id': conn.execute(select(R.equipo_id).where(R.equipo_id.isnot(None)).limit(1)).scalar() or 1,
+        }
+
+def recorridos_completos(plan, dialecto):
+    """Tablas que el plan recorre completas (sin índice)"""
+    tablas = set()
+    for fila in plan:
+        if dialecto == 'sqlite':
+            m = _RE_SCAN_SQLITE.match(fila[-1])
+            if m and 'INDEX' not in fila[-1]:
+                tablas.add(m.group(1))
+        elif len(fila) > 4 and str(fila[4]).upper() == 'ALL':
+            tablas.add(str(fila[2]))
+    return tablas
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificar con EXPLAIN que las consultas de la API usan índices")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--detalle', action='store_true', help="Mostrar el plan de cada consulta")
+    args = parser.parse_args()
+
+    # Antes de importar la app: la base a revisar y sin trabajos en segundo plano
+    if args.url:
+        os.environ['DATABASE_URL'] = args.url
+    os.environ['TRABAJOS_HABILITADOS'] = 'false'
+
+    from sqlalchemy import event
+    from fastapi.testclient import TestClient
+    from database import engine, engine_lectura
+    from main import app
+    import models
+    from utils.query_profiler import explain, normalizar_sql
+
+    capturadas = []
+
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            capturadas.append((statement, parameters))
+
+    for motor in {engine, engine_lectura}:
+        event.listen(motor, "before_cursor_execute", capturar)
+
+    dialecto = engine.dialect.name
+    tablas_modelo = set(models.Base.metadata.tables)
+    fallas, revisadas = [], 0
+    with TestClient(app) as cliente:
+        for url, permitidas in consultas(muestra_datos(engine)):
+            capturadas.clear()
+            respuesta = cliente.get(url)
+            if respuesta.status_code >= 400:
+                print(f"⚠️  {url}: HTTP {respuesta.status_code}")
+                continue
+            vistas = set()
+            conexion = engine_lectura.raw_connection()
+            try:
+                for statement, parametros in capturadas:
+                    clave = normalizar_sql(statement)
+                    if clave in vistas:
+                        continue
+                    vistas.add(clave)
+                    revisadas += 1
+                    plan = explain(conexion, dialecto, statement, parametros)
+                    completas = (recorridos_completos(plan, dialecto) & tablas_modelo) - PEQUENAS - permitidas
+                    if completas:
+                        fallas.append((url, completas, clave, plan))
+                    if args.detalle:
+                        print(f"\n{url}\n   {clave[:160]}")
+                        for fila in plan:
+                            print(f"      {fila}")
+            finally:
+                conexion.close()
+            marca = "❌" if fallas and fallas[-1][0] == url else "✅"
+            print(f"{marca} {url}")
+
+    print(f"\n🔎 {revisadas} consultas revisadas")
+    if not fallas:
+        print("✅ Ninguna consulta recorre completa una tabla sin índice")
+        return
+    print(f"❌ {len(fallas)} consultas recorren tablas completas:")
+    for url, tablas, clave, plan in fallas:
+        print(f"\n   {url} → {', '.join(sorted(tablas))}\n   {clave[:200]}")
+        for fila in plan:
+            print(f"      {fila}")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
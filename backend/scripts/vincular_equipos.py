@@ -0,0 +1,45 @@
+"""
+Vincular los RCAs existentes con el catálogo de equipos (equipo_id)
+
+Resuelve el texto libre de equipo ("STS 01", "sts-01", "STS01") contra los
+códigos del catálogo y completa equipo_id en bloque. Ejecutar con:
+    python scripts/vincular_equipos.py [--simular] [--todos]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar el directorio padre al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.orm import Session
+
+from config import config
+from database import Base, crear_engine
+from utils.catalogo_equipos import vincular_rcas
+from utils.migraciones import aplicar_migraciones
+
+def main():
+    parser = argparse.ArgumentParser(description="Vincular RCAs con el catálogo de equipos")
+    parser.add_argument('--url', help="URL SQLAlchemy (por defecto la de config)")
+    parser.add_argument('--simular', action='store_true', help="Solo mostrar qué se vincularía")
+    parser.add_argument('--todos', action='store_true', help="Revisar también los RCAs ya vinculados")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url or config.database_url)
+    Base.metadata.create_all(bind=engine)
+    for version in aplicar_migraciones(engine):
+        print(f"➕ Migración {version} aplicada")
+
+    with Session(engine) as db:
+        resultado = vincular_rcas(db, solo_pendientes=not args.todos, aplicar=not args.simular)
+
+    accion = "se vincularían" if args.simular else "vinculados"
+    print(f"✅ {resultado['vinculados']:,} RCAs {accion}")
+    if resultado['sin_resolver']:
+        print(f"⚠️  {len(resultado['sin_resolver'])} textos de equipo sin coincidencia en el catálogo:")
+        for texto, rcas in sorted(resultado['sin_resolver'].items(), key=lambda x: -x[1])[:30]:
+            print(f"   {texto!r}: {rcas} RCAs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Configuración de pytest: la API corre contra una base SQLite temporal con el
+perfilador de consultas activo y sin trabajos en segundo plano
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Antes de importar config: nunca usar la base del .env
+_TEMPORAL = tempfile.mkdtemp(prefix='rca_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TEMPORAL, 'rca.db')}"
+os.environ['DATABASE_REPLICA_URL'] = ''
+os.environ['ARCHIVOS_PATH'] = os.path.join(_TEMPORAL, 'archivos')
+os.environ['RESPALDOS_PATH'] = os.path.join(_TEMPORAL, 'respaldos')
+os.environ['QUERY_PROFILER'] = 'true'
+os.environ['TRABAJOS_HABILITADOS'] = 'false'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+# Agregar el directorio backend al path para importar módulos
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.query_profiler import assert_presupuesto  # noqa: E402
+
+@pytest.fixture
+def query_budget():
+    """query_budget(response) valida el presupuesto de consultas de la ruta respondida"""
+    return assert_presupuesto
+
+@pytest.fixture(scope='session')
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as cliente:
+        yield cliente
+
+@pytest.fixture(scope='session')
+def rca(client):
+    """RCA con 5 porqués, Ishikawa y una acción"""
+    respuesta = client.post('/rca', json={
+        'codigo': 'RCA-TEST-0001',
+        'titulo': 'Falla de freno en STS-01',
+        'fecha_evento': '2024-03-01T08:00:00',
+        'area': 'Muelle',
+        'equipo': 'STS-01',
+        'cinco_porques': ['Se cortó el cable', 'Freno desgastado'],
+        'ishikawa': {'Máquina': ['Freno desgastado'], 'Método': ['Sin checklist']},
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    datos = respuesta.json()
+    client.post('/acciones', json={
+        'rca_id': datos['id'], 'tipo': 'Correctiva', 'descripcion': 'Cambiar freno',
+        'responsable': 'Ana Muñoz', 'fecha_compromiso': '2024-04-01',
+    })
+    return datos
@@ -0,0 +1,28 @@
+"""
+Archivo histórico de RCAs (utils/archivado.py)
+"""
+
+def test_ids_archivados_no_se_reutilizan(client, rca):
+    from database import SessionLocal
+    from utils.archivado import archivar
+
+    # RCA cerrado antiguo con el id más alto de rcas y de comentarios
+    antiguo = client.post('/rca', json={
+        'codigo': 'RCA-TEST-ARCH', 'titulo': 'Falla antigua', 'fecha_evento': '2015-01-10T08:00:00',
+    }).json()
+    client.put(f"/rca/{antiguo['id']}", json={'estado': 'Cerrado', 'fecha_cierre': '2015-02-01'})
+    comentario = client.post(f"/rca/{antiguo['id']}/comentarios", json={'comentario': 'Cerrado en 2015'}).json()
+
+    assert archivar(SessionLocal, anios=3)['rcas'] >= 1
+
+    nuevo = client.post('/rca', json={
+        'codigo': 'RCA-TEST-NUEVO', 'titulo': 'Falla nueva', 'fecha_evento': '2024-05-01T08:00:00',
+    }).json()
+    nuevo_comentario = client.post(f"/rca/{nuevo['id']}/comentarios", json={'comentario': 'Nuevo'}).json()
+    try:
+        assert nuevo['id'] > antiguo['id']
+        assert nuevo_comentario['id'] > comentario['id']
+        # El archivado sigue disponible por su id
+        assert client.get(f"/rca/{antiguo['id']}").json()['codigo'] == 'RCA-TEST-ARCH'
+    finally:
+        client.delete(f"/rca/{nuevo['id']}")
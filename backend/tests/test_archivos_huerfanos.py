@@ -0,0 +1,76 @@
+"""
+Limpieza de archivos huérfanos (utils/archivos_huerfanos.py)
+"""
+import os
+import time
+
+import pytest
+
+from config import config
+from utils.archivos_huerfanos import CARPETA_CUARENTENA, limpiar
+
+def _crear(ruta, antiguedad_horas=48):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(b'evidencia')
+    mtime = time.time() - antiguedad_horas * 3600
+    os.utime(ruta, (mtime, mtime))
+
+def _registrar(rca, ruta):
+    import models
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        fila = models.Archivo(
+            rca_id=rca['id'], nombre_archivo=os.path.basename(ruta), tipo_archivo='foto', ruta_archivo=ruta,
+        )
+        db.add(fila)
+        db.commit()
+        return fila.id
+
+def _borrar_registro(archivo_id):
+    import models
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        db.query(models.Archivo).filter(models.Archivo.id == archivo_id).delete()
+        db.commit()
+
+@pytest.fixture
+def archivo_relativo(rca):
+    """Fila de archivos con la ruta relativa (como la guardaba ARCHIVOS_PATH por defecto)"""
+    ruta = os.path.join(config.ARCHIVOS_PATH, 'fotos', 'referenciada.jpg')
+    _crear(ruta)
+    archivo_id = _registrar(rca, os.path.relpath(ruta))
+    yield ruta
+    _borrar_registro(archivo_id)
+
+def test_ruta_relativa_no_es_huerfana_con_archivos_path_absoluto(archivo_relativo):
+    from database import SessionLocal
+
+    assert os.path.isabs(config.ARCHIVOS_PATH)
+    huerfano = os.path.join(config.ARCHIVOS_PATH, 'fotos', 'huerfana.jpg')
+    _crear(huerfano)
+
+    resumen = limpiar(SessionLocal, modo='cuarentena', gracia_horas=1)
+
+    assert os.path.exists(archivo_relativo)
+    assert not os.path.exists(huerfano)
+    assert resumen['huerfanos'] == 1
+    assert resumen['muestra_huerfanos'] == ['fotos/huerfana.jpg']
+
+def test_aborta_si_el_recorrido_no_encuentra_archivos_registrados(rca):
+    from database import SessionLocal
+
+    # El único archivo registrado está en la cuarentena, que el recorrido omite
+    registrado = os.path.join(config.ARCHIVOS_PATH, CARPETA_CUARENTENA, 'manual', 'fotos', 'movida.jpg')
+    _crear(registrado)
+    archivo_id = _registrar(rca, registrado)
+    huerfano = os.path.join(config.ARCHIVOS_PATH, 'fotos', 'otra_huerfana.jpg')
+    _crear(huerfano)
+    try:
+        with pytest.raises(RuntimeError, match="no encontró ningún archivo registrado"):
+            limpiar(SessionLocal, modo='cuarentena', gracia_horas=1)
+        assert os.path.exists(huerfano)
+    finally:
+        _borrar_registro(archivo_id)
@@ -0,0 +1,25 @@
+"""
+Exportación de RCAs (utils/exportar.py)
+"""
+import csv
+import io
+import json
+
+def test_csv_neutraliza_formulas(client):
+    rca = client.post('/rca', json={
+        'codigo': 'RCA-TEST-CSV', 'titulo': '=HYPERLINK("http://x","clic")', 'area': 'Inyección',
+        'fecha_evento': '2024-06-01T08:00:00', 'cinco_porques': ['-2+3', '@SUM(A1)', 'Sin fórmula'],
+    }).json()
+    try:
+        respuesta = client.get('/reportes/exportar', params={'formato': 'csv', 'area': 'Inyección'})
+        filas = list(csv.DictReader(io.StringIO(respuesta.content.decode('utf-8-sig'))))
+        assert len(filas) == 1
+        assert filas[0]['titulo'] == '\'=HYPERLINK("http://x","clic")'
+        assert (filas[0]['porque_1'], filas[0]['porque_2'], filas[0]['porque_3']) == ("'-2+3", "'@SUM(A1)", 'Sin fórmula')
+
+        # NDJSON entrega el texto tal cual
+        respuesta = client.get('/reportes/exportar', params={'formato': 'ndjson', 'area': 'Inyección'})
+        fila = json.loads(respuesta.text.splitlines()[0])
+        assert fila['titulo'] == '=HYPERLINK("http://x","clic")'
+    finally:
+        client.delete(f"/rca/{rca['id']}")
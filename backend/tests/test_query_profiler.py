@@ -0,0 +1,89 @@
+"""
+Presupuestos de consultas SQL por endpoint (utils/query_profiler.py)
+"""
+import pytest
+from fastapi.routing import APIRoute
+
+from utils.query_profiler import PRESUPUESTOS, assert_max_queries, assert_presupuesto
+
+def test_todas_las_rutas_tienen_presupuesto(client):
+    faltantes = [
+        (metodo, ruta.path)
+        for ruta in client.app.routes if isinstance(ruta, APIRoute)
+        for metodo in ruta.methods
+        if (metodo, ruta.path) not in PRESUPUESTOS
+    ]
+    assert not faltantes, f"Rutas sin presupuesto en PRESUPUESTOS: {sorted(faltantes)}"
+
+def test_assert_max_queries_cuenta_las_sentencias(client, rca):
+    from database import engine_lectura
+
+    with assert_max_queries(engine_lectura, 6) as perfil:
+        respuesta = client.get(f"/rca/{rca['id']}/bundle")
+    assert respuesta.status_code == 200
+    assert 0 < perfil.total <= 6
+
+def test_assert_max_queries_falla_al_exceder(client, rca):
+    from database import engine_lectura
+
+    with pytest.raises(AssertionError, match=r"máximo 0"):
+        with assert_max_queries(engine_lectura, 0):
+            client.get(f"/rca/{rca['id']}")
+
+@pytest.mark.parametrize('url', [
+    '/rca',
+    '/rca/{id}',
+    '/rca/{id}/bundle',
+    '/rca/{id}/cinco-porques',
+    '/rca/{id}/ishikawa',
+    '/archivo?rca_id={id}',
+    '/acciones',
+    '/acciones/tablero',
+    '/estadisticas/resumen',
+    '/reportes/estadisticas?historico=true',
+    '/reportes/por-area',
+    '/reportes/por-criticidad',
+    '/reportes/ishikawa/mapa?refrescar=true',
+    '/equipos',
+    '/autocompletar/equipo?q=sts',
+    '/trabajos',
+])
+def test_lecturas_dentro_del_presupuesto(client, rca, query_budget, url):
+    respuesta = client.get(url.format(id=rca['id']))
+    assert respuesta.status_code == 200, respuesta.text
+    query_budget(respuesta)
+
+def test_escrituras_dentro_del_presupuesto(client, rca, query_budget):
+    respuesta = client.put(f"/rca/{rca['id']}", json={
+        'estado': 'En Análisis', 'cinco_porques': ['Se cortó el cable', 'Freno desgastado', 'Sin inspección'],
+    })
+    assert respuesta.status_code == 200, respuesta.text
+    query_budget(respuesta)
+    query_budget(client.post(f"/rca/{rca['id']}/comentarios", json={'comentario': 'Revisado en terreno'}))
+
+def test_query_budget_falla_si_excede(client, rca):
+    respuesta = client.get(f"/rca/{rca['id']}/bundle")
+    with pytest.raises(AssertionError, match=r"ejecutó \d+ sentencias SQL \(máximo 0\)"):
+        assert_presupuesto(respuesta, {("GET", "/rca/{rca_id}/bundle"): 0})
+
+def test_query_budget_falla_sin_presupuesto(client):
+    respuesta = client.get('/acciones')
+    with pytest.raises(AssertionError, match="Sin presupuesto"):
+        assert_presupuesto(respuesta, {("GET", "/otra"): 1})
+
+def test_sin_explain_en_consultas_en_stream(client, monkeypatch):
+    from sqlalchemy import text
+    from config import config
+    from database import engine
+    from utils.query_profiler import perfilar
+
+    monkeypatch.setattr(config, 'SLOW_QUERY_MS', 0)
+    with perfilar() as perfil, engine.connect() as conn:
+        conn.execute(text("SELECT id FROM rcas")).all()
+        conn.execution_options(stream_results=True).execute(text("SELECT id, codigo FROM rcas")).all()
+        # yield_per (exportación) también abre un cursor del servidor
+        conn.execution_options(yield_per=10).execute(text("SELECT id, titulo FROM rcas")).all()
+    normal, en_stream, con_yield_per = perfil.lentas
+    assert normal[2] and not isinstance(normal[2][0], str)
+    assert en_stream[2] is None
+    assert con_yield_per[2] is None
@@ -0,0 +1,72 @@
+"""
+Encolado de trabajos por POST /trabajos
+"""
+import pytest
+
+@pytest.mark.parametrize('tipo, parametros', [
+    ('importar_rcas', {'ruta': '/etc/passwd'}),
+    ('limpiar_archivos', {'eliminar_registros': True, 'gracia_horas': 0}),
+    ('archivar_rcas', {'anios': 0}),
+    ('marcar_acciones_vencidas', {}),
+    ('no_existe', {}),
+])
+def test_tipos_internos_no_se_pueden_encolar(client, tipo, parametros):
+    respuesta = client.post('/trabajos', json={'tipo': tipo, 'parametros': parametros})
+    assert respuesta.status_code == 400
+    assert 'Tipo no disponible' in respuesta.json()['detail']
+
+@pytest.mark.parametrize('tipo, parametros', [
+    ('backup_completo', {'destino': '/tmp'}),
+    ('reportes_pdf', {}),
+    ('reportes_pdf', {'rca_ids': 'todos'}),
+    ('miniaturas', {'ancho': 100000}),
+])
+def test_parametros_invalidos(client, tipo, parametros):
+    respuesta = client.post('/trabajos', json={'tipo': tipo, 'parametros': parametros})
+    assert respuesta.status_code == 400, respuesta.text
+
+def test_encolar_trabajo_valido(client, rca):
+    respuesta = client.post('/trabajos', json={'tipo': 'reportes_pdf', 'parametros': {'rca_ids': [rca['id']]}})
+    assert respuesta.status_code == 202, respuesta.text
+    datos = respuesta.json()
+    assert datos['parametros'] == {'rca_ids': [rca['id']]}
+    assert client.post(f"/trabajos/{datos['id']}/cancelar").status_code == 200
+
+def test_recuperar_solo_trabajos_sin_latido(client):
+    from datetime import datetime, timedelta
+    import models
+    from database import SessionLocal
+    from utils.trabajos import recuperar_interrumpidos
+
+    with SessionLocal() as db:
+        vivo = models.Trabajo(tipo='miniaturas', estado='En Ejecución', ejecutado_por='otro:1', latido=datetime.now())
+        caido = models.Trabajo(
+            tipo='miniaturas', estado='En Ejecución', ejecutado_por='otro:2',
+            latido=datetime.now() - timedelta(minutes=10)
+        )
+        db.add_all([vivo, caido])
+        db.commit()
+        try:
+            assert recuperar_interrumpidos(db, vencido_seg=60) == 1
+            db.expire_all()
+            assert vivo.estado == 'En Ejecución' and vivo.ejecutado_por == 'otro:1'
+            assert caido.estado == 'Pendiente' and caido.ejecutado_por is None
+        finally:
+            db.delete(vivo)
+            db.delete(caido)
+            db.commit()
+
+def test_periodico_no_se_encola_dos_veces(client):
+    import models
+    from database import SessionLocal
+    from utils.trabajos import _encolar_periodico
+
+    with SessionLocal() as db:
+        try:
+            assert _encolar_periodico(db, 'marcar_acciones_vencidas')
+            assert not _encolar_periodico(db, 'marcar_acciones_vencidas')
+            trabajos = db.query(models.Trabajo).filter(models.Trabajo.tipo == 'marcar_acciones_vencidas').all()
+            assert [(t.estado, t.prioridad, t.creado_por) for t in trabajos] == [('Pendiente', 8, 'sistema')]
+        finally:
+            db.query(models.Trabajo).filter(models.Trabajo.tipo == 'marcar_acciones_vencidas').delete()
+            db.commit()
@@ -0,0 +1,201 @@
+"""
+Archivo histórico de RCAs cerrados y cancelados
+
+Los RCAs cerrados o cancelados hace más de ARCHIVADO_ANIOS casi no se leen,
+pero son la mayor parte de `rcas` y agrandan cada recorrido e índice del
+listado y las estadísticas. Este módulo los mueve por lotes, con sus 5
+porqués, Ishikawa, archivos, acciones y comentarios, a las tablas *_archivo
+(mismos ids): INSERT ... SELECT en la base y DELETE de las activas, en una
+transacción por lote.
+
+No se archivan RCAs con acciones abiertas. Como el archivo conserva los ids,
+las tablas activas no deben volver a entregarlos: en SQLite son AUTOINCREMENT
+(migración 6) y asegurar_contadores deja el contador de cada tabla por encima
+del id más alto archivado (MySQL antes de 8.0 lo recalcula al reiniciar el
+servidor; se vuelve a asegurar al iniciar la API y tras cada archivado).
+
+Con `comprimir` las evidencias comprimibles (texto, planillas antiguas,
+BMP/TIFF) se guardan como .gz; las fotos, PDFs y videos ya vienen
+comprimidos y se dejan igual. La API las descomprime al servirlas.
+"""
+import os
+import gzip
+import shutil
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, delete, literal, func, or_, and_, text
+
+from config import config
+import models
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_ARCHIVABLES = ('Cerrado', 'Cancelado')
+ACCIONES_ABIERTAS = ('Pendiente', 'En Progreso', 'Vencida')
+EXTENSIONES_COMPRIMIBLES = {'txt', 'csv', 'log', 'json', 'xml', 'html', 'rtf', 'doc', 'xls', 'ppt', 'bmp', 'tif', 'tiff', 'svg', 'dwg', 'dxf'}
+GANANCIA_MINIMA = 0.9  # solo se reemplaza si el .gz ocupa menos del 90 %
+
+# (tabla activa, tabla de archivo) en orden de inserción; el borrado va al revés
+TABLAS = (
+    (models.RCA, models.RCAArchivado),
+    (models.CincoPorques, models.CincoPorquesArchivado),
+    (models.Ishikawa, models.IshikawaArchivado),
+    (models.Archivo, models.ArchivoArchivado),
+    (models.Accion, models.AccionArchivada),
+    (models.Comentario, models.ComentarioArchivado),
+)
+
+def asegurar_contadores(conn):
+    """
+    Dejar el contador de ids de cada tabla activa por encima del id más alto
+    de su tabla de archivo (SQLite: sqlite_sequence; MySQL: AUTO_INCREMENT).
+    Devuelve las tablas ajustadas
+    """
+    motor = conn.dialect.name
+    if motor == 'sqlite':
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")).first() is None:
+            return []
+    elif motor != 'mysql':
+        return []
+    ajustadas = []
+    for activo, archivado in TABLAS:
+        tabla = activo.__tablename__
+        archivado_max = conn.execute(select(func.max(archivado.id))).scalar() or 0
+        if motor == 'sqlite':
+            actual = conn.execute(
+                text("SELECT seq FROM sqlite_sequence WHERE name = :tabla"), {"tabla": tabla}
+            ).scalar()
+            if not archivado_max or (actual is not None and actual >= archivado_max):
+                continue
+            if actual is None:
+                conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:tabla, :seq)"),
+                             {"tabla": tabla, "seq": archivado_max})
+            else:
+                conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :tabla"),
+                             {"tabla": tabla, "seq": archivado_max})
+        else:
+            # Solo hace falta si el archivo tiene ids por encima de los activos
+            if archivado_max <= (conn.execute(select(func.max(activo.id))).scalar() or 0):
+                continue
+            conn.execute(text(f"ALTER TABLE {tabla} AUTO_INCREMENT = {archivado_max + 1}"))
+        ajustadas.append(tabla)
+    return ajustadas
+
+def _con_acciones_abiertas(db):
+    """RCAs con acciones abiertas (una lectura por el índice de estado de acciones)"""
+    A = models.Accion
+    return set(db.execute(select(A.rca_id).where(A.estado.in_(ACCIONES_ABIERTAS)).distinct()).scalars())
+
+def candidatos(db, corte, limite, desde_id=0):
+    """Ids de RCAs cerrados/cancelados antes del corte con id > desde_id, en orden"""
+    R = models.RCA
+    return list(db.execute(
+        select(R.id).where(
+            R.id > desde_id,
+            R.estado.in_(ESTADOS_ARCHIVABLES),
+            or_(R.fecha_cierre < corte.date(), and_(R.fecha_cierre.is_(None), R.fecha_evento < corte)),
+        ).order_by(R.id).limit(limite)
+    ).scalars())
+
+def _copiar(db, activo, archivado, condicion, ahora):
+    """INSERT ... SELECT de las filas de `activo` que cumplen la condición"""
+    columnas = [c.name for c in activo.__table__.c]
+    extra = {'fecha_archivado': literal(ahora), 'comprimido': literal(False)}
+    propias = [c.name for c in archivado.__table__.c if c.name not in columnas]
+    consulta = select(*activo.__table__.c, *[extra[c] for c in propias]).where(condicion)
+    return db.execute(insert(archivado.__table__).from_select(columnas + propias, consulta)).rowcount
+
+def archivar_lote(db, rca_ids, ahora=None):
+    """Mover RCAs (y sus hijos) al archivo en una transacción. Devuelve filas movidas por tabla"""
+    ahora = ahora or datetime.now()
+    movidas = {}
+    for activo, archivado in TABLAS:
+        condicion = activo.id.in_(rca_ids) if activo is models.RCA else activo.rca_id.in_(rca_ids)
+        movidas[activo.__tablename__] = _copiar(db, activo, archivado, condicion, ahora)
+    for activo, _ in reversed(TABLAS):
+        condicion = activo.id.in_(rca_ids) if activo is models.RCA else activo.rca_id.in_(rca_ids)
+        db.execute(delete(activo.__table__).where(condicion))
+    db.commit()
+    return movidas
+
+def comprimir_evidencias(db, rca_ids):
+    """
+    Comprimir con gzip las evidencias comprimibles de RCAs archivados.
+    Orden seguro: .gz escrito, ruta actualizada en la base y recién ahí se
+    borra el original. Devuelve (archivos comprimidos, bytes liberados)
+    """
+    AA = models.ArchivoArchivado
+    comprimidos, originales, liberados = 0, [], 0
+    for archivo in db.query(AA).filter(AA.rca_id.in_(rca_ids), AA.comprimido.is_(False)):
+        ext = (archivo.tipo_archivo or os.path.splitext(archivo.ruta_archivo)[1].lstrip('.')).lower()
+        if ext not in EXTENSIONES_COMPRIMIBLES or not os.path.isfile(archivo.ruta_archivo):
+            continue
+        destino = archivo.ruta_archivo + '.gz'
+        temporal = destino + '.tmp'
+        try:
+            with open(archivo.ruta_archivo, 'rb') as origen, gzip.open(temporal, 'wb', compresslevel=6) as gz:
+                shutil.copyfileobj(origen, gz, 1024 * 1024)
+            tamanio, tamanio_gz = os.path.getsize(archivo.ruta_archivo), os.path.getsize(temporal)
+            if tamanio_gz >= tamanio * GANANCIA_MINIMA:
+                os.remove(temporal)
+                continue
+            os.replace(temporal, destino)
+        except OSError:
+            logger.exception("No se pudo comprimir la evidencia", extra={"archivo_id": archivo.id})
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            continue
+        originales.append(archivo.ruta_archivo)
+        archivo.ruta_archivo = destino
+        archivo.comprimido = True
+        comprimidos += 1
+        liberados += tamanio - tamanio_gz
+    db.commit()
+    for ruta in originales:
+        try:
+            os.remove(ruta)
+        except OSError:
+            logger.warning("No se pudo borrar el original comprimido", extra={"ruta": ruta})
+    return comprimidos, liberados
+
+def archivar(fabrica_sesiones, anios=None, tamanio_lote=500, comprimir=None, simular=False, progreso=None):
+    """
+    Archivar todos los RCAs que cumplen el criterio, por lotes. Devuelve
+    {'rcas': n, 'filas': {tabla: n}, 'archivos_comprimidos': n, 'bytes_liberados': n}
+    """
+    anios = config.ARCHIVADO_ANIOS if anios is None else anios
+    comprimir = config.ARCHIVADO_COMPRIMIR if comprimir is None else comprimir
+    corte = datetime.now() - timedelta(days=365.25 * anios)
+    resumen = {'corte': corte, 'rcas': 0, 'filas': {}, 'archivos_comprimidos': 0, 'bytes_liberados': 0}
+
+    with fabrica_sesiones() as db:
+        excluir = _con_acciones_abiertas(db)
+        desde_id = 0
+        while True:
+            ids = candidatos(db, corte, tamanio_lote, desde_id)
+            if not ids:
+                break
+            desde_id = ids[-1]
+            ids = [i for i in ids if i not in excluir]
+            if not ids:
+                continue
+            resumen['rcas'] += len(ids)
+            if simular:
+                continue
+            for tabla, filas in archivar_lote(db, ids).items():
+                resumen['filas'][tabla] = resumen['filas'].get(tabla, 0) + filas
+            if comprimir:
+                comprimidos, liberados = comprimir_evidencias(db, ids)
+                resumen['archivos_comprimidos'] += comprimidos
+                resumen['bytes_liberados'] += liberados
+            if progreso:
+                progreso(resumen)
+        if resumen['rcas'] and not simular:
+            with db.get_bind().begin() as conn:
+                asegurar_contadores(conn)
+
+    logger.info("Archivado de RCAs terminado", extra={
+        "rcas": resumen['rcas'], "simulado": simular, "comprimidos": resumen['archivos_comprimidos']
+    })
+    return resumen
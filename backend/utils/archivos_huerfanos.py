@@ -0,0 +1,293 @@
+"""
+Limpieza de archivos huérfanos en ARCHIVOS_PATH
+
+Borrar un RCA elimina sus filas de `archivos` (cascada) pero deja los
+archivos en disco, y una subida que falla después de escribir el archivo
+lo deja sin fila. Este módulo recorre ARCHIVOS_PATH con os.scandir en orden
+(solo los nombres del directorio en curso quedan en memoria) y compara cada
+lote de rutas con las de `archivos` y `archivos_archivo`. Ambos lados se
+comparan por realpath: las filas guardan la ruta tal como se armó al subir
+(relativa si ARCHIVOS_PATH lo era) y la configuración actual puede ser
+absoluta. Además de las evidencias se conservan:
+
+- miniaturas/<archivo_id>_<ancho>_<huella>.jpg mientras exista el archivo
+- pdfs/RCA_<codigo>.pdf (reportes generados) mientras exista el RCA
+- importaciones/: archivo subido, checkpoint y errores mientras exista el trabajo
+  (subidas de versiones anteriores; las nuevas van a IMPORTACIONES_PATH)
+
+Un huérfano solo se toca si no se modificó en LIMPIEZA_GRACIA_HORAS (una
+subida o importación en curso todavía no tiene registro). En modo
+cuarentena se mueve a ARCHIVOS_PATH/_cuarentena/<fecha>/ con la misma ruta
+relativa, y los lotes de cuarentena se borran pasados LIMPIEZA_RETENCION_DIAS;
+para recuperar un archivo basta moverlo de vuelta.
+
+También informa las filas de archivos cuyo archivo ya no existe y, si se
+pide, las elimina. Si ninguna fila apunta a un archivo existente dentro de
+ARCHIVOS_PATH, o el recorrido no encuentra ninguno de esos archivos, se aborta
+sin mover nada: lo más probable es que no sea la carpeta de esta base.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+
+from config import config
+import models
+from utils.miniaturas import CARPETA_MINIATURAS
+
+logger = logging.getLogger(__name__)
+
+MODOS = ('reportar', 'cuarentena')
+CARPETA_CUARENTENA = '_cuarentena'
+CARPETA_PDFS = 'pdfs'
+CARPETA_IMPORTACIONES = 'importaciones'
+SUFIJOS_IMPORTACION = ('.checkpoint.json', '.errores.csv')
+FORMATO_LOTE = '%Y%m%d_%H%M%S'
+MUESTRA = 50  # rutas de ejemplo en el resumen
+
+TABLAS_ARCHIVOS = (models.Archivo, models.ArchivoArchivado)
+TABLAS_RCAS = (models.RCA, models.RCAArchivado)
+
+_RE_MINIATURA = re.compile(r'^(\d+)_\d+_[0-9a-f]+\.jpg$')
+_RE_PDF_RCA = re.compile(r'^RCA_(.+)\.pdf$')
+
+# ==================== RECORRIDO ====================
+def recorrer(directorio, relativo='', omitir=()):
+    """
+    (ruta, ruta_relativa con '/') de los archivos bajo directorio, en orden.
+    `omitir` son carpetas del primer nivel que no se recorren
+    """
+    hijos = []
+    with os.scandir(directorio) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if relativo or entry.name not in omitir:
+                    hijos.append((entry.name + '/', entry.name, True))
+            elif entry.is_file(follow_symlinks=False):
+                hijos.append((entry.name, entry.name, False))
+    # Con '/' al final de las carpetas el orden coincide con el de la ruta completa
+    hijos.sort()
+    for _, nombre, es_carpeta in hijos:
+        ruta = os.path.join(directorio, nombre)
+        if es_carpeta:
+            yield from recorrer(ruta, f"{relativo}{nombre}/")
+        else:
+            yield ruta, relativo + nombre
+
+def _lotes(iterable, tamanio):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamanio:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+# ==================== CLASIFICACIÓN ====================
+def _existentes(db, modelos, columna, valores):
+    """Valores de `columna` presentes en alguna de las tablas"""
+    encontrados = set()
+    if not valores:
+        return encontrados
+    for modelo in modelos:
+        atributo = getattr(modelo, columna)
+        encontrados.update(db.execute(select(atributo).where(atributo.in_(list(valores)))).scalars())
+    return encontrados
+
+def _importaciones_registradas(db):
+    """Rutas (absolutas) de los archivos subidos de los trabajos de importación"""
+    parametros = db.execute(
+        select(models.Trabajo.parametros).where(models.Trabajo.tipo == 'importar_rcas')
+    ).scalars()
+    rutas = (json.loads(p or '{}').get('ruta') for p in parametros)
+    return {os.path.abspath(r) for r in rutas if r}
+
+def _base_importacion(ruta):
+    for sufijo in SUFIJOS_IMPORTACION:
+        if ruta.endswith(sufijo):
+            return ruta[:-len(sufijo)]
+    return ruta
+
+def huerfanas(db, lote, importaciones, referenciadas):
+    """
+    Rutas del lote [(ruta, relativa)] que no pertenecen a ningún registro.
+    `referenciadas` son los realpath de los archivos de las filas (ver limpiar)
+    """
+    pendientes, miniaturas, pdfs = [], {}, {}
+    for ruta, relativa in lote:
+        if os.path.realpath(ruta) in referenciadas:
+            continue
+        pendientes.append((ruta, relativa))
+        carpeta, _, nombre = relativa.rpartition('/')
+        if carpeta == CARPETA_MINIATURAS and _RE_MINIATURA.match(nombre):
+            miniaturas[ruta] = int(_RE_MINIATURA.match(nombre).group(1))
+        elif carpeta == CARPETA_PDFS and _RE_PDF_RCA.match(nombre):
+            pdfs[ruta] = _RE_PDF_RCA.match(nombre).group(1)
+
+    archivos = _existentes(db, TABLAS_ARCHIVOS, 'id', set(miniaturas.values()))
+    codigos = _existentes(db, TABLAS_RCAS, 'codigo', set(pdfs.values()))
+    resultado = []
+    for ruta, relativa in pendientes:
+        if ruta in miniaturas and miniaturas[ruta] in archivos:
+            continue
+        if ruta in pdfs and pdfs[ruta] in codigos:
+            continue
+        if relativa.startswith(CARPETA_IMPORTACIONES + '/') and os.path.abspath(_base_importacion(ruta)) in importaciones:
+            continue
+        resultado.append((ruta, relativa))
+    return resultado
+
+def registros_sin_archivo(db, modelo, tamanio_lote=1000):
+    """(fila, existe) de cada registro de archivos, por lotes de id"""
+    desde_id = 0
+    while True:
+        filas = db.execute(
+            select(modelo.id, modelo.rca_id, modelo.ruta_archivo)
+            .where(modelo.id > desde_id).order_by(modelo.id).limit(tamanio_lote)
+        ).all()
+        if not filas:
+            return
+        desde_id = filas[-1].id
+        for fila in filas:
+            yield fila, os.path.isfile(fila.ruta_archivo)
+
+# ==================== CUARENTENA ====================
+def _a_cuarentena(ruta, relativa, carpeta_lote):
+    destino = os.path.join(carpeta_lote, *relativa.split('/'))
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    shutil.move(ruta, destino)
+
+def purgar_cuarentena(carpeta, retencion_dias, ahora=None):
+    """Borrar los lotes de cuarentena más antiguos que la retención. Devuelve (lotes, bytes liberados)"""
+    if not os.path.isdir(carpeta):
+        return 0, 0
+    limite = (ahora or datetime.now()) - timedelta(days=retencion_dias)
+    lotes, liberados = 0, 0
+    for nombre in sorted(os.listdir(carpeta)):
+        try:
+            fecha = datetime.strptime(nombre, FORMATO_LOTE)
+        except ValueError:
+            continue
+        if fecha >= limite:
+            continue
+        ruta = os.path.join(carpeta, nombre)
+        liberados += sum(os.path.getsize(r) for r, _ in recorrer(ruta))
+        shutil.rmtree(ruta)
+        lotes += 1
+    return lotes, liberados
+
+def _mover_a_cuarentena(rutas, carpeta_lote, resumen):
+    for ruta, relativa in rutas:
+        try:
+            _a_cuarentena(ruta, relativa, carpeta_lote)
+            resumen['en_cuarentena'] += 1
+        except OSError:
+            logger.exception("No se pudo mover a cuarentena", extra={"ruta": ruta})
+
+# ==================== LIMPIEZA ====================
+def limpiar(fabrica_sesiones, modo=None, gracia_horas=None, retencion_dias=None,
+            eliminar_registros=False, tamanio_lote=1000, progreso=None):
+    """
+    Revisar ARCHIVOS_PATH contra la base. Con modo='reportar' no se mueve ni
+    borra nada; con 'cuarentena' se mueven los huérfanos y se purga la
+    cuarentena vencida. Devuelve un resumen con conteos y rutas de ejemplo
+    """
+    modo = modo or config.LIMPIEZA_MODO
+    if modo not in MODOS:
+        raise ValueError(f"modo debe ser {' o '.join(MODOS)}")
+    gracia_horas = config.LIMPIEZA_GRACIA_HORAS if gracia_horas is None else gracia_horas
+    retencion_dias = config.LIMPIEZA_RETENCION_DIAS if retencion_dias is None else retencion_dias
+
+    raiz = config.ARCHIVOS_PATH
+    ahora = datetime.now()
+    limite_mtime = time.time() - gracia_horas * 3600
+    cuarentena = os.path.join(raiz, CARPETA_CUARENTENA)
+    carpeta_lote = os.path.join(cuarentena, ahora.strftime(FORMATO_LOTE))
+    resumen = {
+        'modo': modo, 'archivos_revisados': 0, 'huerfanos': 0, 'bytes_huerfanos': 0, 'recientes': 0,
+        'en_cuarentena': 0, 'registros_sin_archivo': 0, 'registros_eliminados': 0,
+        'lotes_purgados': 0, 'bytes_liberados': 0, 'muestra_huerfanos': [], 'muestra_sin_archivo': [],
+    }
+    if not os.path.isdir(raiz):
+        return resumen
+
+    with fabrica_sesiones() as db:
+        # Registros sin archivo, y realpath de los que sí lo tienen dentro de la raíz
+        raiz_real = os.path.realpath(raiz)
+        referenciadas, a_eliminar = set(), {modelo: [] for modelo in TABLAS_ARCHIVOS}
+        for modelo in TABLAS_ARCHIVOS:
+            for fila, existe in registros_sin_archivo(db, modelo, tamanio_lote):
+                if existe:
+                    real = os.path.realpath(fila.ruta_archivo)
+                    if os.path.commonpath([real, raiz_real]) == raiz_real:
+                        referenciadas.add(real)
+                    continue
+                resumen['registros_sin_archivo'] += 1
+                if len(resumen['muestra_sin_archivo']) < MUESTRA:
+                    resumen['muestra_sin_archivo'].append({
+                        'tabla': modelo.__tablename__, 'id': fila.id, 'rca_id': fila.rca_id, 'ruta': fila.ruta_archivo
+                    })
+                if eliminar_registros:
+                    a_eliminar[modelo].append(fila.id)
+        hay_registros = any(db.execute(select(m.id).limit(1)).first() for m in TABLAS_ARCHIVOS)
+        if not referenciadas and hay_registros:
+            raise RuntimeError(
+                f"Ningún registro de archivos apunta a un archivo existente en {raiz}: revise ARCHIVOS_PATH"
+            )
+
+        # Archivos sin registro. Hasta que el recorrido encuentre algún archivo
+        # referenciado los huérfanos se retienen sin mover: si no encuentra
+        # ninguno se aborta al final sin haber tocado nada
+        importaciones = _importaciones_registradas(db)
+        encontrados, retenidos = 0, []
+        for lote in _lotes(recorrer(raiz, omitir=(CARPETA_CUARENTENA,)), tamanio_lote):
+            resumen['archivos_revisados'] += len(lote)
+            lote_huerfanos = huerfanas(db, lote, importaciones, referenciadas)
+            encontrados += len(lote) - len(lote_huerfanos)
+            for ruta, relativa in lote_huerfanos:
+                try:
+                    stat_result = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                if stat_result.st_mtime > limite_mtime:
+                    resumen['recientes'] += 1
+                    continue
+                resumen['huerfanos'] += 1
+                resumen['bytes_huerfanos'] += stat_result.st_size
+                if len(resumen['muestra_huerfanos']) < MUESTRA:
+                    resumen['muestra_huerfanos'].append(relativa)
+                if modo == 'cuarentena':
+                    retenidos.append((ruta, relativa))
+            if encontrados or not hay_registros:
+                _mover_a_cuarentena(retenidos, carpeta_lote, resumen)
+                retenidos = []
+            # No mantener abierta la transacción de lectura durante todo el recorrido
+            db.rollback()
+            if progreso:
+                progreso(resumen)
+
+        if hay_registros and not encontrados:
+            raise RuntimeError(
+                f"El recorrido de {raiz} no encontró ningún archivo registrado: revise ARCHIVOS_PATH"
+            )
+
+        for modelo, ids in a_eliminar.items():
+            for lote in _lotes(ids, tamanio_lote):
+                db.execute(delete(modelo.__table__).where(modelo.id.in_(lote)))
+                resumen['registros_eliminados'] += len(lote)
+        db.commit()
+
+    if modo == 'cuarentena':
+        resumen['lotes_purgados'], resumen['bytes_liberados'] = purgar_cuarentena(cuarentena, retencion_dias, ahora)
+
+    logger.info("Limpieza de archivos terminada", extra={
+        "modo": modo, "revisados": resumen['archivos_revisados'], "huerfanos": resumen['huerfanos'],
+        "sin_archivo": resumen['registros_sin_archivo'], "liberados": resumen['bytes_liberados'],
+    })
+    return resumen
@@ -0,0 +1,219 @@
+"""
+Autocompletado para las tablets: equipo, área, sistema, tipo de falla y categoría
+
+Cada campo tiene un índice de prefijos en memoria: una lista ordenada de
+claves normalizadas (sin tildes, minúsculas) donde la búsqueda es un bisect
+más un recorrido corto. Se indexa el texto completo y cada palabra ("lubric"
+encuentra "Falta de lubricación") y la versión sin espacios ("sts0"
+encuentra "STS-01"). Las sugerencias se ordenan por cuántos RCAs usan el
+valor.
+
+Carga: un GROUP BY por campo la primera vez (y cada AUTOCOMPLETAR_TTL_MIN).
+Después las escrituras de RCAs ajustan los conteos con `registrar()`, sin
+volver a consultar la base. Las sugerencias de equipo salen del catálogo.
+"""
+import re
+import time
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+from sqlalchemy import func
+
+from config import config
+from database import SessionLocal
+import models
+from utils.catalogo_equipos import catalogo
+
+CAMPOS_TEXTO = ('area', 'sistema', 'tipo_falla', 'categoria')
+CAMPOS = ('equipo',) + CAMPOS_TEXTO
+
+# Máximo de claves recorridas por búsqueda (acota el tiempo con prefijos de 1 letra)
+MAX_ESCANEO = 5000
+
+def normalizar(texto):
+    """'Grúa  RTG-05' -> 'grua rtg 05'"""
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', texto))
+
+def _claves_busqueda(*textos):
+    """Texto completo, desde cada palabra y sin espacios"""
+    claves = set()
+    for texto in textos:
+        normal = normalizar(texto)
+        if not normal:
+            continue
+        palabras = normal.split(' ')
+        for i in range(len(palabras)):
+            claves.add(' '.join(palabras[i:]))
+        claves.add(normal.replace(' ', ''))
+    return claves
+
+class IndicePrefijos:
+    """Valores de un campo con su frecuencia, buscables por prefijo"""
+
+    def __init__(self):
+        self._entradas = []    # (clave de búsqueda, clave del valor), ordenada
+        self._conteo = Counter()  # clave del valor -> nº de RCAs
+        self._variantes = {}   # clave del valor -> Counter de cómo se escribió
+        self._datos = {}       # clave del valor -> datos extra (ej: nombre del equipo)
+        self._visibles = set()  # claves que se sugieren
+
+    def _indexar(self, clave, *textos):
+        if clave in self._variantes:
+            return
+        self._variantes[clave] = Counter()
+        for busqueda in _claves_busqueda(*textos):
+            insort(self._entradas, (busqueda, clave))
+
+    def sumar(self, valor, cantidad=1):
+        valor = (valor or '').strip()
+        clave = normalizar(valor)
+        if not clave:
+            return
+        self._indexar(clave, valor)
+        self._variantes[clave][valor] += cantidad
+        self._conteo[clave] += cantidad
+        self._visibles.add(clave)
+
+    def restar(self, valor, cantidad=1):
+        valor = (valor or '').strip()
+        clave = normalizar(valor)
+        if clave not in self._variantes:
+            return
+        variantes = self._variantes[clave]
+        variantes[valor] -= cantidad
+        if variantes[valor] <= 0:
+            del variantes[valor]
+        self._conteo[clave] -= cantidad
+        if self._conteo[clave] <= 0:
+            del self._conteo[clave]
+            self._visibles.discard(clave)
+
+    def agregar_fijo(self, clave, valor, datos, *textos):
+        """Valor que se sugiere aunque no tenga uso (equipos del catálogo)"""
+        self._indexar(clave, valor, *textos)
+        self._variantes[clave][valor] += 1
+        self._datos[clave] = datos
+        self._visibles.add(clave)
+
+    def ajustar_conteo(self, clave, cantidad):
+        self._conteo[clave] += cantidad
+
+    def buscar(self, prefijo, limite=10):
+        prefijo = normalizar(prefijo)
+        candidatos = set()
+        for p in {prefijo, prefijo.replace(' ', '')}:
+            i = bisect_left(self._entradas, (p,))
+            fin = min(len(self._entradas), i + MAX_ESCANEO)
+            while i < fin and self._entradas[i][0].startswith(p):
+                clave = self._entradas[i][1]
+                if clave in self._visibles:
+                    candidatos.add(clave)
+                i += 1
+        # Más usados primero; a igual uso, los que empiezan con lo escrito y luego alfabético
+        ordenados = sorted(candidatos, key=lambda c: (-self._conteo[c], not c.startswith(prefijo), c))
+        return [
+            {'valor': self._variantes[c].most_common(1)[0][0], 'frecuencia': self._conteo[c], **self._datos.get(c, {})}
+            for c in ordenados[:limite]
+        ]
+
+class Autocompletado:
+    """Índices de todos los campos; se cargan al primer uso"""
+
+    def __init__(self, ttl_segundos):
+        self.ttl = ttl_segundos
+        self._lock = threading.Lock()
+        self._indices = {}
+        self._equipo_por_id = {}
+        self._version_catalogo = None
+        self._cargado_en = None
+
+    def invalidar(self):
+        """Forzar recarga completa en la próxima búsqueda (cargas masivas)"""
+        with self._lock:
+            self._cargado_en = None
+
+    def _cargar(self):
+        db = SessionLocal()
+        try:
+            indices = {campo: IndicePrefijos() for campo in CAMPOS_TEXTO}
+            for campo in CAMPOS_TEXTO:
+                columna = getattr(models.RCA, campo)
+                for valor, cantidad in db.query(columna, func.count()).filter(columna.isnot(None)).group_by(columna):
+                    indices[campo].sumar(valor, cantidad)
+            usos_equipo = dict(
+                db.query(models.RCA.equipo_id, func.count())
+                .filter(models.RCA.equipo_id.isnot(None)).group_by(models.RCA.equipo_id).all()
+            )
+        finally:
+            db.close()
+        self._indices = indices
+        self._cargar_equipos(usos_equipo)
+        self._cargado_en = time.monotonic()
+
+    def _cargar_equipos(self, usos):
+        """Índice de equipos desde el catálogo en memoria (solo activos)"""
+        indice = IndicePrefijos()
+        equipo_por_id = {}
+        for equipo in catalogo.equipos():
+            clave = normalizar(equipo['codigo_equipo'])
+            equipo_por_id[equipo['id']] = clave
+            if equipo['activo']:
+                indice.agregar_fijo(
+                    clave, equipo['codigo_equipo'],
+                    {'id': equipo['id'], 'nombre': equipo['nombre'], 'area': equipo['area']},
+                    equipo['nombre']
+                )
+            indice.ajustar_conteo(clave, usos.get(equipo['id'], 0))
+        self._indices['equipo'] = indice
+        self._equipo_por_id = equipo_por_id
+        self._version_catalogo = catalogo.version
+
+    def _al_dia(self):
+        if self._cargado_en is None or time.monotonic() - self._cargado_en > self.ttl:
+            self._cargar()
+        elif catalogo.version_actual() != self._version_catalogo:
+            # El catálogo cambió: se rehace solo el índice de equipos conservando los usos
+            anterior = self._indices['equipo']
+            usos = {eid: anterior._conteo.get(clave, 0) for eid, clave in self._equipo_por_id.items()}
+            self._cargar_equipos(usos)
+
+    def sugerir(self, campo, prefijo, limite=10):
+        if campo not in CAMPOS:
+            raise ValueError(f"Campo no soportado: {campo} (use {', '.join(CAMPOS)})")
+        with self._lock:
+            self._al_dia()
+            return self._indices[campo].buscar(prefijo, limite)
+
+    def registrar(self, nuevos=None, anteriores=None):
+        """
+        Ajustar conteos tras una escritura de RCA. `nuevos`/`anteriores` son
+        los valores de `valores_rca()` después y antes del cambio (None al
+        crear o eliminar)
+        """
+        with self._lock:
+            if self._cargado_en is None:
+                return  # se cargará completo al primer uso
+            for valores, signo in ((anteriores, -1), (nuevos, 1)):
+                if not valores:
+                    continue
+                for campo in CAMPOS_TEXTO:
+                    if signo > 0:
+                        self._indices[campo].sumar(valores.get(campo))
+                    else:
+                        self._indices[campo].restar(valores.get(campo))
+                clave = self._equipo_por_id.get(valores.get('equipo_id'))
+                if clave:
+                    self._indices['equipo'].ajustar_conteo(clave, signo)
+
+def valores_rca(rca):
+    """Valores de un RCA que alimentan el autocompletado"""
+    return {campo: getattr(rca, campo) for campo in CAMPOS_TEXTO + ('equipo_id',)}
+
+autocompletado = Autocompletado(config.AUTOCOMPLETAR_TTL_MIN * 60)
+
+def registrar(nuevos=None, anteriores=None):
+    autocompletado.registrar(nuevos, anteriores)
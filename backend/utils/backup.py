@@ -2,55 +2,225 @@
 Utilidad para respaldos automáticos
 """
 import os
+import json
 import shutil
-import subprocess
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from config import config
+from utils.archivos_huerfanos import CARPETA_CUARENTENA
 
-def backup_database():
+def backup_database(chunk_size=5000):
     """
-    Realiza respaldo de la base de datos MySQL/MariaDB
+    Realiza respaldo de la base de datos (MySQL/MariaDB o SQLite)
+    
+    Usa utils.db_dump: cada tabla se lee en bloques con cursor del servidor y se
+    guarda como NDJSON comprimido, sin depender de mysqldump ni exponer la
+    contraseña en la línea de comandos. Todas las tablas salen de la misma
+    instantánea aunque la API siga escribiendo.
     """
+    from database import engine
+    from utils.db_dump import dump_database
+    
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_file = os.path.join(config.RESPALDOS_PATH, f'db_backup_{timestamp}.sql')
+    backup_dir = os.path.join(config.RESPALDOS_PATH, f'db_backup_{timestamp}')
     
     # Asegurar que existe la carpeta de respaldos
     os.makedirs(config.RESPALDOS_PATH, exist_ok=True)
     
-    # Comando mysqldump (ajustar ruta según instalación XAMPP)
-    mysqldump_path = r'C:\xampp\mysql\bin\mysqldump.exe'
-    
-    command = [
-        mysqldump_path,
-        '-u', config.DB_USER,
-        f'-p{config.DB_PASSWORD}',
-        config.DB_NAME,
-        '--result-file', backup_file
-    ]
-    
     try:
-        subprocess.run(command, check=True, capture_output=True)
-        print(f"? Backup de base de datos creado: {backup_file}")
-        return backup_file
-    except subprocess.CalledProcessError as e:
+        dump_database(engine, backup_dir, chunk_size=chunk_size)
+        print(f"? Backup de base de datos creado: {backup_dir}")
+        return backup_dir
+    except Exception as e:
         print(f"? Error al crear backup: {e}")
         return None
 
-def backup_archivos():
+# ==================== SNAPSHOTS INCREMENTALES ====================
+SNAPSHOTS_DIR = 'archivos'
+MANIFEST_NOMBRE = 'manifest.json'
+FORMATO_TIMESTAMP = '%Y%m%d_%H%M%S'
+
+def _sha256(ruta, bloque=1024 * 1024):
+    """Calcular SHA-256 de un archivo leyendo por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _orden_snapshot(nombre):
     """
-    Realiza respaldo de la carpeta de archivos
+    (fecha, secuencia) de un snapshot '<timestamp>' o '<timestamp>_<n>' (varios en el
+    mismo segundo); None si el nombre no es de un snapshot
     """
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_folder = os.path.join(config.RESPALDOS_PATH, f'archivos_{timestamp}')
+    base, sufijo = nombre[:15], nombre[15:]
+    if sufijo and not (sufijo.startswith('_') and sufijo[1:].isdigit()):
+        return None
+    try:
+        return datetime.strptime(base, FORMATO_TIMESTAMP), int(sufijo[1:] or 0)
+    except ValueError:
+        return None
+
+def _listar_snapshots(raiz):
+    """Snapshots completos (con manifiesto) ordenados del más antiguo al más reciente"""
+    if not os.path.isdir(raiz):
+        return []
+    snapshots = []
+    for entry in os.scandir(raiz):
+        if not entry.is_dir() or entry.name.endswith('.tmp') or _orden_snapshot(entry.name) is None:
+            continue
+        if os.path.exists(os.path.join(entry.path, MANIFEST_NOMBRE)):
+            snapshots.append(entry.name)
+    return sorted(snapshots, key=_orden_snapshot)
+
+def _publicar_snapshot(temporal, raiz, timestamp):
+    """
+    Renombrar el snapshot terminado a su nombre definitivo. Si otra ejecución ya
+    publicó uno en el mismo segundo se agrega un sufijo _1, _2, ...
+    """
+    secuencia = 0
+    while True:
+        nombre = timestamp if secuencia == 0 else f"{timestamp}_{secuencia}"
+        destino = os.path.join(raiz, nombre)
+        try:
+            if not os.path.exists(destino):
+                os.rename(temporal, destino)
+                return destino
+        except OSError:
+            # Carrera con otra ejecución entre exists y rename
+            if not os.path.exists(destino):
+                raise
+        secuencia += 1
+
+def _leer_manifest(snapshot_path):
+    """Leer manifiesto de un snapshot ({ruta_relativa: {sha256, tamanio, mtime_ns}})"""
+    with open(os.path.join(snapshot_path, MANIFEST_NOMBRE), encoding='utf-8') as f:
+        return json.load(f)['archivos']
+
+def _enlazar_o_copiar(origen, destino):
+    """Crear hard link; si el sistema de archivos no lo permite, copiar"""
+    try:
+        os.link(origen, destino)
+        return True
+    except OSError:
+        shutil.copy2(origen, destino)
+        return False
+
+def _respaldar_archivo(ruta_rel, stat, origen_dir, destino_dir, anterior_dir, anterior, por_hash):
+    """
+    Respaldar un archivo dentro del snapshot.
+    Devuelve (entrada_manifest, accion) donde accion es 'enlazado' o 'copiado'
+    """
+    partes = ruta_rel.split('/')
+    origen = os.path.join(origen_dir, *partes)
+    destino = os.path.join(destino_dir, *partes)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    
+    previo = anterior.get(ruta_rel)
+    # Sin cambios (mismo tamaño y fecha de modificación): hard link al snapshot anterior
+    if previo and previo['tamanio'] == stat.st_size and previo['mtime_ns'] == stat.st_mtime_ns:
+        enlazado = _enlazar_o_copiar(os.path.join(anterior_dir, *partes), destino)
+        return dict(previo), 'enlazado' if enlazado else 'copiado'
+    
+    # Archivo nuevo o modificado: si el contenido ya existe (renombrado), deduplicar por hash
+    digest = _sha256(origen)
+    entrada = {'sha256': digest, 'tamanio': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if digest in por_hash:
+        enlazado = _enlazar_o_copiar(os.path.join(anterior_dir, *por_hash[digest].split('/')), destino)
+        return entrada, 'enlazado' if enlazado else 'copiado'
+    
+    shutil.copy2(origen, destino)
+    return entrada, 'copiado'
+
+def _recorrer_archivos(raiz, omitir=()):
+    """Recorrer recursivamente con os.scandir devolviendo (ruta_relativa con '/', stat)"""
+    pendientes = [raiz]
+    while pendientes:
+        actual = pendientes.pop()
+        with os.scandir(actual) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if actual == raiz and entry.name in omitir:
+                        continue
+                    pendientes.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, raiz).replace(os.sep, '/'), entry.stat()
+
+def backup_archivos(max_workers=4):
+    """
+    Realiza respaldo incremental de la carpeta de archivos.
+    
+    Cada ejecución crea un snapshot completo en RESPALDOS_PATH/archivos/<timestamp>,
+    pero los archivos sin cambios se enlazan (hard link) al snapshot anterior, por lo
+    que solo ocupan disco los archivos nuevos o modificados. Cada snapshot incluye
+    un manifest.json con el SHA-256 de cada archivo.
+    """
+    raiz = os.path.join(config.RESPALDOS_PATH, SNAPSHOTS_DIR)
+    timestamp = datetime.now().strftime(FORMATO_TIMESTAMP)
+    temporal = None
     
     try:
-        shutil.copytree(config.ARCHIVOS_PATH, backup_folder)
-        print(f"? Backup de archivos creado: {backup_folder}")
+        os.makedirs(raiz, exist_ok=True)
+        
+        # Snapshot anterior como base para los hard links
+        snapshots = _listar_snapshots(raiz)
+        anterior_dir, anterior = None, {}
+        if snapshots:
+            anterior_dir = os.path.join(raiz, snapshots[-1])
+            anterior = _leer_manifest(anterior_dir)
+        por_hash = {datos['sha256']: ruta for ruta, datos in anterior.items()}
+        
+        # Temporal propio de esta ejecución: dos respaldos simultáneos no se pisan
+        temporal = tempfile.mkdtemp(dir=raiz, prefix=f"{timestamp}_", suffix='.tmp')
+        
+        manifest = {}
+        resumen = {'enlazado': 0, 'copiado': 0}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {
+                executor.submit(
+                    _respaldar_archivo, ruta_rel, stat, config.ARCHIVOS_PATH,
+                    temporal, anterior_dir, anterior, por_hash
+                ): ruta_rel
+                # La cuarentena de la limpieza de huérfanos no se respalda
+                for ruta_rel, stat in _recorrer_archivos(config.ARCHIVOS_PATH, omitir=(CARPETA_CUARENTENA,))
+            }
+            for futuro in as_completed(futuros):
+                entrada, accion = futuro.result()
+                manifest[futuros[futuro]] = entrada
+                resumen[accion] += 1
+        
+        with open(os.path.join(temporal, MANIFEST_NOMBRE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'creado': timestamp,
+                'base': snapshots[-1] if snapshots else None,
+                'archivos': dict(sorted(manifest.items()))
+            }, f, indent=1)
+        
+        # El snapshot solo es visible cuando está completo
+        backup_folder = _publicar_snapshot(temporal, raiz, timestamp)
+        print(f"? Backup de archivos creado: {backup_folder} "
+              f"({resumen['copiado']} copiados, {resumen['enlazado']} enlazados)")
         return backup_folder
     except Exception as e:
         print(f"? Error al respaldar archivos: {e}")
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
         return None
 
+def verificar_snapshot(snapshot_path):
+    """
+    Verifica un snapshot contra su manifiesto.
+    Devuelve la lista de rutas relativas faltantes o con checksum distinto
+    """
+    errores = []
+    for ruta_rel, datos in _leer_manifest(snapshot_path).items():
+        ruta = os.path.join(snapshot_path, *ruta_rel.split('/'))
+        if not os.path.exists(ruta) or _sha256(ruta) != datos['sha256']:
+            errores.append(ruta_rel)
+    return errores
+
 def backup_completo():
     """
     Realiza respaldo completo (base de datos + archivos)
@@ -61,6 +231,7 @@ def backup_completo():
     
     db_backup = backup_database()
     archivos_backup = backup_archivos()
+    limpiar_backups_antiguos()
     
     print(f"\n{'='*50}")
     if db_backup and archivos_backup:
@@ -71,12 +242,69 @@ def backup_completo():
     
     return db_backup, archivos_backup
 
-def limpiar_backups_antiguos(dias_mantener=30):
+# ==================== RETENCIÓN ====================
+def _seleccionar_retencion(fechas, diarios, semanales, mensuales):
+    """
+    Política abuelo-padre-hijo: conserva el respaldo más reciente de cada uno de
+    los últimos N días, N semanas ISO y N meses. Devuelve el conjunto a conservar
+    """
+    conservar = set()
+    for cantidad, clave in (
+        (diarios, lambda f: f.date()),
+        (semanales, lambda f: f.isocalendar()[:2]),
+        (mensuales, lambda f: (f.year, f.month)),
+    ):
+        vistos = []
+        for fecha in sorted(fechas, reverse=True):
+            periodo = clave(fecha)
+            if periodo in vistos:
+                continue
+            if len(vistos) >= cantidad:
+                break
+            vistos.append(periodo)
+            conservar.add(fecha)
+    return conservar
+
+def limpiar_backups_antiguos(dias_mantener=7, semanas_mantener=4, meses_mantener=12, simular=False):
     """
-    Elimina respaldos más antiguos que X días
+    Elimina respaldos fuera de la política de retención (diaria/semanal/mensual).
+    Aplica a los snapshots de archivos y a los respaldos de base de datos.
+    Con simular=True solo devuelve lo que se eliminaría
     """
-    # Implementar si lo necesitas
-    pass
+    snapshots, dumps = {}, {}
+    
+    raiz = os.path.join(config.RESPALDOS_PATH, SNAPSHOTS_DIR)
+    for nombre in _listar_snapshots(raiz):
+        snapshots[os.path.join(raiz, nombre)] = _orden_snapshot(nombre)[0]
+    
+    # Respaldos de base de datos: directorios db_backup_<ts> (y .sql antiguos de mysqldump)
+    if os.path.isdir(config.RESPALDOS_PATH):
+        for entry in os.scandir(config.RESPALDOS_PATH):
+            if entry.name.startswith('db_backup_') and not entry.name.endswith('.tmp'):
+                try:
+                    fecha = datetime.strptime(entry.name[len('db_backup_'):][:15], FORMATO_TIMESTAMP)
+                except ValueError:
+                    continue
+                dumps[entry.path] = fecha
+    
+    eliminados = []
+    for grupo in (snapshots, dumps):
+        conservar = _seleccionar_retencion(grupo.values(), dias_mantener, semanas_mantener, meses_mantener)
+        for ruta, fecha in sorted(grupo.items(), key=lambda x: x[1]):
+            if fecha in conservar:
+                continue
+            if not simular:
+                # Borrar un snapshot solo quita enlaces: los archivos compartidos
+                # con otros snapshots siguen existiendo
+                if os.path.isdir(ruta):
+                    shutil.rmtree(ruta)
+                else:
+                    os.remove(ruta)
+            eliminados.append(ruta)
+    
+    if eliminados:
+        print(f"? {'Se eliminarían' if simular else 'Eliminados'} {len(eliminados)} respaldos antiguos")
+    return eliminados
 
 if __name__ == "__main__":
     backup_completo()
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Catálogo de equipos en memoria
+
+Los RCAs guardan el equipo como texto libre y los técnicos lo escriben de
+varias formas ("STS-01", "STS 01", "sts-01", "STS01", "STS-1"). Aquí el
+código se normaliza a una clave única para resolver esas variantes contra
+el catálogo sin consultar la base en cada escritura de RCA.
+
+El caché se recarga completo cuando el catálogo cambia (`invalidar()`, lo
+llaman las escrituras de crud) o cada EQUIPOS_CACHE_TTL_MIN, por si otro
+proceso de la API modificó el catálogo.
+"""
+import re
+import time
+import logging
+import threading
+
+from sqlalchemy import select, update, bindparam, func
+
+from config import config
+from database import SessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_EQUIPO = (
+    'id', 'codigo_equipo', 'nombre', 'descripcion', 'area', 'planta',
+    'sistema', 'fabricante', 'modelo', 'criticidad', 'activo',
+)
+
+def normalizar_codigo(texto):
+    """'sts-01', 'STS 01', 'STS1' -> 'STS1' (letras en mayúscula, números sin ceros a la izquierda)"""
+    partes = re.findall(r'[A-Z]+|\d+', (texto or '').upper())
+    return ''.join(str(int(p)) if p.isdigit() else p for p in partes)
+
+class CatalogoEquipos:
+    """Equipos por id y por código normalizado"""
+
+    def __init__(self, ttl_segundos):
+        self.ttl = ttl_segundos
+        self._lock = threading.Lock()
+        self._por_id = {}
+        self._por_clave = {}
+        self._cargado_en = None
+        self.version = 0  # cambia en cada recarga (otros índices en memoria la siguen)
+
+    def invalidar(self):
+        with self._lock:
+            self._cargado_en = None
+
+    def cargar(self, db):
+        """Leer el catálogo completo con la sesión dada"""
+        filas = db.execute(select(*[getattr(models.Equipo, c) for c in COLUMNAS_EQUIPO])).all()
+        por_id, por_clave = {}, {}
+        for fila in filas:
+            equipo = dict(fila._mapping)
+            por_id[equipo['id']] = equipo
+            clave = normalizar_codigo(equipo['codigo_equipo'])
+            anterior = por_clave.get(clave)
+            if anterior is not None:
+                logger.warning("Códigos de equipo equivalentes", extra={
+                    "codigos": [por_id[anterior]['codigo_equipo'], equipo['codigo_equipo']]
+                })
+                # Se prefiere el activo; entre dos activos, el primero
+                if por_id[anterior]['activo'] or not equipo['activo']:
+                    continue
+            por_clave[clave] = equipo['id']
+        self._por_id, self._por_clave = por_id, por_clave
+        self._cargado_en = time.monotonic()
+        self.version += 1
+
+    def _al_dia(self):
+        with self._lock:
+            if self._cargado_en is None or time.monotonic() - self._cargado_en > self.ttl:
+                db = SessionLocal()
+                try:
+                    self.cargar(db)
+                finally:
+                    db.close()
+
+    def version_actual(self):
+        """Versión del catálogo (recargándolo antes si hace falta)"""
+        self._al_dia()
+        return self.version
+
+    def equipos(self):
+        """Todos los equipos del catálogo (dicts)"""
+        self._al_dia()
+        return list(self._por_id.values())
+
+    def obtener(self, equipo_id):
+        """Equipo (dict) por id, o None"""
+        self._al_dia()
+        return self._por_id.get(equipo_id)
+
+    def resolver(self, texto):
+        """Equipo (dict) cuyo código coincide con el texto libre, o None"""
+        if not texto:
+            return None
+        self._al_dia()
+        equipo_id = self._por_clave.get(normalizar_codigo(texto))
+        return self._por_id.get(equipo_id) if equipo_id is not None else None
+
+catalogo = CatalogoEquipos(config.EQUIPOS_CACHE_TTL_MIN * 60)
+
+def completar_equipo(datos, actual=None, fuente=None):
+    """
+    Completar los datos de un RCA (create/update) con el catálogo:
+    equipo_id a partir del texto de `equipo` o al revés, y área/planta/sistema
+    del equipo cuando no vienen ni los tiene el RCA `actual`. Lanza
+    ValueError si equipo_id no existe. `fuente` reemplaza al catálogo global
+    (scripts que apuntan a otra base)
+    """
+    fuente = fuente or catalogo
+    if datos.get('equipo_id') is not None:
+        equipo = fuente.obtener(datos['equipo_id'])
+        if equipo is None:
+            raise ValueError(f"Equipo {datos['equipo_id']} no existe en el catálogo")
+        datos.setdefault('equipo', equipo['codigo_equipo'])
+    elif 'equipo' in datos:
+        equipo = fuente.resolver(datos['equipo'])
+        datos['equipo_id'] = equipo['id'] if equipo else None
+    else:
+        return datos
+    if equipo:
+        for campo in ('area', 'planta', 'sistema'):
+            if not datos.get(campo) and not getattr(actual, campo, None):
+                datos[campo] = equipo[campo]
+    return datos
+
+# ==================== BACKFILL ====================
+def vincular_rcas(db, solo_pendientes=True, aplicar=True):
+    """
+    Resolver en bloque el texto de equipo de los RCAs existentes.
+
+    Se leen los textos distintos (no cada RCA), se resuelven contra el
+    catálogo y se actualiza con un UPDATE por texto en un solo executemany.
+    Devuelve {'vinculados': n, 'sin_resolver': {texto: rcas}}
+    """
+    # Catálogo propio leído con la misma sesión (el script puede apuntar a otra base)
+    local = CatalogoEquipos(float('inf'))
+    local.cargar(db)
+    R = models.RCA
+    consulta = select(R.equipo, func.count(R.id)).where(R.equipo.isnot(None)).group_by(R.equipo)
+    if solo_pendientes:
+        consulta = consulta.where(R.equipo_id.is_(None))
+
+    asignaciones, sin_resolver, vinculados = [], {}, 0
+    for texto, cantidad in db.execute(consulta):
+        equipo = local.resolver(texto)
+        if equipo is None:
+            sin_resolver[texto] = cantidad
+        else:
+            asignaciones.append({'texto_equipo': texto, 'nuevo_id': equipo['id']})
+            vinculados += cantidad
+
+    if aplicar and asignaciones:
+        sentencia = update(R.__table__).where(R.__table__.c.equipo == bindparam('texto_equipo')).values(
+            equipo_id=bindparam('nuevo_id')
+        )
+        if solo_pendientes:
+            sentencia = sentencia.where(R.__table__.c.equipo_id.is_(None))
+        db.execute(sentencia, asignaciones)
+        db.commit()
+    return {'vinculados': vinculados, 'sin_resolver': sin_resolver}
@@ -0,0 +1,179 @@
+"""
+Respaldo y restauración portable de la base de datos (sin mysqldump)
+
+Cada tabla se lee con un cursor del lado del servidor (stream_results) en bloques
+y se escribe como NDJSON comprimido con gzip: una línea JSON por fila con los
+valores en el orden de columnas del manifiesto. Funciona igual con MySQL y SQLite.
+
+Todas las tablas se leen en una sola conexión dentro de una transacción de
+lectura (instantánea): un RCA creado o borrado mientras corre el respaldo
+aparece completo o no aparece, sin hijos huérfanos ni filas a medias. Las
+escrituras de la API siguen funcionando mientras tanto (InnoDB con
+REPEATABLE READ; SQLite en modo WAL).
+
+Estructura de un respaldo:
+    db_backup_<timestamp>/
+        manifest.json          tablas, columnas y cantidad de filas
+        <tabla>.ndjson.gz      filas de cada tabla
+"""
+import os
+import gzip
+import json
+import shutil
+from datetime import datetime, date
+from decimal import Decimal
+
+from sqlalchemy import DateTime, Date, Numeric, delete
+from sqlalchemy.types import TypeDecorator
+
+from database import Base
+import models  # noqa: F401 - registra las tablas en Base.metadata
+
+MANIFEST_NOMBRE = 'manifest.json'
+EXTENSION = '.ndjson.gz'
+
+def _serializar(valor):
+    """Convertir tipos no nativos de JSON"""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def _conversores(tabla, columnas):
+    """Funciones para reconstruir los tipos Python de cada columna al restaurar"""
+    conversores = []
+    for nombre in columnas:
+        tipo = tabla.c[nombre].type
+        if isinstance(tipo, TypeDecorator):
+            tipo = tipo.impl
+        if isinstance(tipo, DateTime):
+            conversores.append(datetime.fromisoformat)
+        elif isinstance(tipo, Date):
+            conversores.append(date.fromisoformat)
+        elif isinstance(tipo, Numeric):
+            conversores.append(Decimal)
+        else:
+            conversores.append(None)
+    return conversores
+
+def _tablas(nombres=None):
+    """Tablas en orden de dependencias (padres antes que hijos)"""
+    tablas = Base.metadata.sorted_tables
+    if nombres:
+        tablas = [t for t in tablas if t.name in nombres]
+    return tablas
+
+def _iniciar_instantanea(conn):
+    """Abrir en conn una transacción de lectura que ve la base en un único instante"""
+    if conn.dialect.name == 'sqlite':
+        # pysqlite no abre transacción antes de un SELECT: sin BEGIN cada consulta
+        # vería su propio estado. En WAL la instantánea se fija en la primera lectura
+        conn.exec_driver_sql('BEGIN')
+        return
+    # La instantánea dura toda la transacción (en MySQL es el nivel por defecto,
+    # pero el servidor puede estar configurado con otro)
+    conn.execution_options(isolation_level='REPEATABLE READ')
+    if conn.dialect.name == 'mysql':
+        conn.exec_driver_sql('START TRANSACTION WITH CONSISTENT SNAPSHOT')
+    else:
+        conn.begin()
+
+def _dump_tabla(conn, tabla, destino, chunk_size):
+    """Volcar una tabla a <destino>/<tabla>.ndjson.gz. Devuelve cantidad de filas"""
+    columnas = [c.name for c in tabla.columns]
+    filas = 0
+    ruta = os.path.join(destino, tabla.name + EXTENSION)
+    with gzip.open(ruta, 'wt', encoding='utf-8', compresslevel=6) as f:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+            tabla.select().order_by(*tabla.primary_key.columns)
+        )
+        for bloque in result.partitions(chunk_size):
+            f.write(''.join(
+                json.dumps(list(fila), default=_serializar, ensure_ascii=False, separators=(',', ':')) + '\n'
+                for fila in bloque
+            ))
+            filas += len(bloque)
+    return {'columnas': columnas, 'filas': filas}
+
+def dump_database(engine, destino, chunk_size=5000, tablas=None):
+    """
+    Respaldar todas las tablas en el directorio destino.
+
+    Las tablas se vuelcan una tras otra dentro de la misma transacción de
+    lectura, así el respaldo es consistente aunque la API siga escribiendo.
+    Devuelve la ruta del respaldo.
+    """
+    temporal = destino + '.tmp'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    try:
+        seleccion = _tablas(tablas)
+        with engine.connect() as conn:
+            _iniciar_instantanea(conn)
+            creado = datetime.now()
+            resultado = {tabla.name: _dump_tabla(conn, tabla, temporal, chunk_size) for tabla in seleccion}
+            conn.rollback()
+
+        with open(os.path.join(temporal, MANIFEST_NOMBRE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'creado': creado.isoformat(timespec='seconds'),
+                'dialecto': engine.dialect.name,
+                'orden': [t.name for t in seleccion],
+                'tablas': resultado
+            }, f, indent=1)
+
+        os.rename(temporal, destino)
+        return destino
+    except Exception:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+def _leer_filas(ruta, conversores):
+    """Leer filas de un archivo NDJSON comprimido aplicando los conversores"""
+    with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+        for linea in f:
+            valores = json.loads(linea)
+            yield [
+                conv(v) if conv is not None and v is not None else v
+                for conv, v in zip(conversores, valores)
+            ]
+
+def restore_database(engine, origen, batch_size=2000, limpiar=False, tablas=None):
+    """
+    Restaurar un respaldo creado con dump_database.
+
+    Las filas se insertan por lotes (executemany) respetando el orden de
+    dependencias entre tablas. Con limpiar=True se vacían antes las tablas
+    restauradas. Devuelve {tabla: filas_insertadas}
+    """
+    with open(os.path.join(origen, MANIFEST_NOMBRE), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    seleccion = [t for t in _tablas(tablas) if t.name in manifest['tablas']]
+    insertadas = {}
+
+    with engine.begin() as conn:
+        if limpiar:
+            for tabla in reversed(seleccion):
+                conn.execute(delete(tabla))
+
+        for tabla in seleccion:
+            columnas = manifest['tablas'][tabla.name]['columnas']
+            conversores = _conversores(tabla, columnas)
+            insert = tabla.insert()
+            lote = []
+            total = 0
+            for valores in _leer_filas(os.path.join(origen, tabla.name + EXTENSION), conversores):
+                lote.append(dict(zip(columnas, valores)))
+                if len(lote) >= batch_size:
+                    conn.execute(insert, lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                conn.execute(insert, lote)
+                total += len(lote)
+            insertadas[tabla.name] = total
+
+    return insertadas
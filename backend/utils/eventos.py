@@ -0,0 +1,125 @@
+"""
+Pub/sub en proceso para el feed de cambios de RCAs (SSE)
+
+Las escrituras (crud.py, main.py) llaman a `publicar()` después del commit,
+desde cualquier hilo. Cada pantalla conectada a /eventos/rca tiene una
+Suscripcion con su propia cola acotada en el event loop; si un cliente lento
+la llena se le desconecta (el cliente reconecta con Last-Event-ID y recibe lo
+que quede en el historial), así la memoria no crece con clientes atrasados.
+"""
+import asyncio
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+
+from config import config
+import models
+
+TIPOS_EVENTO = (
+    'rca_creado', 'rca_actualizado', 'rca_eliminado',
+    'archivo_nuevo', 'archivo_eliminado', 'comentario_nuevo',
+)
+
+# Marca en la cola: la suscripción fue descartada por lenta
+DESCARTADA = object()
+
+class Suscripcion:
+    """Un cliente conectado: filtros y cola de eventos pendientes de enviar"""
+
+    def __init__(self, loop, areas=None, plantas=None, tipos=None, max_cola=100):
+        self.loop = loop
+        self.areas = set(areas or ())
+        self.plantas = set(plantas or ())
+        self.tipos = set(tipos or ())
+        self.cola = asyncio.Queue(maxsize=max_cola)
+        self.descartada = False
+
+    def acepta(self, evento):
+        if self.tipos and evento['tipo'] not in self.tipos:
+            return False
+        if self.areas and evento.get('area') not in self.areas:
+            return False
+        if self.plantas and evento.get('planta') not in self.plantas:
+            return False
+        return True
+
+    def _entregar(self, evento):
+        """Corre en el event loop del cliente"""
+        if self.descartada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.descartada = True
+            # Liberar lo acumulado y dejar solo la marca de desconexión
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(DESCARTADA)
+
+class Bus:
+    """Distribuye eventos a las suscripciones y guarda los últimos para reconexiones"""
+
+    def __init__(self, historial=500):
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._historial = deque(maxlen=historial)
+
+    @property
+    def hay_suscriptores(self):
+        return bool(self._suscripciones)
+
+    def suscribir(self, suscripcion):
+        with self._lock:
+            if len(self._suscripciones) >= config.EVENTOS_MAX_CLIENTES:
+                return False
+            self._suscripciones.add(suscripcion)
+            return True
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def pendientes_desde(self, ultimo_id, suscripcion):
+        """Eventos del historial posteriores a Last-Event-ID que el cliente acepta"""
+        with self._lock:
+            recientes = list(self._historial)
+        return [e for e in recientes if e['id'] > ultimo_id and suscripcion.acepta(e)]
+
+    def publicar(self, tipo, **datos):
+        """Publicar un evento (seguro desde cualquier hilo; no bloquea)"""
+        with self._lock:
+            evento = {'id': next(self._ids), 'tipo': tipo, 'fecha': datetime.now(), **datos}
+            self._historial.append(evento)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            if suscripcion.descartada:
+                # Ya se le avisó; se quita aunque su stream no haya llegado a cerrarse
+                self.desuscribir(suscripcion)
+                continue
+            if not suscripcion.acepta(evento):
+                continue
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, evento)
+            except RuntimeError:
+                # Event loop cerrado: el cliente ya no existe
+                self.desuscribir(suscripcion)
+        return evento
+
+bus = Bus(historial=config.EVENTOS_HISTORIAL)
+
+# ==================== PUBLICACIÓN DESDE LAS ESCRITURAS ====================
+def publicar_rca(tipo, rca):
+    """Evento de un RCA (creado/actualizado/eliminado)"""
+    bus.publicar(
+        tipo, rca_id=rca.id, codigo=rca.codigo, titulo=rca.titulo,
+        estado=rca.estado, criticidad=rca.criticidad, area=rca.area, planta=rca.planta
+    )
+
+def publicar_relacionado(tipo, db, rca_id, **datos):
+    """Evento de un archivo o comentario; lleva área y planta del RCA para los filtros"""
+    fila = db.query(models.RCA.area, models.RCA.planta).filter(models.RCA.id == rca_id).first()
+    bus.publicar(
+        tipo, rca_id=rca_id, area=fila.area if fila else None, planta=fila.planta if fila else None, **datos
+    )
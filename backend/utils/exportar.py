@@ -0,0 +1,233 @@
+"""
+Exportación de RCAs en streaming (CSV, NDJSON, Parquet)
+
+Los RCAs se leen con un cursor del lado del servidor (yield_per) en bloques;
+por cada bloque se traen sus 5 porqués e Ishikawa con una consulta IN en otra
+conexión (con MySQL el cursor en streaming ocupa la suya) y se escriben las
+filas al formato pedido. Cada bloque se entrega a la respuesta apenas está
+listo: la memoria no depende de cuántos RCAs se exporten y el primer byte
+sale sin esperar al último.
+
+Por defecto solo se exportan los RCAs activos; con historico=True se suman
+los del archivo histórico (tablas *_archivo, ver utils/archivado.py).
+
+En CSV y Parquet los 5 porqués quedan en columnas porque_1..porque_5 y el
+Ishikawa en una columna por categoría 6M (causas separadas por " | "). En
+NDJSON van como lista y objeto.
+"""
+import io
+import csv
+import unicodedata
+from datetime import datetime, date
+from decimal import Decimal
+
+from sqlalchemy import select, union_all, Integer, Boolean, DateTime, Date, Numeric
+from sqlalchemy.types import TypeDecorator
+
+import models
+from utils.serializers import dumps, COLUMNAS_RCA
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pyarrow = None
+
+FORMATOS = {
+    'csv': ('text/csv', 'csv'),  # Starlette agrega charset=utf-8
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+CATEGORIAS_6M = ['Máquina', 'Método', 'Material', 'Mano de obra', 'Medición', 'Medio ambiente']
+MAX_PORQUES = 5
+SEPARADOR_CAUSAS = ' | '
+
+def _columna_ishikawa(categoria):
+    """'Máquina' -> 'ishikawa_maquina'"""
+    sin_tildes = unicodedata.normalize('NFKD', categoria).encode('ascii', 'ignore').decode()
+    return 'ishikawa_' + sin_tildes.lower().replace(' ', '_')
+
+COLUMNAS_PLANAS = (
+    list(COLUMNAS_RCA)
+    + [f'porque_{n}' for n in range(1, MAX_PORQUES + 1)]
+    + [_columna_ishikawa(c) for c in CATEGORIAS_6M]
+    + ['ishikawa_otras']
+)
+
+def formato_disponible(formato):
+    return formato in FORMATOS and (formato != 'parquet' or pyarrow is not None)
+
+# ==================== LECTURA POR BLOQUES ====================
+def _filtrar(R, estado=None, area=None, equipo_id=None, desde=None, hasta=None):
+    consulta = select(*[getattr(R, c) for c in COLUMNAS_RCA])
+    if estado:
+        consulta = consulta.where(R.estado == estado)
+    if area:
+        consulta = consulta.where(R.area == area)
+    if equipo_id is not None:
+        consulta = consulta.where(R.equipo_id == equipo_id)
+    if desde:
+        consulta = consulta.where(R.fecha_evento >= desde)
+    if hasta:
+        consulta = consulta.where(R.fecha_evento < hasta)
+    return consulta
+
+def _consulta(historico=False, **filtros):
+    """RCAs activos; con historico también los del archivo (mismos ids, nunca repetidos)"""
+    if not historico:
+        return _filtrar(models.RCA, **filtros).order_by(models.RCA.id)
+    union = union_all(_filtrar(models.RCA, **filtros), _filtrar(models.RCAArchivado, **filtros))
+    return union.order_by(union.selected_columns.id)
+
+def _hijos(conn, ids, historico=False):
+    """5 porqués e Ishikawa de un bloque de RCAs: ({rca_id: [respuestas]}, {rca_id: {categoria: [causas]}})"""
+    porques, ishikawa = {}, {}
+    tablas = [(models.CincoPorques, models.Ishikawa)]
+    if historico:
+        tablas.append((models.CincoPorquesArchivado, models.IshikawaArchivado))
+    for CP, I in tablas:
+        for rca_id, respuesta in conn.execute(
+            select(CP.rca_id, CP.respuesta).where(CP.rca_id.in_(ids)).order_by(CP.rca_id, CP.nivel)
+        ):
+            porques.setdefault(rca_id, []).append(respuesta)
+        for rca_id, categoria, causa in conn.execute(
+            select(I.rca_id, I.categoria, I.causa).where(I.rca_id.in_(ids)).order_by(I.rca_id, I.id)
+        ):
+            ishikawa.setdefault(rca_id, {}).setdefault(categoria, []).append(causa)
+    return porques, ishikawa
+
+def bloques_rcas(engine, tamanio=2000, historico=False, **filtros):
+    """Generador de listas de RCAs (dicts) con 'cinco_porques' e 'ishikawa' incluidos"""
+    with engine.connect() as cursor, engine.connect() as conn:
+        resultado = cursor.execution_options(yield_per=tamanio).execute(_consulta(historico, **filtros))
+        for particion in resultado.partitions():
+            filas = [dict(fila._mapping) for fila in particion]
+            porques, ishikawa = _hijos(conn, [f['id'] for f in filas], historico)
+            for fila in filas:
+                fila['cinco_porques'] = porques.get(fila['id'], [])
+                fila['ishikawa'] = ishikawa.get(fila['id'], {})
+            yield filas
+
+def aplanar(fila):
+    """RCA con hijos -> dict con las columnas de COLUMNAS_PLANAS"""
+    plana = {c: fila[c] for c in COLUMNAS_RCA}
+    for n in range(MAX_PORQUES):
+        plana[f'porque_{n + 1}'] = fila['cinco_porques'][n] if n < len(fila['cinco_porques']) else None
+    otras = []
+    for categoria, causas in fila['ishikawa'].items():
+        if categoria in CATEGORIAS_6M:
+            plana[_columna_ishikawa(categoria)] = SEPARADOR_CAUSAS.join(causas)
+        else:
+            otras.extend(f'{categoria}: {causa}' for causa in causas)
+    for categoria in CATEGORIAS_6M:
+        plana.setdefault(_columna_ishikawa(categoria), None)
+    plana['ishikawa_otras'] = SEPARADOR_CAUSAS.join(otras) or None
+    return plana
+
+# ==================== FORMATOS ====================
+# Excel interpreta como fórmula una celda que empieza así (inyección CSV)
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+def _texto_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        # Solo en CSV: NDJSON y Parquet se leen como datos, no como celdas
+        return "'" + valor
+    return valor
+
+def exportar_csv(bloques, separador=','):
+    """Bytes CSV por bloque; con BOM para que Excel reconozca UTF-8"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=separador, lineterminator='\r\n')
+    escritor.writerow(COLUMNAS_PLANAS)
+    yield b'\xef\xbb\xbf' + buffer.getvalue().encode('utf-8')
+    for bloque in bloques:
+        buffer.seek(0)
+        buffer.truncate()
+        for fila in bloque:
+            plana = aplanar(fila)
+            escritor.writerow([_texto_csv(plana[c]) for c in COLUMNAS_PLANAS])
+        yield buffer.getvalue().encode('utf-8')
+
+def exportar_ndjson(bloques):
+    for bloque in bloques:
+        yield b''.join(dumps(fila) + b'\n' for fila in bloque)
+
+def _tipo_arrow(columna):
+    """Tipo Arrow de una columna de rcas (DECIMAL como float, igual que la API)"""
+    tipo = models.RCA.__table__.c[columna].type
+    if isinstance(tipo, TypeDecorator):
+        tipo = tipo.impl
+    if isinstance(tipo, Boolean):
+        return pyarrow.bool_()
+    if isinstance(tipo, Integer):
+        return pyarrow.int64()
+    if isinstance(tipo, DateTime):
+        return pyarrow.timestamp('us')
+    if isinstance(tipo, Date):
+        return pyarrow.date32()
+    if isinstance(tipo, Numeric):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+class _Sumidero:
+    """Archivo de solo escritura que acumula lo escrito hasta que se retira"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+def exportar_parquet(bloques):
+    """Un row group de Parquet por bloque; el pie del archivo va al final"""
+    esquema = pyarrow.schema(
+        [(c, _tipo_arrow(c)) for c in COLUMNAS_RCA]
+        + [(c, pyarrow.string()) for c in COLUMNAS_PLANAS[len(COLUMNAS_RCA):]]
+    )
+    sumidero = _Sumidero()
+    escritor = pq.ParquetWriter(sumidero, esquema, compression='snappy')
+    try:
+        for bloque in bloques:
+            columnas = {c: [] for c in COLUMNAS_PLANAS}
+            for fila in bloque:
+                for c, valor in aplanar(fila).items():
+                    columnas[c].append(float(valor) if isinstance(valor, Decimal) else valor)
+            escritor.write_table(pyarrow.table(columnas, schema=esquema))
+            yield sumidero.retirar()
+    finally:
+        escritor.close()
+    yield sumidero.retirar()
+
+def exportar(formato, engine, tamanio=2000, separador=',', **filtros):
+    """Generador de bytes del archivo de exportación"""
+    bloques = bloques_rcas(engine, tamanio, **filtros)
+    if formato == 'csv':
+        return exportar_csv(bloques, separador)
+    if formato == 'ndjson':
+        return exportar_ndjson(bloques)
+    return exportar_parquet(bloques)
@@ -0,0 +1,220 @@
+"""
+Respuesta para servir evidencias con caché de larga duración y soporte de Range
+
+Los archivos subidos nunca cambian (el nombre incluye el timestamp de subida),
+por lo que se envían como inmutables: la tablet los guarda en caché y solo
+revalida con If-None-Match. Range permite adelantar/retroceder en videos.
+"""
+import os
+import gzip
+import stat
+from email.utils import formatdate
+from mimetypes import guess_type
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+CACHE_INMUTABLE = "private, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+URL_CONTENIDO = "/archivo/{rca_id}/{archivo_id}/contenido"
+URL_MINIATURA = "/archivo/{rca_id}/{archivo_id}/miniatura"
+EXTENSIONES_IMAGEN = {'jpg', 'jpeg', 'png', 'gif'}
+
+def archivo_a_dict(archivo, incluir_miniatura: bool = False):
+    """Convertir Archivo a dict con URL para el frontend"""
+    datos = {
+        "id": archivo.id,
+        "rca_id": archivo.rca_id,
+        "nombre_archivo": archivo.nombre_archivo,
+        "ruta_archivo": archivo.ruta_archivo,
+        "url": URL_CONTENIDO.format(rca_id=archivo.rca_id, archivo_id=archivo.id),  # URL para mostrar imagen (cacheable)
+        "tipo_archivo": archivo.tipo_archivo,
+        "tipo_contenido": archivo.tipo_contenido,
+        "tamanio_kb": archivo.tamanio_kb,
+        "fecha_subida": archivo.fecha_subida,
+        "subido_por": archivo.subido_por
+    }
+    if incluir_miniatura:
+        es_imagen = (archivo.tipo_archivo or '').lower() in EXTENSIONES_IMAGEN
+        datos["url_miniatura"] = (
+            URL_MINIATURA.format(rca_id=archivo.rca_id, archivo_id=archivo.id) if es_imagen else None
+        )
+    return datos
+
+class RangoNoSatisfacible(Exception):
+    """El rango pedido está fuera del tamaño del archivo"""
+
+def calcular_etag(stat_result: os.stat_result) -> str:
+    """ETag fuerte a partir de tamaño y fecha de modificación"""
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def parse_range(header: str, tamanio: int):
+    """
+    Interpretar un header Range de un solo rango.
+    Devuelve (inicio, fin) inclusivo, o None si el header debe ignorarse
+    (sintaxis inválida o múltiples rangos: se responde el archivo completo)
+    """
+    unidad, _, rangos = header.partition("=")
+    if unidad.strip().lower() != "bytes" or "," in rangos:
+        return None
+    inicio_txt, sep, fin_txt = rangos.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if inicio_txt == "":
+            # bytes=-N: últimos N bytes
+            sufijo = int(fin_txt)
+            if sufijo <= 0:
+                raise RangoNoSatisfacible()
+            return max(tamanio - sufijo, 0), tamanio - 1
+        inicio = int(inicio_txt)
+        fin = int(fin_txt) if fin_txt else tamanio - 1
+    except ValueError:
+        return None
+    if inicio >= tamanio:
+        raise RangoNoSatisfacible()
+    if inicio > fin:
+        return None
+    return inicio, min(fin, tamanio - 1)
+
+class EvidenciaResponse(Response):
+    """
+    FileResponse con Cache-Control inmutable, ETag/If-None-Match, Range/If-Range
+    y envío zero-copy (extensión ASGI http.response.zerocopysend) cuando el
+    servidor lo soporta; si no, se envía por bloques desde un hilo
+    """
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        request_headers,
+        method: str = "GET",
+        filename: str = None,
+        media_type: str = None,
+    ) -> None:
+        self.path = path
+        self.background = None
+        self.media_type = media_type or guess_type(filename or path)[0] or "application/octet-stream"
+        self.send_header_only = method.upper() == "HEAD"
+        self.init_headers({})
+
+        tamanio = stat_result.st_size
+        etag = calcular_etag(stat_result)
+        self.headers["etag"] = etag
+        self.headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers["cache-control"] = CACHE_INMUTABLE
+        self.headers["accept-ranges"] = "bytes"
+        if filename:
+            self.headers["content-disposition"] = f"inline; filename*=utf-8''{quote(filename)}"
+
+        self.offset, self.count = 0, tamanio
+        self.status_code = 200
+
+        si_no_coincide = request_headers.get("if-none-match")
+        if si_no_coincide and (si_no_coincide.strip() == "*" or etag in [e.strip() for e in si_no_coincide.split(",")]):
+            self.status_code = 304
+            self.count = 0
+            del self.headers["content-type"]
+            return
+
+        rango = request_headers.get("range")
+        si_rango = request_headers.get("if-range")
+        if rango and (si_rango is None or si_rango.strip() == etag):
+            try:
+                limites = parse_range(rango, tamanio)
+            except RangoNoSatisfacible:
+                self.status_code = 416
+                self.count = 0
+                self.headers["content-range"] = f"bytes */{tamanio}"
+                self.headers["content-length"] = "0"
+                return
+            if limites is not None:
+                inicio, fin = limites
+                self.status_code = 206
+                self.offset, self.count = inicio, fin - inicio + 1
+                self.headers["content-range"] = f"bytes {inicio}-{fin}/{tamanio}"
+
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if self.send_header_only or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            pendiente = self.count
+            while pendiente > 0:
+                chunk = await file.read(min(CHUNK_SIZE, pendiente))
+                if not chunk:
+                    break
+                pendiente -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": pendiente > 0,
+                })
+            if pendiente > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def respuesta_comprimida(path: str, stat_result: os.stat_result, request_headers, method: str = "GET", filename: str = None):
+    """
+    Evidencia del archivo histórico guardada como .gz: se descomprime al
+    vuelo. Sin Range (el tamaño descomprimido no se conoce sin leerla)
+    """
+    etag = calcular_etag(stat_result)
+    headers = {"etag": etag, "cache-control": CACHE_INMUTABLE}
+    if filename:
+        headers["content-disposition"] = f"inline; filename*=utf-8''{quote(filename)}"
+    si_no_coincide = request_headers.get("if-none-match")
+    if si_no_coincide and (si_no_coincide.strip() == "*" or etag in [e.strip() for e in si_no_coincide.split(",")]):
+        return Response(status_code=304, headers=headers)
+    media_type = guess_type(filename or path[:-len(".gz")])[0] or "application/octet-stream"
+    if method.upper() == "HEAD":
+        return Response(media_type=media_type, headers=headers)
+
+    def bloques():
+        with gzip.open(path, "rb") as archivo:
+            while True:
+                chunk = archivo.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    return StreamingResponse(bloques(), media_type=media_type, headers=headers)
+
+def ruta_segura(ruta: str, raiz: str):
+    """
+    Resolver la ruta y verificar que está dentro de raiz y es un archivo regular.
+    Devuelve (ruta_absoluta, stat) o None
+    """
+    absoluta = os.path.realpath(ruta)
+    raiz_abs = os.path.realpath(raiz)
+    if os.path.commonpath([absoluta, raiz_abs]) != raiz_abs:
+        return None
+    try:
+        stat_result = os.stat(absoluta)
+    except OSError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    return absoluta, stat_result
@@ -0,0 +1,338 @@
+"""
+Importación masiva de RCAs históricos desde CSV o Excel
+
+El archivo se lee en streaming (csv del estándar o openpyxl en modo
+read_only) y se procesa por lotes:
+
+1. Cada fila se mapea por nombre de columna (tildes y mayúsculas no importan;
+   acepta las columnas de /reportes/exportar) y se valida con RCAImport
+   (RCACreate más los datos de seguimiento).
+2. Se descartan los códigos que ya existen en la base (una consulta IN por
+   lote), así reimportar el mismo archivo no duplica RCAs.
+3. Los RCAs válidos, sus 5 porqués e Ishikawa se insertan con executemany en
+   una transacción por lote.
+4. Tras cada lote confirmado se actualiza el checkpoint
+   (<archivo>.checkpoint.json): si el proceso se corta, la siguiente
+   ejecución continúa desde la última fila confirmada. Las filas con error
+   se agregan a <archivo>.errores.csv (fila, código, campo, error).
+"""
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import logging
+import unicodedata
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+
+import models
+import schemas
+from utils.catalogo_equipos import CatalogoEquipos, completar_equipo
+from utils.exportar import CATEGORIAS_6M
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - depende del entorno
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES_EXCEL = ('.xlsx', '.xlsm')
+CAMPOS_RCA = set(schemas.RCAImport.model_fields) - {'cinco_porques', 'ishikawa'}
+CAMPOS_OBLIGATORIOS = ('codigo', 'titulo', 'fecha_evento')
+CAMPOS_NUMERICOS = {'equipo_id', 'tiempo_parada_horas', 'costo_estimado'}
+CAMPOS_FECHA = {'fecha_evento', 'fecha_creacion', 'fecha_compromiso', 'fecha_cierre', 'fecha_verificacion'}
+FORMATOS_FECHA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y %H:%M', '%d-%m-%Y', '%Y-%m-%d')
+VERDADEROS = {'si', 'sí', 's', 'true', '1', 'x', 'yes'}
+FALSOS = {'no', 'n', 'false', '0'}
+
+def normalizar_encabezado(texto):
+    """'Fecha del Evento' -> 'fecha_del_evento'"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode().lower()
+    return re.sub(r'[^a-z0-9]+', '_', texto).strip('_')
+
+ALIAS = {
+    'fecha': 'fecha_evento',
+    'fecha_del_evento': 'fecha_evento',
+    'fecha_falla': 'fecha_evento',
+    'nombre': 'titulo',
+    'equipo_codigo': 'equipo',
+    'codigo_equipo': 'equipo',
+    'causa_principal': 'causa_raiz',
+    'autor': 'creado_por',
+}
+CATEGORIA_POR_CLAVE = {normalizar_encabezado(c): c for c in CATEGORIAS_6M}
+_PORQUE = re.compile(r'^(?:por_?que|5p|p)_?([1-5])$')
+
+def _destino(encabezado):
+    """Columna del archivo -> ('campo', nombre) | ('porque', n) | ('ishikawa', categoria) | None"""
+    clave = normalizar_encabezado(encabezado)
+    clave = ALIAS.get(clave, clave)
+    if clave in CAMPOS_RCA:
+        return ('campo', clave)
+    coincidencia = _PORQUE.match(clave)
+    if coincidencia:
+        return ('porque', int(coincidencia.group(1)))
+    categoria = clave[len('ishikawa_'):] if clave.startswith('ishikawa_') else clave
+    if categoria in CATEGORIA_POR_CLAVE:
+        return ('ishikawa', CATEGORIA_POR_CLAVE[categoria])
+    if categoria == 'otras':
+        return ('ishikawa', None)
+    return None
+
+# ==================== LECTURA ====================
+def leer_filas(ruta, hoja=None):
+    """Generador de (encabezados, filas) sin cargar el archivo completo"""
+    if ruta.lower().endswith(EXTENSIONES_EXCEL):
+        if openpyxl is None:
+            raise RuntimeError("Leer Excel requiere instalar openpyxl")
+        libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = (libro[hoja] if hoja else libro.active).iter_rows(values_only=True)
+            encabezados = next(filas, None) or ()
+            yield list(encabezados)
+            yield from filas
+        finally:
+            libro.close()
+        return
+
+    with open(ruta, newline='', encoding='utf-8-sig', errors='replace') as f:
+        muestra = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+        except csv.Error:
+            dialecto = csv.excel
+        yield from csv.reader(f, dialecto)
+
+# ==================== CONVERSIÓN ====================
+def _valor(campo, valor):
+    """Normalizar el valor de una celda antes de validarlo"""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip()
+        if valor == '':
+            return None
+        if campo in CAMPOS_FECHA:
+            for formato in FORMATOS_FECHA:
+                try:
+                    return datetime.strptime(valor, formato)
+                except ValueError:
+                    pass
+        elif campo == 'efectivo':
+            minusculas = valor.lower()
+            if minusculas in VERDADEROS:
+                return True
+            if minusculas in FALSOS:
+                return False
+        elif campo in CAMPOS_NUMERICOS and ',' in valor:
+            if valor.rfind(',') > valor.rfind('.'):
+                return valor.replace('.', '').replace(',', '.')  # 1.234,5
+            return valor.replace(',', '')  # 1,234.5
+        return valor
+    if isinstance(valor, datetime) and campo in CAMPOS_FECHA:
+        return valor
+    if campo not in CAMPOS_NUMERICOS and campo != 'efectivo':
+        # Excel entrega números en columnas de texto (ej: código 1234)
+        if isinstance(valor, float) and valor.is_integer():
+            valor = int(valor)
+        return str(valor)
+    return valor
+
+def _causas(texto):
+    return [c for c in re.split(r'\s*(?:\||\n|;)\s*', str(texto)) if c] if texto not in (None, '') else []
+
+def convertir_fila(destinos, valores):
+    """Fila del archivo -> dict para RCAImport"""
+    datos, porques, ishikawa = {}, {}, {}
+    for destino, valor in zip(destinos, valores):
+        if destino is None:
+            continue
+        tipo, nombre = destino
+        if tipo == 'campo':
+            datos[nombre] = _valor(nombre, valor)
+        elif tipo == 'porque':
+            texto = _valor(None, valor)
+            if texto:
+                porques[nombre] = texto
+        else:
+            for causa in _causas(valor):
+                categoria = nombre
+                if categoria is None:  # columna "otras": "Categoría: causa"
+                    categoria, _, causa = causa.partition(':') if ':' in causa else ('Otras', '', causa)
+                    categoria, causa = categoria.strip(), causa.strip()
+                ishikawa.setdefault(categoria, []).append(causa)
+    if porques:
+        datos['cinco_porques'] = [porques.get(n, '') for n in range(1, max(porques) + 1)]
+    if ishikawa:
+        datos['ishikawa'] = ishikawa
+    return datos
+
+def _errores_validacion(error):
+    return [('.'.join(str(p) for p in e['loc']), e['msg']) for e in error.errors()]
+
+# ==================== CHECKPOINT ====================
+def _huella(ruta):
+    """Identidad del archivo: tamaño y hash del primer MB"""
+    with open(ruta, 'rb') as f:
+        inicio = f.read(1024 * 1024)
+    return f"{os.path.getsize(ruta)}-{hashlib.sha1(inicio).hexdigest()}"
+
+def leer_checkpoint(ruta):
+    try:
+        with open(ruta + '.checkpoint.json', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get('huella') == _huella(ruta) else None
+
+def _guardar_checkpoint(ruta, checkpoint):
+    temporal = ruta + '.checkpoint.json.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=1)
+    os.replace(temporal, ruta + '.checkpoint.json')
+
+# ==================== IMPORTACIÓN ====================
+def _insertar_lote(fabrica_sesiones, validos):
+    """Insertar RCAs con sus hijos en una transacción. Devuelve los códigos insertados"""
+    codigos = [d['codigo'] for _, d in validos]
+    ahora = datetime.now()
+    with fabrica_sesiones() as db:
+        existentes = set()
+        for modelo in (models.RCA, models.RCAArchivado):  # los archivados también cuentan
+            existentes.update(db.execute(select(modelo.codigo).where(modelo.codigo.in_(codigos))).scalars())
+        nuevos = [(fila, d) for fila, d in validos if d['codigo'] not in existentes]
+        if not nuevos:
+            return [], existentes
+        rcas = []
+        for _, d in nuevos:
+            rca = {c: d.get(c) for c in CAMPOS_RCA}
+            rca['fecha_creacion'] = rca['fecha_creacion'] or ahora
+            rca['fecha_actualizacion'] = ahora
+            rcas.append(rca)
+        db.execute(insert(models.RCA.__table__), rcas)
+
+        ids = dict(db.execute(
+            select(models.RCA.codigo, models.RCA.id).where(models.RCA.codigo.in_([d['codigo'] for _, d in nuevos]))
+        ).all())
+        porques, causas = [], []
+        for _, d in nuevos:
+            rca_id = ids[d['codigo']]
+            for nivel, respuesta in enumerate(d.get('cinco_porques') or [], start=1):
+                if respuesta and respuesta.strip():
+                    porques.append({'rca_id': rca_id, 'nivel': nivel, 'porque': f"¿Por qué {nivel}?", 'respuesta': respuesta})
+            for categoria, lista in (d.get('ishikawa') or {}).items():
+                causas.extend({'rca_id': rca_id, 'categoria': categoria, 'causa': c} for c in lista if c and c.strip())
+        if porques:
+            db.execute(insert(models.CincoPorques.__table__), porques)
+        if causas:
+            db.execute(insert(models.Ishikawa.__table__), causas)
+        db.commit()
+    return [d['codigo'] for _, d in nuevos], existentes
+
+def importar_archivo(ruta, fabrica_sesiones, tamanio_lote=1000, hoja=None, reanudar=True, progreso=None):
+    """
+    Importar un archivo CSV/Excel de RCAs. Devuelve un resumen con filas
+    leídas, insertadas, omitidas (código ya existente), errores y velocidad.
+    `progreso(resumen)` se llama tras cada lote confirmado
+    """
+    checkpoint = leer_checkpoint(ruta) if reanudar else None
+    if checkpoint is None:
+        checkpoint = {
+            'archivo': os.path.abspath(ruta), 'huella': _huella(ruta),
+            'filas_confirmadas': 0, 'insertados': 0, 'omitidos': 0, 'errores': 0,
+        }
+    ruta_errores = ruta + '.errores.csv'
+    desde = checkpoint['filas_confirmadas']
+    if desde == 0 and os.path.exists(ruta_errores):
+        os.remove(ruta_errores)
+
+    inicio = time.perf_counter()
+    filas = leer_filas(ruta, hoja)
+    encabezados = next(filas, None)
+    if not encabezados:
+        raise ValueError("El archivo está vacío")
+    destinos = [_destino(e) for e in encabezados]
+    faltantes = [c for c in CAMPOS_OBLIGATORIOS if ('campo', c) not in destinos]
+    if faltantes:
+        raise ValueError(
+            f"Faltan las columnas {', '.join(faltantes)} (obligatorias: {', '.join(CAMPOS_OBLIGATORIOS)})"
+        )
+
+    # Catálogo leído con la misma fábrica de sesiones (el script puede apuntar a otra base)
+    equipos = CatalogoEquipos(float('inf'))
+    with fabrica_sesiones() as db:
+        equipos.cargar(db)
+
+    leidas = 0
+    lote = []
+
+    def procesar(lote):
+        validos, errores, vistos = [], [], set()
+        for numero, valores in lote:
+            datos = convertir_fila(destinos, valores)
+            codigo = datos.get('codigo')
+            try:
+                rca = schemas.RCAImport(**datos).dict()
+                completar_equipo(rca, fuente=equipos)
+            except ValidationError as e:
+                errores.extend((numero, codigo, campo, mensaje) for campo, mensaje in _errores_validacion(e))
+                continue
+            except ValueError as e:
+                errores.append((numero, codigo, 'equipo_id', str(e)))
+                continue
+            if rca['codigo'] in vistos:
+                errores.append((numero, codigo, 'codigo', 'Código repetido dentro del archivo'))
+                continue
+            vistos.add(rca['codigo'])
+            validos.append((numero, rca))
+
+        insertados, existentes = _insertar_lote(fabrica_sesiones, validos) if validos else ([], set())
+        if errores:
+            nuevo = not os.path.exists(ruta_errores)
+            with open(ruta_errores, 'a', newline='', encoding='utf-8-sig') as f:
+                escritor = csv.writer(f)
+                if nuevo:
+                    escritor.writerow(['fila', 'codigo', 'campo', 'error'])
+                escritor.writerows(errores)
+        checkpoint['filas_confirmadas'] = lote[-1][0] - 1  # filas de datos (sin encabezado)
+        checkpoint['insertados'] += len(insertados)
+        checkpoint['omitidos'] += len(validos) - len(insertados)
+        checkpoint['errores'] += len({e[0] for e in errores})
+        checkpoint['actualizado'] = datetime.now().isoformat(timespec='seconds')
+        _guardar_checkpoint(ruta, checkpoint)
+        if progreso:
+            progreso(dict(checkpoint))
+
+    for numero, valores in enumerate(filas, start=2):  # la fila 1 es el encabezado
+        if numero - 1 <= desde:
+            continue
+        if not any(v not in (None, '') for v in valores):
+            continue
+        leidas += 1
+        lote.append((numero, valores))
+        if len(lote) >= tamanio_lote:
+            procesar(lote)
+            lote = []
+    if lote:
+        procesar(lote)
+
+    segundos = time.perf_counter() - inicio
+    resumen = {
+        'archivo': checkpoint['archivo'],
+        'reanudado_desde_fila': desde + 1 if desde else None,
+        'filas_leidas': leidas,
+        'insertados': checkpoint['insertados'],
+        'omitidos': checkpoint['omitidos'],
+        'errores': checkpoint['errores'],
+        'reporte_errores': ruta_errores if os.path.exists(ruta_errores) else None,
+        'segundos': round(segundos, 2),
+        'filas_por_segundo': round(leidas / segundos) if segundos > 0 else None,
+    }
+    logger.info("Importación terminada", extra=resumen)
+    return resumen
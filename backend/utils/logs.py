@@ -0,0 +1,144 @@
+"""
+Logging estructurado (JSON) y asíncrono
+
+El hilo del request solo encola el registro (QueueHandler); un hilo aparte
+(QueueListener) lo formatea y lo escribe en consola y, si se configura, en
+archivo. Así una consola lenta del servidor Windows no frena a la API.
+
+Cada línea es un objeto JSON con fecha, nivel, logger, mensaje, request_id
+y los campos pasados en `extra=`:
+
+    logger.debug("Actualizando RCA", extra={"rca_id": 12, "campos": ["estado"]})
+
+Niveles: LOG_LEVEL para todo (INFO por defecto, debug apagado) y LOG_NIVELES
+para módulos puntuales, ej: LOG_NIVELES=crud=DEBUG,routers.rca=DEBUG
+"""
+import sys
+import json
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from config import config
+
+# ID del request en curso (lo fija RequestIdMiddleware)
+request_id_actual: ContextVar = ContextVar('request_id_actual', default=None)
+
+# Atributos propios de LogRecord; el resto son campos de `extra=`
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, record):
+        datos = {
+            'fecha': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            datos['request_id'] = record.request_id
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_RECORD and not clave.startswith('_'):
+                datos[clave] = valor
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class ColaHandler(logging.handlers.QueueHandler):
+    """
+    Encola el registro desde el hilo que loguea. Agrega el request_id (la
+    ContextVar solo existe en ese hilo) y deja el traceback ya como texto
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.request_id = request_id_actual.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+# ==================== CONFIGURACIÓN ====================
+_listener = None
+
+def _parsear_niveles(texto):
+    """'crud=DEBUG,routers.rca=warning' -> {'crud': 'DEBUG', 'routers.rca': 'WARNING'}"""
+    niveles = {}
+    for parte in (texto or '').split(','):
+        if '=' in parte:
+            modulo, nivel = parte.split('=', 1)
+            niveles[modulo.strip()] = nivel.strip().upper()
+    return niveles
+
+def configurar_logs():
+    """Instalar el pipeline cola -> listener en el logger raíz (una sola vez)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    formateador = FormateadorJSON() if config.LOG_JSON else logging.Formatter(
+        '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+    )
+    destinos = [logging.StreamHandler(sys.stdout)]
+    if config.LOG_ARCHIVO:
+        destinos.append(logging.handlers.RotatingFileHandler(
+            config.LOG_ARCHIVO, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'
+        ))
+    for destino in destinos:
+        destino.setFormatter(formateador)
+
+    cola = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    raiz.handlers = [ColaHandler(cola)]
+    raiz.setLevel(config.LOG_LEVEL.upper())
+    for modulo, nivel in _parsear_niveles(config.LOG_NIVELES).items():
+        logging.getLogger(modulo).setLevel(nivel)
+
+    _listener = logging.handlers.QueueListener(cola, *destinos, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logs)
+
+def detener_logs():
+    """Vaciar la cola y detener el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+# ==================== REQUEST ID ====================
+class RequestIdMiddleware:
+    """Toma X-Request-ID del cliente (o genera uno) y lo devuelve en la respuesta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for nombre, valor in scope.get('headers', []):
+            if nombre == b'x-request-id':
+                request_id = valor.decode('latin-1')[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_actual.set(request_id)
+
+        async def send_con_id(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                mensaje['headers'] = list(mensaje.get('headers', [])) + [(b'x-request-id', request_id.encode('latin-1'))]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            request_id_actual.reset(token)
@@ -0,0 +1,246 @@
+"""
+Mapa de calor Ishikawa entre RCAs: categoría (6M) × área / equipo / mes
+
+La carga completa es una sola consulta agrupada por RCA, categoría y causa.
+Las causas se agrupan por texto normalizado ("Falta de lubricación",
+"falta lubricacion", "Lubricación, falta de" caen en el mismo grupo) y el
+resultado queda en memoria.
+
+Las escrituras que tocan el Ishikawa o el área/equipo/fecha de un RCA llaman
+a `marcar(rca_id)`; en la siguiente lectura solo esos RCAs se vuelven a
+consultar: se resta su aporte anterior y se suma el nuevo. Cada
+ISHIKAWA_MAPA_TTL_MIN se recarga todo (cubre cargas masivas hechas fuera
+de la API).
+
+`mapa` cubre los RCAs activos; `mapa_historico` suma los del archivo
+histórico (tablas *_archivo) y solo se carga si alguien lo consulta.
+"""
+import re
+import time
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, select, union_all
+
+from config import config
+from database import SessionLocal
+import models
+
+DIMENSIONES = ('area', 'equipo', 'mes')
+SIN_VALOR = {'area': 'Sin área', 'equipo': 'Sin equipo', 'mes': 'Sin fecha'}
+
+_PALABRAS_VACIAS = {
+    'de', 'del', 'la', 'el', 'los', 'las', 'en', 'por', 'para', 'y', 'o', 'a', 'al',
+    'un', 'una', 'con', 'sin', 'se', 'su', 'sus', 'que', 'lo',
+}
+
+def normalizar_causa(texto):
+    """
+    Clave de agrupación de una causa: minúsculas, sin tildes ni puntuación,
+    sin palabras vacías, plurales simples recortados y palabras ordenadas
+    """
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    palabras = set()
+    for palabra in re.findall(r'[a-z0-9]+', texto):
+        if palabra in _PALABRAS_VACIAS:
+            continue
+        if len(palabra) > 4 and palabra.endswith('es'):
+            palabra = palabra[:-2]
+        elif len(palabra) > 3 and palabra.endswith('s'):
+            palabra = palabra[:-1]
+        palabras.add(palabra)
+    return ' '.join(sorted(palabras))
+
+class MapaIshikawa:
+    """Agregados en memoria, actualizables por RCA"""
+
+    def __init__(self, ttl_segundos, historico=False):
+        self.ttl = ttl_segundos
+        self.historico = historico
+        self._lock = threading.Lock()
+        self._pendientes = set()
+        self._cargado_en = None
+        self.actualizado = None
+        self._vaciar()
+
+    def _vaciar(self):
+        # Grupos de causas: id -> (categoria, clave) y variantes de texto vistas
+        self._grupos = []
+        self._id_grupo = {}
+        self._variantes = []
+        # rca_id -> ({'area': ..., 'equipo': ..., 'mes': ...}, frozenset de (id de grupo, texto))
+        self._aportes = {}
+        # Por dimensión: (valor, categoria) -> nº de RCAs / Counter de grupos
+        self._rcas = {d: Counter() for d in DIMENSIONES}
+        self._causas = {d: defaultdict(Counter) for d in DIMENSIONES}
+
+    # ---------- escritura ----------
+    def marcar(self, rca_id):
+        """Anotar que el Ishikawa o los datos del RCA cambiaron (barato; se aplica al leer)"""
+        with self._lock:
+            # Sin carga vigente la próxima lectura recarga todo (el mapa histórico puede no usarse nunca)
+            if self._cargado_en is not None:
+                self._pendientes.add(rca_id)
+
+    def invalidar(self):
+        """Forzar recarga completa en la próxima lectura"""
+        with self._lock:
+            self._cargado_en = None
+
+    # ---------- carga ----------
+    def _consulta(self, rca_ids=None):
+        """Filas (rca_id, area, equipo, fecha_evento, categoria, causa) sin repetir dentro de un RCA"""
+        E = models.Equipo
+        tablas = [(models.Ishikawa, models.RCA)]
+        if self.historico:
+            tablas.append((models.IshikawaArchivado, models.RCAArchivado))
+        consultas = []
+        for I, R in tablas:
+            # Con equipo vinculado se usa el código del catálogo (une "STS 01" y "sts-01")
+            equipo = func.coalesce(E.codigo_equipo, R.equipo)
+            consulta = select(
+                I.rca_id, R.area, equipo, R.fecha_evento, I.categoria, I.causa
+            ).join(R, R.id == I.rca_id).outerjoin(E, E.id == R.equipo_id).group_by(
+                I.rca_id, R.area, equipo, R.fecha_evento, I.categoria, I.causa
+            )
+            if rca_ids is not None:
+                consulta = consulta.where(I.rca_id.in_(rca_ids))
+            consultas.append(consulta)
+        if len(consultas) == 1:
+            return consultas[0].order_by(models.Ishikawa.rca_id)
+        # Un RCA está en las tablas activas o en el archivo, nunca en ambas
+        union = union_all(*consultas)
+        return union.order_by(union.selected_columns.rca_id)
+
+    def _grupo(self, categoria, causa):
+        clave = (categoria, normalizar_causa(causa))
+        gid = self._id_grupo.get(clave)
+        if gid is None:
+            gid = self._id_grupo[clave] = len(self._grupos)
+            self._grupos.append(clave)
+            self._variantes.append(Counter())
+        return gid
+
+    def _acumular(self, filas):
+        """Agrupar las filas (ordenadas por rca_id) en aportes por RCA"""
+        aportes = {}
+        for rca_id, area, equipo, fecha_evento, categoria, causa in filas:
+            if rca_id not in aportes:
+                aportes[rca_id] = ({
+                    'area': area or SIN_VALOR['area'],
+                    'equipo': (equipo or '').strip() or SIN_VALOR['equipo'],
+                    'mes': fecha_evento.strftime('%Y-%m') if fecha_evento else SIN_VALOR['mes'],
+                }, set())
+            aportes[rca_id][1].add((self._grupo(categoria, causa), causa.strip()))
+        return {rca_id: (valores, frozenset(causas)) for rca_id, (valores, causas) in aportes.items()}
+
+    def _aplicar(self, aporte, signo):
+        valores, causas = aporte
+        for gid, texto in causas:
+            self._variantes[gid][texto] += signo
+            if self._variantes[gid][texto] <= 0:
+                del self._variantes[gid][texto]
+        grupos = {gid for gid, _ in causas}
+        categorias = {self._grupos[g][0] for g in grupos}
+        for dimension in DIMENSIONES:
+            valor = valores[dimension]
+            for categoria in categorias:
+                self._rcas[dimension][(valor, categoria)] += signo
+            for gid in grupos:
+                celda = self._causas[dimension][(valor, self._grupos[gid][0])]
+                celda[gid] += signo
+                if celda[gid] <= 0:
+                    del celda[gid]
+
+    def _cargar_todo(self, db):
+        self._vaciar()
+        self._aportes = self._acumular(db.execute(self._consulta().execution_options(yield_per=5000)))
+        for aporte in self._aportes.values():
+            self._aplicar(aporte, 1)
+        self._cargado_en = time.monotonic()
+
+    def _refrescar(self, db, rca_ids):
+        nuevos = self._acumular(db.execute(self._consulta(rca_ids)))
+        for rca_id in rca_ids:
+            anterior = self._aportes.pop(rca_id, None)
+            if anterior:
+                self._aplicar(anterior, -1)
+            if rca_id in nuevos:
+                self._aportes[rca_id] = nuevos[rca_id]
+                self._aplicar(nuevos[rca_id], 1)
+
+    def _al_dia(self):
+        """Cargar o aplicar los RCAs marcados (con el lock tomado)"""
+        vencido = self._cargado_en is None or time.monotonic() - self._cargado_en > self.ttl
+        if not vencido and not self._pendientes:
+            return
+        db = SessionLocal()  # primario: los cambios recién marcados pueden no estar en la réplica
+        try:
+            if vencido:
+                self._pendientes.clear()
+                self._cargar_todo(db)
+            else:
+                pendientes = list(self._pendientes)
+                self._pendientes.clear()
+                for i in range(0, len(pendientes), 500):
+                    self._refrescar(db, pendientes[i:i + 500])
+        finally:
+            db.close()
+        self.actualizado = datetime.now()
+
+    # ---------- lectura ----------
+    def _top(self, grupos, cantidad):
+        resultado = []
+        for gid, rcas in grupos.most_common(cantidad):
+            variantes = self._variantes[gid]
+            resultado.append({
+                'causa': variantes.most_common(1)[0][0] if variantes else self._grupos[gid][1],
+                'rcas': rcas,
+                'variantes': len(variantes),
+            })
+        return resultado
+
+    def matriz(self, dimension='area', top=5, refrescar=False):
+        """Matriz categoría × dimensión con nº de RCAs y causas más recurrentes por celda"""
+        if dimension not in DIMENSIONES:
+            raise ValueError(f"Dimensión no soportada: {dimension} (use {', '.join(DIMENSIONES)})")
+        with self._lock:
+            if refrescar:
+                self._cargado_en = None
+            self._al_dia()
+            celdas = [
+                {
+                    'valor': valor,
+                    'categoria': categoria,
+                    'rcas': rcas,
+                    'top_causas': self._top(self._causas[dimension][(valor, categoria)], top),
+                }
+                for (valor, categoria), rcas in self._rcas[dimension].items() if rcas > 0
+            ]
+            por_categoria = Counter()
+            por_valor = Counter()
+            for celda in celdas:
+                por_categoria[celda['categoria']] += celda['rcas']
+                por_valor[celda['valor']] += celda['rcas']
+            return {
+                'dimension': dimension,
+                'categorias': [c for c, _ in por_categoria.most_common()],
+                'valores': sorted(por_valor) if dimension == 'mes' else [v for v, _ in por_valor.most_common()],
+                'celdas': sorted(celdas, key=lambda c: (c['valor'], c['categoria'])),
+                'total_rcas': len(self._aportes),
+                'actualizado': self.actualizado,
+            }
+
+mapa = MapaIshikawa(config.ISHIKAWA_MAPA_TTL_MIN * 60)
+mapa_historico = MapaIshikawa(config.ISHIKAWA_MAPA_TTL_MIN * 60, historico=True)
+
+def marcar(rca_id):
+    mapa.marcar(rca_id)
+    mapa_historico.marcar(rca_id)
+
+def invalidar():
+    mapa.invalidar()
+    mapa_historico.invalidar()
@@ -0,0 +1,211 @@
+"""
+Métricas en formato de texto Prometheus (/metrics)
+
+Registra por ruta: cantidad de requests por código de estado, histograma de
+latencia, cantidad de sentencias SQL y tiempo acumulado en base de datos.
+
+Para que medir cueste poco, cada hilo escribe en sus propios contadores (sin
+locks en el camino del request) y los valores se suman solo al leer /metrics.
+Los histogramas tienen buckets fijos y se actualizan con un bisect.
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# Datos del request en curso; los hooks de SQLAlchemy acumulan aquí.
+# Los endpoints síncronos corren en el threadpool con una copia del contexto,
+# por lo que comparten el mismo objeto.
+request_actual: ContextVar = ContextVar('request_actual', default=None)
+
+class EstadoRequest:
+    """Acumuladores de un request"""
+    __slots__ = ('sentencias', 'tiempo_db', 'extra')
+
+    def __init__(self):
+        self.sentencias = 0
+        self.tiempo_db = 0.0
+        self.extra = {}
+
+# ==================== PRIMITIVAS ====================
+class _PorHilo:
+    """Un dict por hilo; la lista de dicts solo se bloquea al crear uno nuevo"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def shard(self):
+        datos = getattr(self._local, 'datos', None)
+        if datos is None:
+            datos = self._local.datos = {}
+            with self._lock:
+                self._shards.append(datos)
+        return datos
+
+    def copias(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [s.copy() for s in shards]
+
+class Counter:
+    """Contador monotónico con etiquetas"""
+    tipo = 'counter'
+
+    def __init__(self, nombre, descripcion, etiquetas):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = etiquetas
+        self._datos = _PorHilo()
+
+    def inc(self, valores, cantidad=1):
+        shard = self._datos.shard()
+        shard[valores] = shard.get(valores, 0) + cantidad
+
+    def valores(self):
+        total = {}
+        for shard in self._datos.copias():
+            for clave, valor in shard.items():
+                total[clave] = total.get(clave, 0) + valor
+        return total
+
+    def exponer(self):
+        for clave, valor in sorted(self.valores().items()):
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+class Histogram:
+    """Histograma con buckets fijos (límites superiores inclusivos)"""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, descripcion, etiquetas, buckets):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = etiquetas
+        self.buckets = tuple(sorted(buckets))
+        self._datos = _PorHilo()
+
+    def observe(self, valores, valor):
+        shard = self._datos.shard()
+        serie = shard.get(valores)
+        if serie is None:
+            # [conteo por bucket..., +Inf, suma]
+            serie = shard[valores] = [0] * (len(self.buckets) + 1) + [0.0]
+        serie[bisect_left(self.buckets, valor)] += 1
+        serie[-1] += valor
+
+    def valores(self):
+        total = {}
+        for shard in self._datos.copias():
+            for clave, serie in shard.items():
+                acumulado = total.setdefault(clave, [0] * len(serie))
+                for i, v in enumerate(serie):
+                    acumulado[i] += v
+        return total
+
+    def exponer(self):
+        limites = [_numero(b) for b in self.buckets] + ['+Inf']
+        for clave, serie in sorted(self.valores().items()):
+            acumulado = 0
+            for limite, conteo in zip(limites, serie[:-1]):
+                acumulado += conteo
+                etiquetas = _etiquetas(self.etiquetas + ('le',), clave + (limite,))
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            etiquetas = _etiquetas(self.etiquetas, clave)
+            yield f"{self.nombre}_sum{etiquetas} {_numero(serie[-1])}"
+            yield f"{self.nombre}_count{etiquetas} {acumulado}"
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)) + '}'
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+# ==================== MÉTRICAS DEL SISTEMA ====================
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SENTENCIAS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+REQUESTS = Counter('rca_http_requests_total', 'Requests HTTP por ruta y código de estado', ('method', 'route', 'status'))
+LATENCIA = Histogram('rca_http_request_duration_seconds', 'Latencia de requests HTTP', ('method', 'route'), BUCKETS_LATENCIA)
+SENTENCIAS = Counter('rca_db_statements_total', 'Sentencias SQL ejecutadas por ruta', ('route',))
+SENTENCIAS_REQUEST = Histogram('rca_db_statements_per_request', 'Sentencias SQL por request', ('route',), BUCKETS_SENTENCIAS)
+TIEMPO_DB = Counter('rca_db_duration_seconds_total', 'Tiempo acumulado en base de datos por ruta', ('route',))
+
+METRICAS = [REQUESTS, LATENCIA, SENTENCIAS, SENTENCIAS_REQUEST, TIEMPO_DB]
+
+def exposicion():
+    """Texto en formato de exposición Prometheus 0.0.4"""
+    lineas = []
+    for metrica in METRICAS:
+        lineas.append(f"# HELP {metrica.nombre} {metrica.descripcion}")
+        lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+        lineas.extend(metrica.exponer())
+    return '\n'.join(lineas) + '\n'
+
+# ==================== INSTRUMENTACIÓN ====================
+def instrumentar_engine(engine):
+    """Contar sentencias y tiempo de base de datos del request en curso"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('inicio_sentencia', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info['inicio_sentencia'].pop()
+        estado = request_actual.get()
+        if estado is not None:
+            estado.sentencias += 1
+            estado.tiempo_db += time.perf_counter() - inicio
+
+def etiqueta_ruta(scope, status):
+    """Plantilla de la ruta (/rca/{rca_id}) para no crear una serie por ID"""
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    if status == 404:
+        return 'no_encontrado'
+    partes = scope.get('path', '/').split('/')
+    return f"/{partes[1]}/*" if len(partes) > 2 else scope.get('path', '/')
+
+class MetricsMiddleware:
+    """Middleware ASGI que registra requests, latencia y costo de base de datos"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        estado = EstadoRequest()
+        token = request_actual.set(estado)
+        status = 500
+        inicio = time.perf_counter()
+
+        async def send_con_status(mensaje):
+            nonlocal status
+            if mensaje['type'] == 'http.response.start':
+                status = mensaje['status']
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            duracion = time.perf_counter() - inicio
+            request_actual.reset(token)
+            ruta = etiqueta_ruta(scope, status)
+            metodo = scope.get('method', '')
+            REQUESTS.inc((metodo, ruta, str(status)))
+            LATENCIA.observe((metodo, ruta), duracion)
+            SENTENCIAS.inc((ruta,), estado.sentencias)
+            SENTENCIAS_REQUEST.observe((ruta,), estado.sentencias)
+            TIEMPO_DB.inc((ruta,), estado.tiempo_db)
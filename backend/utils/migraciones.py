@@ -0,0 +1,215 @@
+"""
+Migraciones de esquema versionadas
+
+`Base.metadata.create_all` crea las tablas que faltan pero no modifica las
+que ya existen: columnas e índices nuevos no llegan a una base en uso. Cada
+migración de MIGRACIONES hace uno de esos cambios y queda registrada en la
+tabla `migraciones`; al iniciar la API (o con scripts/migrar.py) se aplican
+las pendientes en orden.
+
+Las migraciones son idempotentes (revisan antes de crear): en una base
+nueva create_all ya dejó todo hecho y solo se registran. Para agregar una,
+sumarla al final con la versión siguiente; nunca cambiar una ya publicada.
+
+Varios workers de la API arrancan a la vez: en MySQL se aplican de a un
+proceso (GET_LOCK) y los demás esperan y encuentran todo registrado. En
+SQLite (y si el bloqueo no alcanza) un CREATE INDEX o ADD COLUMN que otro
+proceso ya hizo entre la revisión y la sentencia se da por aplicado.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, insert, select, text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from database import agregar_columna
+import models
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_BLOQUEO = 'rca_migraciones'
+ESPERA_BLOQUEO_SEGUNDOS = 600  # un índice sobre una tabla grande puede tardar minutos
+
+# MySQL: Table already exists / Duplicate column name / Duplicate key name
+_ERRORES_YA_EXISTE = (1050, 1060, 1061)
+
+def _ya_existe(error):
+    """¿El CREATE/ALTER falló porque otro proceso ya creó la tabla, columna o índice?"""
+    args = getattr(error.orig, 'args', ())
+    if args and args[0] in _ERRORES_YA_EXISTE:
+        return True
+    mensaje = str(error.orig).lower()
+    return 'already exists' in mensaje or 'duplicate column' in mensaje
+
+def _indices(*definiciones):
+    """Migración que crea índices (nombre, tabla, columnas) si no existen"""
+    def migrar(engine):
+        tablas = models.Base.metadata.tables
+        for nombre, tabla, columnas in definiciones:
+            # Tabla suelta (no la de models): el índice no depende de cómo quede declarado allí
+            suelta = Table(tabla, MetaData(), *[Column(c, tablas[tabla].c[c].type) for c in columnas])
+            try:
+                Index(nombre, *[suelta.c[c] for c in columnas]).create(bind=engine, checkfirst=True)
+            except DBAPIError as e:
+                if not _ya_existe(e):
+                    raise
+    return migrar
+
+def _equipo_id(engine):
+    try:
+        agregar_columna(engine, models.RCA.__table__.c.equipo_id)
+    except DBAPIError as e:
+        if not _ya_existe(e):
+            raise
+
+def _autoincrement_sqlite(engine, tablas):
+    """
+    Reconstruir tablas SQLite sin AUTOINCREMENT (no hay ALTER para agregarlo):
+    tabla nueva con el DDL del modelo, copia de filas, DROP, RENAME e índices
+    de nuevo. Con foreign_keys apagado el DROP no borra en cascada a las hijas
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                for tabla in tablas:
+                    ddl = conn.exec_driver_sql(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla.name,)
+                    ).scalar()
+                    if ddl is None or 'AUTOINCREMENT' in ddl.upper():
+                        continue
+                    indices = conn.exec_driver_sql(
+                        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                        (tabla.name,)
+                    ).scalars().all()
+                    existentes = {fila[1] for fila in conn.exec_driver_sql(f'PRAGMA table_info("{tabla.name}")')}
+                    columnas = ', '.join(f'"{c.name}"' for c in tabla.c if c.name in existentes)
+                    nueva = f"_nueva_{tabla.name}"
+                    crear = str(CreateTable(tabla).compile(dialect=engine.dialect))
+                    conn.exec_driver_sql(crear.replace(f"CREATE TABLE {tabla.name} ", f"CREATE TABLE {nueva} ", 1))
+                    conn.exec_driver_sql(f'INSERT INTO {nueva} ({columnas}) SELECT {columnas} FROM "{tabla.name}"')
+                    conn.exec_driver_sql(f'DROP TABLE "{tabla.name}"')
+                    conn.exec_driver_sql(f'ALTER TABLE {nueva} RENAME TO "{tabla.name}"')
+                    for indice in indices:
+                        conn.exec_driver_sql(indice)
+                if conn.exec_driver_sql("PRAGMA foreign_key_check").first() is not None:
+                    raise RuntimeError("La reconstrucción dejó claves foráneas inválidas")
+                conn.exec_driver_sql("COMMIT")
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+def _ids_sin_reuso(engine):
+    from utils.archivado import TABLAS, asegurar_contadores
+
+    if engine.dialect.name == 'sqlite':
+        _autoincrement_sqlite(engine, [activo.__table__ for activo, _ in TABLAS])
+    with engine.begin() as conn:
+        asegurar_contadores(conn)
+
+def _columnas(*columnas):
+    """Migración que agrega columnas del modelo si no existen"""
+    def migrar(engine):
+        for columna in columnas:
+            try:
+                agregar_columna(engine, columna)
+            except DBAPIError as e:
+                if not _ya_existe(e):
+                    raise
+    return migrar
+
+MIGRACIONES = [
+    (1, "Columna rcas.equipo_id (catálogo de equipos)", _equipo_id),
+    (2, "Índices de acciones por estado/responsable y compromiso", _indices(
+        ('ix_acciones_estado_compromiso', 'acciones', ('estado', 'fecha_compromiso')),
+        ('ix_acciones_responsable_compromiso', 'acciones', ('responsable', 'fecha_compromiso')),
+    )),
+    (3, "Índices de rca_id en las tablas hijas", _indices(
+        ('ix_cinco_porques_rca_id', 'cinco_porques', ('rca_id',)),
+        ('ix_ishikawa_rca_id', 'ishikawa', ('rca_id',)),
+        ('ix_acciones_rca_id', 'acciones', ('rca_id',)),
+        ('ix_comentarios_rca_id', 'comentarios', ('rca_id',)),
+    )),
+    (4, "Índices de las consultas sobre rcas", _indices(
+        ('ix_rcas_estado', 'rcas', ('estado',)),
+        ('ix_rcas_criticidad', 'rcas', ('criticidad',)),
+        ('ix_rcas_area_estado', 'rcas', ('area', 'estado')),
+        ('ix_rcas_equipo', 'rcas', ('equipo',)),
+        ('ix_rcas_fecha_evento', 'rcas', ('fecha_evento',)),
+        ('ix_rcas_archivo_estado', 'rcas_archivo', ('estado',)),
+    )),
+    (5, "Índices de archivos por ruta (limpieza de huérfanos)", _indices(
+        ('ix_archivos_ruta_archivo', 'archivos', ('ruta_archivo',)),
+        ('ix_archivos_archivo_ruta_archivo', 'archivos_archivo', ('ruta_archivo',)),
+    )),
+    (6, "Ids sin reuso en las tablas con archivo histórico", _ids_sin_reuso),
+    (7, "Dueño y latido de los trabajos en ejecución", _columnas(
+        models.Trabajo.__table__.c.ejecutado_por,
+        models.Trabajo.__table__.c.latido,
+    )),
+]
+
+def aplicadas(engine):
+    """{version: fecha_aplicada} de las migraciones registradas"""
+    try:
+        models.Migracion.__table__.create(bind=engine, checkfirst=True)
+    except DBAPIError as e:
+        if not _ya_existe(e):
+            raise
+    with engine.connect() as conn:
+        M = models.Migracion
+        return dict(conn.execute(select(M.version, M.fecha_aplicada)).all())
+
+def pendientes(engine):
+    hechas = aplicadas(engine)
+    return [m for m in MIGRACIONES if m[0] not in hechas]
+
+@contextmanager
+def _bloqueo(engine):
+    """Con MySQL, esperar a que ningún otro proceso esté aplicando migraciones"""
+    if engine.dialect.name != 'mysql':
+        yield
+        return
+    with engine.connect() as conn:
+        obtenido = conn.execute(
+            text("SELECT GET_LOCK(:nombre, :espera)"),
+            {"nombre": NOMBRE_BLOQUEO, "espera": ESPERA_BLOQUEO_SEGUNDOS}
+        ).scalar()
+        if obtenido != 1:
+            raise RuntimeError(
+                f"Otro proceso lleva más de {ESPERA_BLOQUEO_SEGUNDOS} s aplicando migraciones"
+            )
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:nombre)"), {"nombre": NOMBRE_BLOQUEO})
+
+def aplicar_migraciones(engine):
+    """Aplicar las migraciones pendientes en orden. Devuelve las versiones aplicadas"""
+    with _bloqueo(engine):
+        return _aplicar(engine)
+
+def _aplicar(engine):
+    nuevas = []
+    for version, nombre, migrar in pendientes(engine):
+        inicio = datetime.now()
+        migrar(engine)
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(models.Migracion.__table__).values(
+                    version=version, nombre=nombre, fecha_aplicada=datetime.now()
+                ))
+        except IntegrityError:
+            # Otro proceso (otro worker de la API) la registró al mismo tiempo
+            continue
+        logger.info("Migración aplicada", extra={
+            "version": version, "nombre": nombre,
+            "segundos": round((datetime.now() - inicio).total_seconds(), 2),
+        })
+        nuevas.append(version)
+    return nuevas
@@ -0,0 +1,74 @@
+"""
+Utilidad para generar miniaturas de fotos de evidencia
+"""
+import os
+import glob
+import hashlib
+import tempfile
+
+from config import config
+
+CARPETA_MINIATURAS = 'miniaturas'
+ANCHO_MINIATURA = 320
+
+def _carpeta():
+    return os.path.join(config.ARCHIVOS_PATH, CARPETA_MINIATURAS)
+
+def huella_origen(ruta_origen: str) -> str:
+    """
+    Huella de la foto original (ruta, tamaño y mtime). El id de archivos puede
+    reutilizarse en SQLite tras borrar la última fila: con la huella en el nombre
+    un archivo nuevo nunca toma la miniatura de otro
+    """
+    stat_result = os.stat(ruta_origen)
+    datos = f"{os.path.abspath(ruta_origen)}|{stat_result.st_size}|{stat_result.st_mtime_ns}"
+    return hashlib.sha1(datos.encode('utf-8')).hexdigest()[:12]
+
+def ruta_miniatura(archivo_id: int, ruta_origen: str, ancho: int = ANCHO_MINIATURA) -> str:
+    """Ruta en disco de la miniatura de un archivo"""
+    return os.path.join(_carpeta(), f"{archivo_id}_{ancho}_{huella_origen(ruta_origen)}.jpg")
+
+def borrar_miniaturas(archivo_id: int, excepto: str = None) -> int:
+    """Borrar las miniaturas de un archivo (todas las huellas y anchos). Devuelve cuántas"""
+    borradas = 0
+    for ruta in glob.glob(os.path.join(glob.escape(_carpeta()), f"{archivo_id}_*.jpg")):
+        if ruta == excepto:
+            continue
+        try:
+            os.remove(ruta)
+            borradas += 1
+        except FileNotFoundError:
+            pass
+    return borradas
+
+def obtener_miniatura(archivo_id: int, ruta_origen: str, ancho: int = ANCHO_MINIATURA) -> str:
+    """
+    Devuelve la ruta de la miniatura, generándola la primera vez.
+    Mientras el original no cambie la miniatura se reutiliza siempre
+    """
+    destino = ruta_miniatura(archivo_id, ruta_origen, ancho)
+    if os.path.exists(destino):
+        return destino
+
+    from PIL import Image
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Temporal propio de esta llamada: varios hilos pueden generar la misma miniatura a la vez
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as salida, Image.open(ruta_origen) as img:
+            img.thumbnail((ancho, ancho))
+            img.convert('RGB').save(salida, 'JPEG', quality=80, optimize=True)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    # Miniaturas de una versión anterior del original (u otro archivo con el mismo id)
+    for anterior in glob.glob(os.path.join(glob.escape(os.path.dirname(destino)), f"{archivo_id}_{ancho}_*.jpg")):
+        if anterior != destino:
+            try:
+                os.remove(anterior)
+            except FileNotFoundError:
+                pass
+    return destino
@@ -9,6 +9,28 @@ from reportlab.lib.units import inch
 from datetime import datetime
 import os
 
+from config import config
+
+def datos_reporte_rca(rca) -> dict:
+    """Campos del RCA que van en el reporte PDF"""
+    return {
+        "codigo": rca.codigo or "N/A",
+        "titulo": rca.titulo or "N/A",
+        "fecha_evento": str(rca.fecha_evento) if rca.fecha_evento else "N/A",
+        "area": rca.area or "N/A",
+        "equipo": rca.equipo or "N/A",
+        "criticidad": rca.criticidad or "N/A",
+        "estado": rca.estado or "N/A",
+        "responsable": rca.responsable or "N/A",
+        "descripcion_falla": rca.descripcion_falla or "N/A",
+        "causa_raiz": rca.causa_raiz or "N/A",
+        "acciones_correctivas": rca.acciones_correctivas or "N/A"
+    }
+
+def ruta_pdf_rca(codigo: str) -> str:
+    """Ruta en disco del PDF de un RCA"""
+    return os.path.join(config.ARCHIVOS_PATH, 'pdfs', f'RCA_{codigo}.pdf')
+
 def generar_reporte_rca(rca_data: dict, output_path: str):
     """
     Genera un PDF con el reporte completo de un RCA
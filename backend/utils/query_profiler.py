@@ -0,0 +1,280 @@
+"""
+Detector de N+1 y consultas lentas (modo desarrollo/pruebas)
+
+Se activa con QUERY_PROFILER=true. Por cada request agrupa las sentencias SQL
+normalizadas (literales e IN (...) reemplazados por ?), avisa cuando una misma
+sentencia se repite N_MAS_1_UMBRAL veces o más (patrón N+1), registra las
+sentencias que superan SLOW_QUERY_MS junto con su plan EXPLAIN y compara la
+cantidad total contra el presupuesto de la ruta (PRESUPUESTOS).
+
+Cada respuesta incluye X-Query-Count y X-Query-Route, que usan los helpers de
+pruebas de este módulo (el fixture query_budget de tests/conftest.py es
+assert_presupuesto):
+
+    def test_bundle(client):
+        with assert_max_queries(engine, 6):
+            client.get("/rca/1/bundle")
+
+    def test_presupuestos(client):
+        assert_presupuesto(client.get("/rca"))
+"""
+import re
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Máximo de sentencias SQL por request para cada endpoint (método, plantilla de ruta).
+# Todas las rutas de la API deben tener el suyo (tests/test_query_profiler.py lo revisa);
+# None = sin límite, solo para streams que consultan mientras siguen abiertos
+PRESUPUESTOS = {
+    ("GET", "/"): 0,
+    ("GET", "/health"): 1,
+    ("GET", "/metrics"): 0,
+    ("GET", "/rca"): 3,
+    ("GET", "/rca/{rca_id}"): 3,
+    ("GET", "/rca/{rca_id}/bundle"): 6,
+    ("GET", "/rca/{rca_id}/cinco-porques"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("GET", "/rca/{rca_id}/ishikawa"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("POST", "/rca"): 20,
+    ("PUT", "/rca/{rca_id}"): 25,
+    ("DELETE", "/rca/{rca_id}"): 12,
+    ("POST", "/rca/{rca_id}/cinco-porques"): 3,
+    ("POST", "/rca/{rca_id}/ishikawa"): 3,
+    ("POST", "/rca/{rca_id}/comentarios"): 5,
+    ("GET", "/cinco-porques/{rca_id}"): 1,
+    ("POST", "/cinco-porques"): 3,
+    ("GET", "/ishikawa/{rca_id}"): 1,
+    ("POST", "/ishikawa"): 3,
+    ("GET", "/archivo"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("GET", "/archivo/{rca_id}"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("GET", "/archivo/por-rca"): 1,
+    ("GET", "/archivo/{rca_id}/{archivo_id}/contenido"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("HEAD", "/archivo/{rca_id}/{archivo_id}/contenido"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("GET", "/archivo/{rca_id}/{archivo_id}/miniatura"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("HEAD", "/archivo/{rca_id}/{archivo_id}/miniatura"): 2,  # +1 si hay que buscar en el archivo histórico
+    ("POST", "/archivo/upload"): 3,
+    ("DELETE", "/archivo/{archivo_id}"): 4,
+    ("GET", "/archivos/{ruta:path}"): 4,
+    ("HEAD", "/archivos/{ruta:path}"): 4,
+    ("GET", "/estadisticas/resumen"): 5,
+    ("GET", "/acciones"): 1,
+    ("GET", "/acciones/tablero"): 1,
+    ("POST", "/acciones/marcar-vencidas"): 1,
+    ("POST", "/acciones"): 4,
+    ("GET", "/acciones/{accion_id}"): 1,
+    ("PUT", "/acciones/{accion_id}"): 4,
+    ("DELETE", "/acciones/{accion_id}"): 3,
+    # Reportes
+    ("GET", "/reportes/estadisticas"): 7,  # 5 sin historico
+    ("GET", "/reportes/por-area"): 1,
+    ("GET", "/reportes/por-criticidad"): 1,
+    ("GET", "/reportes/rca/{rca_id}/pdf"): 6,
+    ("GET", "/reportes/ishikawa/mapa"): 1,  # solo al recargar; luego sale de memoria
+    # 1 + 2 por bloque de 2000 RCAs (4 con historico): alcanza para ~100 000 RCAs
+    ("GET", "/reportes/exportar"): 200,
+    # Usuarios
+    ("POST", "/auth/login"): 3,
+    ("POST", "/auth/logout"): 0,
+    ("POST", "/auth/registro"): 5,
+    ("GET", "/auth/me"): 1,
+    ("GET", "/auth/usuarios"): 2,
+    # Catálogo de equipos (resolver y autocompletar consultan solo al cargar el índice)
+    ("GET", "/equipos"): 1,
+    ("GET", "/equipos/resolver"): 1,
+    ("POST", "/equipos/vincular-rcas"): 3,
+    ("POST", "/equipos"): 3,
+    ("GET", "/equipos/{equipo_id}"): 1,
+    ("PUT", "/equipos/{equipo_id}"): 3,
+    ("DELETE", "/equipos/{equipo_id}"): 2,
+    ("GET", "/autocompletar/{campo}"): 5,  # una por campo al cargar
+    # Trabajos e importaciones
+    ("GET", "/trabajos"): 1,
+    ("POST", "/trabajos"): 2,
+    ("GET", "/trabajos/{trabajo_id}"): 1,
+    ("POST", "/trabajos/{trabajo_id}/cancelar"): 3,
+    ("GET", "/trabajos/{trabajo_id}/stream"): None,  # una consulta por intervalo mientras siga abierto
+    ("POST", "/importaciones"): 2,
+    ("GET", "/importaciones/{trabajo_id}/errores"): 1,
+    ("GET", "/eventos/rca"): 0,
+}
+
+_perfil_actual: ContextVar = ContextVar('perfil_actual', default=None)
+
+class PerfilSQL:
+    """Sentencias ejecutadas en un request (o bloque) agrupadas por SQL normalizado"""
+
+    def __init__(self):
+        self.total = 0
+        self.tiempo = 0.0
+        self.grupos = {}  # sql_normalizado -> [cantidad, tiempo_total]
+        self.lentas = []  # (ms, sql, plan)
+
+    def registrar(self, statement, duracion):
+        self.total += 1
+        self.tiempo += duracion
+        grupo = self.grupos.setdefault(normalizar_sql(statement), [0, 0.0])
+        grupo[0] += 1
+        grupo[1] += duracion
+
+    def repetidas(self, umbral=None):
+        """Sentencias idénticas repetidas (candidatas a N+1), de más a menos"""
+        umbral = umbral or config.N_MAS_1_UMBRAL
+        return sorted(
+            ((sql, n) for sql, (n, _) in self.grupos.items() if n >= umbral),
+            key=lambda x: -x[1]
+        )
+
+    def resumen(self):
+        lineas = [f"{self.total} sentencias, {self.tiempo * 1000:.1f} ms"]
+        for sql, (n, t) in sorted(self.grupos.items(), key=lambda x: -x[1][0]):
+            lineas.append(f"  {n:>4}x {t * 1000:8.1f} ms  {sql[:200]}")
+        return "\n".join(lineas)
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_IN = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_RE_PARAM = re.compile(r"%\([^)]+\)s|%s|:\w+")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+def normalizar_sql(statement):
+    """Reemplazar literales y parámetros por ? para agrupar sentencias equivalentes"""
+    sql = _RE_STRING.sub("?", statement)
+    sql = _RE_PARAM.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_IN.sub("IN (?...)", sql)
+    return _RE_ESPACIOS.sub(" ", sql).strip()
+
+def explain(dbapi_connection, dialecto, statement, parameters=None):
+    """Plan de ejecución de una sentencia SELECT como lista de filas"""
+    prefijo = "EXPLAIN QUERY PLAN " if dialecto == "sqlite" else "EXPLAIN "
+    cursor = dbapi_connection.cursor()
+    try:
+        if parameters:
+            cursor.execute(prefijo + statement, parameters)
+        else:
+            cursor.execute(prefijo + statement)
+        return [tuple(fila) for fila in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+# ==================== INSTRUMENTACIÓN ====================
+def instrumentar_engine(engine):
+    """Registrar hooks de SQLAlchemy para el perfil del request en curso"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("perfil_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        duracion = time.perf_counter() - conn.info["perfil_inicio"].pop()
+        perfil = _perfil_actual.get()
+        if perfil is None:
+            return
+        perfil.registrar(statement, duracion)
+
+        ms = duracion * 1000
+        if ms >= config.SLOW_QUERY_MS:
+            plan = None
+            # Con un cursor del servidor (stream_results: exportación, db_dump) el resultado
+            # sigue pendiente en esta conexión: otra sentencia haría que pymysql lo descarte
+            en_stream = context is not None and context.execution_options.get("stream_results")
+            if not executemany and not en_stream and statement.lstrip().upper().startswith("SELECT"):
+                try:
+                    plan = explain(cursor.connection, conn.dialect.name, statement, parameters)
+                except Exception as e:
+                    plan = [f"EXPLAIN falló: {e}"]
+            perfil.lentas.append((ms, statement, plan))
+            logger.warning("Consulta lenta (%.1f ms): %s\nPlan: %s", ms, statement, plan)
+
+@contextmanager
+def perfilar():
+    """Registrar las sentencias SQL ejecutadas dentro del bloque"""
+    perfil = PerfilSQL()
+    token = _perfil_actual.set(perfil)
+    try:
+        yield perfil
+    finally:
+        _perfil_actual.reset(token)
+
+class QueryProfilerMiddleware:
+    """Perfil SQL por request: avisa N+1 y presupuestos excedidos, agrega X-Query-Count"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with perfilar() as perfil:
+            async def send_con_headers(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    route = scope.get("route")
+                    mensaje.setdefault("headers", [])
+                    mensaje["headers"] = list(mensaje["headers"]) + [
+                        (b"x-query-count", str(perfil.total).encode()),
+                        (b"x-query-route", (route.path if route else "").encode()),
+                    ]
+                await send(mensaje)
+
+            await self.app(scope, receive, send_con_headers)
+
+        route = scope.get("route")
+        if route is None:
+            return
+        clave = (scope.get("method", ""), route.path)
+        for sql, n in perfil.repetidas():
+            logger.warning("Posible N+1 en %s %s: %d ejecuciones de %s", *clave, n, sql[:300])
+        presupuesto = PRESUPUESTOS.get(clave)
+        if presupuesto is not None and perfil.total > presupuesto:
+            logger.warning(
+                "%s %s excedió su presupuesto: %d sentencias (máximo %d)\n%s",
+                *clave, perfil.total, presupuesto, perfil.resumen()
+            )
+
+# ==================== HELPERS DE PRUEBAS ====================
+@contextmanager
+def assert_max_queries(engine, maximo):
+    """
+    Fallar si el bloque ejecuta más de `maximo` sentencias SQL en el engine.
+    Con TestClient los endpoints corren en otro hilo, por lo que aquí se escucha
+    el engine directamente en lugar de usar el perfil del request
+    """
+    perfil = PerfilSQL()
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        perfil.registrar(statement, 0.0)
+
+    event.listen(engine, "after_cursor_execute", _registrar)
+    try:
+        yield perfil
+    finally:
+        event.remove(engine, "after_cursor_execute", _registrar)
+    if perfil.total > maximo:
+        raise AssertionError(
+            f"Se ejecutaron {perfil.total} sentencias SQL (máximo {maximo})\n{perfil.resumen()}"
+        )
+
+def assert_presupuesto(response, presupuestos=None):
+    """Verificar X-Query-Count de una respuesta contra el presupuesto de su ruta"""
+    presupuestos = presupuestos or PRESUPUESTOS
+    total = response.headers.get("x-query-count")
+    if total is None:
+        raise AssertionError("La respuesta no tiene X-Query-Count (¿QUERY_PROFILER=true?)")
+    clave = (response.request.method, response.headers.get("x-query-route", ""))
+    if clave not in presupuestos:
+        raise AssertionError(f"Sin presupuesto de consultas definido para {clave[0]} {clave[1]}")
+    if presupuestos[clave] is not None and int(total) > presupuestos[clave]:
+        raise AssertionError(
+            f"{clave[0]} {clave[1]} ejecutó {total} sentencias SQL (máximo {presupuestos[clave]})"
+        )
+    return int(total)
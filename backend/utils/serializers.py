@@ -0,0 +1,77 @@
+"""
+Serialización rápida de RCAs: de filas ORM directo a bytes JSON
+
+Evita el camino from_orm -> modificar modelo -> validar otra vez con
+response_model -> jsonable_encoder. Las columnas a leer se calculan una sola
+vez a partir de los schemas, y el JSON se genera con orjson si está instalado
+(con json de la librería estándar como respaldo).
+"""
+import json
+from datetime import datetime, date
+from decimal import Decimal
+
+from fastapi.responses import Response
+
+import models
+import schemas
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+def _default(valor):
+    """Tipos que el encoder no conoce: DECIMAL como float (igual que RCAResponse)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def dumps(datos) -> bytes:
+    """Serializar a bytes JSON"""
+    if orjson is not None:
+        return orjson.dumps(datos, default=_default)
+    return json.dumps(datos, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_response(datos, status_code: int = 200) -> Response:
+    """Respuesta JSON ya serializada (FastAPI no vuelve a validar ni codificar)"""
+    return Response(content=dumps(datos), status_code=status_code, media_type="application/json")
+
+def _columnas(schema, modelo):
+    """Campos del schema que son columnas del modelo, en el orden del schema"""
+    return tuple(c for c in schema.model_fields if c in modelo.__table__.c)
+
+COLUMNAS_RCA = _columnas(schemas.RCAResponse, models.RCA)
+COLUMNAS_RESUMEN = _columnas(schemas.RCAResumen, models.RCA)
+COLUMNAS_CINCO_PORQUES = _columnas(schemas.CincoPorquesResponse, models.CincoPorques)
+COLUMNAS_ISHIKAWA = _columnas(schemas.IshikawaResponse, models.Ishikawa)
+COLUMNAS_ACCION = _columnas(schemas.AccionResponse, models.Accion)
+COLUMNAS_COMENTARIO = _columnas(schemas.ComentarioResponse, models.Comentario)
+
+# ==================== CONVERSIONES ====================
+def cinco_porques_a_lista(db_rca):
+    """Convertir cinco_porques a lista ordenada por nivel"""
+    if hasattr(db_rca, 'cinco_porques_rel') and db_rca.cinco_porques_rel:
+        return [cp.respuesta for cp in sorted(db_rca.cinco_porques_rel, key=lambda x: x.nivel)]
+    return None
+
+def ishikawa_a_dict(db_rca):
+    """Convertir ishikawa a diccionario {categoria: [causas]}"""
+    if hasattr(db_rca, 'ishikawa_rel') and db_rca.ishikawa_rel:
+        ishikawa_dict = {}
+        for ish in db_rca.ishikawa_rel:
+            ishikawa_dict.setdefault(ish.categoria, []).append(ish.causa)
+        return ishikawa_dict
+    return None
+
+def fila_a_dict(obj, columnas):
+    """Copiar columnas de un objeto ORM a dict"""
+    return {c: getattr(obj, c) for c in columnas}
+
+def rca_a_dict(db_rca):
+    """RCA completo con cinco_porques e ishikawa, mismas claves que RCAResponse"""
+    datos = fila_a_dict(db_rca, COLUMNAS_RCA)
+    datos['cinco_porques'] = cinco_porques_a_lista(db_rca)
+    datos['ishikawa'] = ishikawa_a_dict(db_rca)
+    return datos
@@ -0,0 +1,513 @@
+"""
+Trabajos en segundo plano con un pool de procesos
+
+Los trabajos se guardan en la tabla `trabajos` (sobreviven a un reinicio).
+Un hilo despachador dentro de la API toma los pendientes por prioridad
+(mayor primero, luego por orden de llegada) y los ejecuta en un
+ProcessPoolExecutor, así los PDFs por lote, las miniaturas y los respaldos no
+ocupan los hilos que atienden a las tablets.
+
+- Reintentos: si la tarea falla vuelve a Pendiente con espera exponencial
+  (TRABAJOS_REINTENTO_SEG * 2^(intento-1)) hasta max_intentos.
+- Cancelación: un trabajo pendiente se cancela de inmediato; uno en ejecución
+  se marca y su resultado se descarta al terminar (un proceso no se
+  interrumpe a la mitad).
+- Varios workers de la API: cada uno tiene su despachador. Un trabajo en
+  ejecución guarda qué despachador lo tomó (ejecutado_por) y este renueva su
+  latido cada TRABAJOS_LATIDO_SEG; solo vuelven a la cola los que llevan más
+  de TRABAJOS_LATIDO_VENCIDO_SEG sin latido (su proceso se cayó o reinició).
+- Periódicos: el despachador encola los tipos de PERIODICOS cada cierto
+  intervalo, salvo que ya haya uno pendiente o en ejecución. La revisión y
+  el INSERT son una sola sentencia: dos workers no encolan el mismo.
+- Las tareas son funciones de este módulo registradas en TAREAS; reciben los
+  parámetros del trabajo y devuelven un resultado serializable a JSON.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, func, insert, literal, select, update
+
+from config import config
+from database import SessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_FINALES = ('Completado', 'Fallido', 'Cancelado')
+
+# ==================== TAREAS ====================
+# Se ejecutan en otro proceso: cada una abre su propia sesión de base de datos.
+def tarea_backup_completo():
+    from utils.backup import backup_completo
+    db_backup, archivos_backup = backup_completo()
+    if not (db_backup and archivos_backup):
+        raise RuntimeError("Respaldo completado con errores")
+    return {"base_datos": db_backup, "archivos": archivos_backup}
+
+def tarea_reportes_pdf(rca_ids):
+    """Generar el PDF de varios RCAs"""
+    import os
+    import crud
+    from utils.pdf_generator import generar_reporte_rca, datos_reporte_rca, ruta_pdf_rca
+
+    generados, no_encontrados = [], []
+    db = SessionLocal()
+    try:
+        for rca_id in rca_ids:
+            rca = crud.get_rca(db, rca_id)
+            if rca is None:
+                no_encontrados.append(rca_id)
+                continue
+            ruta = ruta_pdf_rca(rca.codigo)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            generar_reporte_rca(datos_reporte_rca(rca), ruta)
+            generados.append(ruta)
+    finally:
+        db.close()
+    return {"generados": generados, "no_encontrados": no_encontrados}
+
+def tarea_miniaturas(rca_id=None, ancho=None):
+    """Pregenerar las miniaturas de las fotos (de un RCA o de todos)"""
+    from utils.file_serving import EXTENSIONES_IMAGEN
+    from utils.miniaturas import obtener_miniatura, ANCHO_MINIATURA
+
+    db = SessionLocal()
+    try:
+        consulta = db.query(models.Archivo.id, models.Archivo.ruta_archivo, models.Archivo.tipo_archivo)
+        if rca_id is not None:
+            consulta = consulta.filter(models.Archivo.rca_id == rca_id)
+        archivos = consulta.all()
+    finally:
+        db.close()
+
+    generadas, errores = 0, []
+    for archivo_id, ruta, tipo in archivos:
+        if (tipo or '').lower() not in EXTENSIONES_IMAGEN:
+            continue
+        try:
+            obtener_miniatura(archivo_id, ruta, ancho or ANCHO_MINIATURA)
+            generadas += 1
+        except Exception as e:
+            errores.append({"archivo_id": archivo_id, "error": str(e)})
+    return {"generadas": generadas, "errores": errores}
+
+def tarea_marcar_acciones_vencidas():
+    import crud
+    db = SessionLocal()
+    try:
+        return {"marcadas": crud.marcar_acciones_vencidas(db)}
+    finally:
+        db.close()
+
+def tarea_importar_rcas(ruta, tamanio_lote=1000, hoja=None):
+    """Importar un CSV/Excel de RCAs históricos (reanuda desde el checkpoint si se reintenta)"""
+    from utils.importar import importar_archivo
+    return importar_archivo(ruta, SessionLocal, tamanio_lote=tamanio_lote, hoja=hoja)
+
+def tarea_archivar_rcas(anios=None, comprimir=None, tamanio_lote=500):
+    """Mover RCAs cerrados/cancelados antiguos al archivo histórico"""
+    from utils.archivado import archivar
+    resumen = archivar(SessionLocal, anios=anios, comprimir=comprimir, tamanio_lote=tamanio_lote)
+    resumen['corte'] = resumen['corte'].isoformat(timespec='seconds')
+    return resumen
+
+def tarea_limpiar_archivos(modo=None, gracia_horas=None, retencion_dias=None, eliminar_registros=False):
+    """Mover a cuarentena los archivos sin registro y purgar la cuarentena vencida"""
+    from utils.archivos_huerfanos import limpiar
+    return limpiar(
+        SessionLocal, modo=modo, gracia_horas=gracia_horas, retencion_dias=retencion_dias,
+        eliminar_registros=eliminar_registros
+    )
+
+TAREAS = {
+    'backup_completo': tarea_backup_completo,
+    'reportes_pdf': tarea_reportes_pdf,
+    'miniaturas': tarea_miniaturas,
+    'marcar_acciones_vencidas': tarea_marcar_acciones_vencidas,
+    'importar_rcas': tarea_importar_rcas,
+    'archivar_rcas': tarea_archivar_rcas,
+    'limpiar_archivos': tarea_limpiar_archivos,
+}
+
+def _recargar_indices():
+    """Los índices en memoria de la API no ven lo que escribió otro proceso"""
+    from utils import mapa_ishikawa
+    from utils.autocompletar import autocompletado
+    mapa_ishikawa.invalidar()
+    autocompletado.invalidar()
+
+# Se ejecutan en el proceso de la API cuando un trabajo de ese tipo termina bien
+AL_TERMINAR = {
+    'importar_rcas': _recargar_indices,
+    'archivar_rcas': _recargar_indices,
+}
+
+# Trabajos que el despachador encola solo: tipo -> cada cuántos segundos
+PERIODICOS = {
+    'marcar_acciones_vencidas': config.ACCIONES_VENCIDAS_MIN * 60,
+}
+if config.ARCHIVADO_INTERVALO_HORAS > 0:
+    PERIODICOS['archivar_rcas'] = config.ARCHIVADO_INTERVALO_HORAS * 3600
+if config.LIMPIEZA_INTERVALO_HORAS > 0:
+    PERIODICOS['limpiar_archivos'] = config.LIMPIEZA_INTERVALO_HORAS * 3600
+
+def _ejecutar_tarea(tipo, parametros):
+    """Punto de entrada en el proceso hijo"""
+    return TAREAS[tipo](**parametros)
+
+# ==================== OPERACIONES ====================
+def trabajo_a_dict(trabajo):
+    return {
+        "id": trabajo.id,
+        "tipo": trabajo.tipo,
+        "parametros": json.loads(trabajo.parametros or '{}'),
+        "prioridad": trabajo.prioridad,
+        "estado": trabajo.estado,
+        "intentos": trabajo.intentos,
+        "max_intentos": trabajo.max_intentos,
+        "cancelar": trabajo.cancelar,
+        "resultado": json.loads(trabajo.resultado) if trabajo.resultado else None,
+        "error": trabajo.error,
+        "creado_por": trabajo.creado_por,
+        "fecha_creacion": trabajo.fecha_creacion,
+        "fecha_inicio": trabajo.fecha_inicio,
+        "fecha_fin": trabajo.fecha_fin,
+    }
+
+def crear_trabajo(db, tipo, parametros=None, prioridad=5, max_intentos=3, creado_por=None):
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}. Disponibles: {', '.join(sorted(TAREAS))}")
+    trabajo = models.Trabajo(
+        tipo=tipo,
+        parametros=json.dumps(parametros or {}),
+        prioridad=prioridad,
+        max_intentos=max_intentos,
+        creado_por=creado_por,
+    )
+    db.add(trabajo)
+    db.commit()
+    db.refresh(trabajo)
+    if despachador is not None:
+        despachador.avisar()
+    return trabajo
+
+def cancelar_trabajo(db, trabajo_id):
+    """
+    Cancelar un trabajo. Ambos UPDATE son condicionales para no pisar un
+    trabajo que el despachador tomó justo ahora. Devuelve False si ya terminó
+    """
+    pendiente = db.execute(
+        update(models.Trabajo)
+        .where(models.Trabajo.id == trabajo_id, models.Trabajo.estado == 'Pendiente')
+        .values(estado='Cancelado', fecha_fin=datetime.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    en_ejecucion = 0
+    if not pendiente:
+        en_ejecucion = db.execute(
+            update(models.Trabajo)
+            .where(models.Trabajo.id == trabajo_id, models.Trabajo.estado == 'En Ejecución')
+            .values(cancelar=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    db.commit()
+    return bool(pendiente or en_ejecucion)
+
+def _encolar_periodico(db, tipo):
+    """
+    Encolar un trabajo del sistema salvo que ya haya uno de ese tipo pendiente o
+    en ejecución, con un INSERT ... SELECT ... WHERE NOT EXISTS. Devuelve True si lo encoló
+    """
+    T = models.Trabajo.__table__
+    valores = {
+        'tipo': tipo, 'parametros': '{}', 'prioridad': 8, 'estado': 'Pendiente', 'intentos': 0,
+        'max_intentos': 1, 'cancelar': False, 'creado_por': 'sistema', 'fecha_creacion': datetime.now(),
+    }
+    activo = select(T.c.id).where(T.c.tipo == tipo, T.c.estado.in_(('Pendiente', 'En Ejecución')))
+    fila = select(*[literal(v, T.c[k].type) for k, v in valores.items()]).where(~exists(activo))
+    encolados = db.execute(insert(T).from_select(list(valores), fila)).rowcount
+    db.commit()
+    return encolados == 1
+
+def _reclamar(db, cantidad, propietario=None):
+    """Pasar hasta `cantidad` trabajos pendientes a En Ejecución (UPDATE condicional)"""
+    ahora = datetime.now()
+    candidatos = db.query(models.Trabajo).filter(
+        models.Trabajo.estado == 'Pendiente',
+        (models.Trabajo.disponible_desde.is_(None)) | (models.Trabajo.disponible_desde <= ahora)
+    ).order_by(models.Trabajo.prioridad.desc(), models.Trabajo.id).limit(cantidad).all()
+
+    reclamados = []
+    for trabajo in candidatos:
+        resultado = db.execute(
+            update(models.Trabajo)
+            .where(models.Trabajo.id == trabajo.id, models.Trabajo.estado == 'Pendiente')
+            .values(estado='En Ejecución', fecha_inicio=ahora, intentos=models.Trabajo.intentos + 1,
+                    ejecutado_por=propietario, latido=ahora)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount == 1:
+            reclamados.append((trabajo.id, trabajo.tipo, json.loads(trabajo.parametros or '{}')))
+    db.commit()
+    return reclamados
+
+def _finalizar(db, trabajo_id, resultado=None, error=None, propietario=None):
+    """
+    Registrar el fin de una ejecución: completado, reintento, fallido o
+    cancelado. Con `propietario` no se toca si el trabajo ya no es suyo (se
+    recuperó por latido vencido y lo tomó otro despachador)
+    """
+    trabajo = db.get(models.Trabajo, trabajo_id)
+    if trabajo is None:
+        return
+    if propietario is not None and (trabajo.estado != 'En Ejecución' or trabajo.ejecutado_por != propietario):
+        logger.warning("Fin de un trabajo que ya no es de este despachador", extra={
+            "trabajo_id": trabajo_id, "ejecutado_por": trabajo.ejecutado_por, "estado": trabajo.estado
+        })
+        return
+    ahora = datetime.now()
+    if trabajo.cancelar:
+        trabajo.estado = 'Cancelado'
+        trabajo.fecha_fin = ahora
+    elif error is None:
+        trabajo.estado = 'Completado'
+        trabajo.resultado = json.dumps(resultado, default=str)
+        trabajo.error = None
+        trabajo.fecha_fin = ahora
+    elif trabajo.intentos < trabajo.max_intentos:
+        trabajo.estado = 'Pendiente'
+        trabajo.error = error
+        trabajo.disponible_desde = ahora + timedelta(
+            seconds=config.TRABAJOS_REINTENTO_SEG * 2 ** (trabajo.intentos - 1)
+        )
+    else:
+        trabajo.estado = 'Fallido'
+        trabajo.error = error
+        trabajo.fecha_fin = ahora
+    db.commit()
+    mensaje = "Trabajo falló, se reintentará" if trabajo.estado == 'Pendiente' else f"Trabajo {trabajo.estado.lower()}"
+    logger.info(mensaje, extra={
+        "trabajo_id": trabajo_id, "tipo": trabajo.tipo, "intento": trabajo.intentos, "error": error
+    })
+
+def latir(db, propietario, trabajo_ids):
+    """Renovar el latido de los trabajos que este despachador tiene en curso"""
+    if not trabajo_ids:
+        return 0
+    resultado = db.execute(
+        update(models.Trabajo)
+        .where(models.Trabajo.id.in_(trabajo_ids), models.Trabajo.estado == 'En Ejecución',
+               models.Trabajo.ejecutado_por == propietario)
+        .values(latido=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount
+
+def recuperar_interrumpidos(db, vencido_seg=None):
+    """
+    Trabajos En Ejecución cuyo despachador dejó de dar latido (proceso caído o
+    reiniciado) vuelven a la cola. Los de otros workers vivos no se tocan
+    """
+    vencido_seg = config.TRABAJOS_LATIDO_VENCIDO_SEG if vencido_seg is None else vencido_seg
+    T = models.Trabajo
+    resultado = db.execute(
+        update(T)
+        .where(T.estado == 'En Ejecución',
+               T.latido.is_(None) | (T.latido < datetime.now() - timedelta(seconds=vencido_seg)))
+        .values(estado='Pendiente', ejecutado_por=None,
+                error='Interrumpido: el proceso que lo ejecutaba dejó de responder')
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return resultado.rowcount
+
+# ==================== DESPACHADOR ====================
+class Despachador:
+    """Hilo que reparte los trabajos pendientes al pool de procesos"""
+
+    def __init__(self, workers=2, intervalo=2.0, latido=30.0):
+        self.workers = workers
+        self.intervalo = intervalo
+        self.latido = latido
+        # Identifica a este despachador entre los workers de la API (y entre reinicios del mismo pid)
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._proximo_latido = 0.0
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._en_curso = {}  # trabajo_id -> Future
+        self._lock = threading.Lock()
+        self._pool = None
+        self._hilo = None
+        self._proximos = {tipo: 0.0 for tipo in PERIODICOS}
+
+    def _nuevo_pool(self):
+        # spawn en todas las plataformas: igual que en Windows y sin heredar conexiones abiertas
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _cargar_proximos(self, db):
+        """
+        Programar cada periódico a partir de su última ejecución registrada y no
+        desde el arranque: si no, cada reinicio volvía a encolar archivado y limpieza
+        """
+        T = models.Trabajo
+        ultimas = dict(
+            db.query(T.tipo, func.max(T.fecha_inicio))
+            .filter(T.tipo.in_(list(PERIODICOS)))
+            .group_by(T.tipo).all()
+        )
+        ahora, reloj = datetime.now(), time.monotonic()
+        for tipo, intervalo in PERIODICOS.items():
+            ultima = ultimas.get(tipo)
+            # Nunca ejecutado: corresponde ahora
+            transcurrido = (ahora - ultima).total_seconds() if ultima else intervalo
+            self._proximos[tipo] = reloj + max(0.0, intervalo - transcurrido)
+
+    def iniciar(self):
+        db = SessionLocal()
+        try:
+            self._cargar_proximos(db)
+        finally:
+            db.close()
+        self._pool = self._nuevo_pool()
+        self._hilo = threading.Thread(target=self._bucle, name="despachador-trabajos", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=10)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def avisar(self):
+        """Revisar la cola ahora (hay un trabajo nuevo o un worker libre)"""
+        self._despertar.set()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self._despertar.clear()
+            try:
+                self._mantener()
+                self._programar()
+                self._repartir()
+            except Exception:
+                logger.exception("Error en el despachador de trabajos")
+            self._despertar.wait(self.intervalo)
+
+    def _mantener(self):
+        """Latido de los trabajos en curso y recuperación de los de despachadores caídos"""
+        ahora = time.monotonic()
+        if ahora < self._proximo_latido:
+            return
+        self._proximo_latido = ahora + self.latido
+        with self._lock:
+            en_curso = list(self._en_curso)
+        db = SessionLocal()
+        try:
+            latir(db, self.propietario, en_curso)
+            recuperados = recuperar_interrumpidos(db)
+        finally:
+            db.close()
+        if recuperados:
+            logger.warning("Trabajos interrumpidos devueltos a la cola", extra={"cantidad": recuperados})
+
+    def _programar(self):
+        """Encolar los trabajos periódicos que corresponden"""
+        ahora = time.monotonic()
+        vencidos = [tipo for tipo, proximo in self._proximos.items() if ahora >= proximo]
+        if not vencidos:
+            return
+        db = SessionLocal()
+        try:
+            encolados = 0
+            for tipo in vencidos:
+                self._proximos[tipo] = ahora + PERIODICOS[tipo]
+                encolados += _encolar_periodico(db, tipo)
+        finally:
+            db.close()
+        if encolados:
+            self.avisar()
+
+    def _repartir(self):
+        with self._lock:
+            libres = self.workers - len(self._en_curso)
+        if libres <= 0:
+            return
+        db = SessionLocal()
+        try:
+            reclamados = _reclamar(db, libres, self.propietario)
+        finally:
+            db.close()
+        for trabajo_id, tipo, parametros in reclamados:
+            try:
+                futuro = self._pool.submit(_ejecutar_tarea, tipo, parametros)
+            except Exception as e:
+                # Sin esto el trabajo quedaría En Ejecución hasta el próximo reinicio
+                if isinstance(e, BrokenProcessPool):
+                    self._pool = self._nuevo_pool()
+                db = SessionLocal()
+                try:
+                    _finalizar(db, trabajo_id, error=f"{type(e).__name__}: {e}", propietario=self.propietario)
+                finally:
+                    db.close()
+                continue
+            with self._lock:
+                self._en_curso[trabajo_id] = futuro
+            futuro.add_done_callback(lambda f, trabajo_id=trabajo_id, tipo=tipo: self._terminado(trabajo_id, tipo, f))
+
+    def _terminado(self, trabajo_id, tipo, futuro):
+        with self._lock:
+            self._en_curso.pop(trabajo_id, None)
+        resultado, error = None, None
+        if futuro.cancelled():
+            error = 'Cancelado antes de iniciar'
+        else:
+            excepcion = futuro.exception()
+            if excepcion is None:
+                resultado = futuro.result()
+            else:
+                error = f"{type(excepcion).__name__}: {excepcion}"
+                if isinstance(excepcion, BrokenProcessPool) and not self._detener.is_set():
+                    self._pool = self._nuevo_pool()
+        if not self._detener.is_set():
+            db = SessionLocal()
+            try:
+                _finalizar(db, trabajo_id, resultado, error, propietario=self.propietario)
+            except Exception:
+                logger.exception("No se pudo registrar el fin del trabajo", extra={"trabajo_id": trabajo_id})
+            finally:
+                db.close()
+        if error is None and tipo in AL_TERMINAR:
+            try:
+                AL_TERMINAR[tipo]()
+            except Exception:
+                logger.exception("Error al procesar el fin del trabajo", extra={"trabajo_id": trabajo_id})
+        self.avisar()
+
+despachador = None
+
+def iniciar_despachador():
+    global despachador
+    if despachador is None:
+        despachador = Despachador(
+            workers=config.TRABAJOS_WORKERS, intervalo=config.TRABAJOS_INTERVALO_SEG, latido=config.TRABAJOS_LATIDO_SEG
+        )
+        despachador.iniciar()
+    return despachador
+
+def detener_despachador():
+    global despachador
+    if despachador is not None:
+        despachador.detener()
+        despachador = None